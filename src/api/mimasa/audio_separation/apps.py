@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class AudioSeparationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "audio_separation"
+
+    def ready(self):
+        from src.common.libraries import Config
+
+        if Config.MODEL_WARM_UP_ENABLED:
+            from src.audioseparator import utils  # noqa: F401, registers the audio separators
+            from src.common.model_registry import model_registry
+
+            model_registry.warm_up(Config.AUDIO_SEPARATOR, model_path=None)
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class FaceDetectionConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "face_detection"
+
+    def ready(self):
+        from src.common.libraries import Config
+
+        if Config.MODEL_WARM_UP_ENABLED:
+            from src.common.model_registry import model_registry
+            from src.facedetector import utils  # noqa: F401, registers the face detectors
+
+            model_registry.warm_up(Config.VIDEO_DETECTOR)
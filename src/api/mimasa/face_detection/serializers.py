@@ -11,6 +11,9 @@ class FaceDetectionSerializer(serializers.Serializer):
             ("AsyncTaskFaceDetector", "AsyncTaskFaceDetector"),
             ("ConcurrentFuturesFaceDetector", "ConcurrentFuturesFaceDetector"),
             ("AsyncIOAndCPUFaceDetector", "AsyncIOAndCPUFaceDetector"),
+            ("ProcessPoolFaceDetector", "ProcessPoolFaceDetector"),
+            ("StreamingFaceDetector", "StreamingFaceDetector"),
+            ("SegmentParallelFaceDetector", "SegmentParallelFaceDetector"),
         ],
         default="AsyncTaskFaceDetector",
         required=False,
@@ -27,7 +30,7 @@ class FaceDetectionSerializer(serializers.Serializer):
     )
 
     def validate(self, data):
-        if data["detector_type"] != "MTCNN":
+        if data["detector_type"] not in ("MTCNN", "SSD"):
             raise serializers.ValidationError("The selected face detector is not implemented.")
 
         if data.get("run_in_background", False) and data["async_type"] != "AsyncTaskFaceDetector":
@@ -200,6 +200,24 @@ class TaskIdSerializerTestCase(TestCase):
     #     )
 
 
+class FaceDetectionSerializerTestCase(TestCase):
+    def setUp(self):
+        self.data = {
+            "video_filepath": "some/dummy/video_file.mp4",
+            "destination_folder": "some/dummy/destination_folder",
+        }
+
+    def test_ssd_detector_type(self):
+        serializer = FaceDetectionSerializer(data={**self.data, "detector_type": "SSD"})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.validated_data["detector_type"], "SSD")
+
+    def test_not_implemented_detector_type(self):
+        serializer = FaceDetectionSerializer(data={**self.data, "detector_type": "YOLO"})
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors["non_field_errors"], ["The selected face detector is not implemented."])
+
+
 from unittest.mock import patch
 
 from django.test import Client, TestCase
@@ -13,13 +13,30 @@ from src.common.logger import Logger
 from src.utils import utils
 
 
+def load_separator_model(model_path: str = None):
+    """
+    Load the deep mask estimation model of NUSSL with the given model path and device.
+    Unlike NUSSL, a failure is raised, so that the model registry never keeps a model which failed to load.
+    """
+    stft_params = nussl.STFTParams(window_length=512, hop_length=128)
+    nf = stft_params.window_length // 2 + 1
+    nac = 1
+    MaskInference.build(nf, nac, 300, 4, True, 0.3, 1, "sigmoid")
+
+    model_path = model_path or Config.MODEL_NUSSL_PATH
+    return nussl.separation.deep.DeepMaskEstimation(nussl.AudioSignal(), model_path=model_path, device=Config.DEVICE)
+
+
 class NUSSL(AudioSeparator):
     """
     Implements the NUSSL audio separation algorithm
     """
 
-    def __init__(self, model_path: str = None):
-        self.separator = None
+    def __init__(self, model_path: str = None, separator=None):
+        """
+        The separator is the model returned by load_separator_model, it is loaded here when it is not given.
+        """
+        self.separator = separator
         self.vocals_path = None
         self.music_path = None
         self.estimates = {}
@@ -27,7 +44,8 @@ class NUSSL(AudioSeparator):
         self.logger = Logger(name=self.__class__.__name__)
         self.logger.add_file_handler("audio_separation.log")
 
-        self._initialize_separator(model_path)
+        if self.separator is None:
+            self._initialize_separator(model_path)
 
     def _initialize_separator(self, model_path: str = None):
         """
@@ -35,16 +53,7 @@ class NUSSL(AudioSeparator):
         """
         try:
             self.logger.debug("NUSSL separator is loading...")
-
-            stft_params = nussl.STFTParams(window_length=512, hop_length=128)
-            nf = stft_params.window_length // 2 + 1
-            nac = 1
-            MaskInference.build(nf, nac, 300, 4, True, 0.3, 1, "sigmoid")
-
-            model_path = model_path or Config.MODEL_NUSSL_PATH
-            self.separator = nussl.separation.deep.DeepMaskEstimation(
-                nussl.AudioSignal(), model_path=model_path, device=Config.DEVICE
-            )
+            self.separator = load_separator_model(model_path)
             self.logger.info("NUSSL separator initialized successfully")
         except Exception as e:
             self.logger.error("Failed to initialize NUSSL separator due to {}".format(str(e)))
@@ -4,11 +4,25 @@ This file contains utility functions that are commonly used for audio separation
 """
 
 from src.audioseparator import nussl_separator
+from src.common.exceptions import AudioSeparationError
+from src.common.model_registry import model_registry
+
+# audio separators and the functions loading their models. A separator keeps the paths and the estimates of its
+# request, so every request gets a new one. Only the model is loaded once by the model registry: it keeps the audio
+# of the current request, so every thread gets its own instance
+AUDIO_SEPARATORS = {
+    "NUSSL": (nussl_separator.NUSSL, nussl_separator.load_separator_model),
+}
+
+for _separator_type, (_, _load_model) in AUDIO_SEPARATORS.items():
+    model_registry.register(_separator_type, _load_model, thread_safe=False)
 
 
 def get_audio_separator(separator_type: str = None, model_path: str = None):
     """
     This function is used to get the AudioSeparator object based on the separator_type.
+    A new separator is returned for every request, its model is loaded once per thread by the model registry
+    and reused by the next requests.
 
     Parameters:
     separator_type (str): type of separator. It should be one of the following
@@ -17,7 +31,12 @@ def get_audio_separator(separator_type: str = None, model_path: str = None):
     Returns:
     object: separator object
     """
-    if separator_type == "NUSSL":
-        return nussl_separator.NUSSL(model_path)
-    else:
+    if separator_type not in AUDIO_SEPARATORS:
         raise ValueError(f"Invalid separator type: {separator_type}")
+    separator_class, _ = AUDIO_SEPARATORS[separator_type]
+    try:
+        model = model_registry.get(separator_type, model_path=model_path)
+    except Exception as e:
+        # the model is not kept by the registry, the next request loads it again
+        raise AudioSeparationError(f"Failed to load the {separator_type} model due to {e}")
+    return separator_class(separator=model)
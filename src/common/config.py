@@ -34,6 +34,7 @@ class Config:
     # common settings
     DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
     FACE_DETECTION_ASYNC_ENABLED = True
+    MODEL_WARM_UP_ENABLED = False  # load the models when the api starts instead of on the first request
 
     ORIGINAL_SAMPLING_RATE = 44100
     AUDIO_DEFAULT_FORMAT = "wav"
@@ -52,9 +53,49 @@ class Config:
     VIDEO_OUTPUT_PATH = DATA_FOLDER / "videos" / "outputs"
     VIDEO_INPUT_FILENAME = VIDEO_INPUT_PATH / "input2.mp4"
     VIDEO_FORMATS = ["mp4"]
+    VIDEO_READER = "opencv"  # possible values: ["opencv", "ffmpeg"]
+    FFMPEG_BINARY = "ffmpeg"
+    FFMPEG_DECODE_THREADS = 0  # number of threads used by ffmpeg to decode a video, 0 lets ffmpeg decide
+    VIDEO_WRITER = "opencv"  # possible values: ["opencv", "ffmpeg"], opencv is used when ffmpeg is not found
+    VIDEO_WRITER_CODEC = "libx264"  # ffmpeg encoder of the output videos
+    VIDEO_WRITER_PRESET = "veryfast"  # preset of the ffmpeg encoder, None for the default of the encoder
+    VIDEO_WRITER_QUEUE_SIZE = 32  # maximum number of frames waiting to be encoded by ffmpeg
+    VIDEO_WRITER_FOURCC = "mp4v"  # codec of the output videos written by opencv
+    LIVE_SOURCE = 0  # live mode: camera index, path of a named pipe or "-" for stdin
+    LIVE_FRAME_SIZE = (640, 360)  # live mode: (width, height) of the frames decoded from a named pipe or stdin
+    LIVE_LATENCY_BUDGET = 0.2  # live mode: in seconds, maximum time from capturing a frame to showing it
+    LIVE_DISPLAY = True  # live mode: show the frames with faces in a window, "q" stops the live mode
+    LIVE_REPORT_INTERVAL = 5  # live mode: in seconds, time between two reports of the fps and latency
     VIDEO_DETECTOR = "MTCNN"  # possible values: ["ViolaJones", "MTCNN", "SSD", "YOLO", "RetinaFace"]
-    VIDEO_ASYNC_FACE_DETECTOR = "AsyncTaskFaceDetector"  # possible values: ["AsyncTaskFaceDetector", "ConcurrentFuturesFaceDetector", "AsyncIOAndCPUFaceDetector"]
+    FACE_DETECTOR_BACKEND = "default"  # possible values: ["default", "onnxruntime"], runtime of MTCNN and RetinaFace
+    FACE_DETECTOR_ONNX_QUANTIZED = False  # onnxruntime backend: use the int8 models (<name>.int8.onnx)
+    FACE_DETECTOR_ONNX_NUM_THREADS = 0  # onnxruntime backend: threads used by a model, 0 lets onnxruntime decide
+    VIDEO_ASYNC_FACE_DETECTOR = "AsyncTaskFaceDetector"  # possible values: ["AsyncTaskFaceDetector", "ConcurrentFuturesFaceDetector", "AsyncIOAndCPUFaceDetector", "ProcessPoolFaceDetector", "StreamingFaceDetector", "SegmentParallelFaceDetector"]
+    FACE_DETECTOR_MODE = "full"  # possible values: ["full", "tracking", "roi"]
+    FACE_DETECTOR_KEYFRAME_STRIDE = 12  # tracking and roi modes: run the face detector on every Nth whole frame only
+    FACE_DETECTOR_MIN_TRACKING_CONFIDENCE = 0.5  # tracking mode: run the face detector when tracking gets worse
+    FACE_DETECTOR_ROI_PADDING = 0.5  # roi mode: fraction of the size of a face searched around it in the next frame
+    FACE_DETECTOR_RESOLUTION = None  # long side of the frames given to the face detector (e.g. 640), "auto" or None
+    FACE_DETECTOR_CONFIDENCE_THRESHOLD = 0.5  # minimum score of the faces found by SSD, YOLO and RetinaFace
+    FACE_DETECTOR_NMS_THRESHOLD = 0.4  # overlap of two boxes above which the lower scored one is removed
+    FACE_DETECTOR_MIN_FACE_SIZE = 60  # smallest expected face in pixels, used by FACE_DETECTOR_RESOLUTION "auto"
+    FACE_DETECTOR_DETECT_SCENE_CUTS = False  # True: find the frames where a new shot starts while reading a video
+    FACE_DETECTOR_SCENE_CUT_THRESHOLD = 0.5  # histogram distance of two consecutive frames which is a scene cut
+    FACE_DETECTOR_MIN_SCENE_LENGTH = 6  # minimum number of frames between two scene cuts
     FACE_DETECTOR_NUM_WORK_THREADS = 3  # min(32, (os.cpu_count() or 1) + 4)
+    FACE_DETECTOR_AUTOSCALE_ENABLED = False  # StreamingFaceDetector: True adapts the number of workers to the job
+    FACE_DETECTOR_AUTOSCALE_INTERVAL = 2.0  # in seconds, time between two decisions of the worker autoscaler
+    FACE_DETECTOR_CPU_BUDGET = None  # maximum number of cores used by the autoscaled workers, None for all cores
+    FACE_DETECTOR_NUM_WORK_PROCESSES = (
+        os.cpu_count() or 1
+    )  # used by ProcessPoolFaceDetector and SegmentParallelFaceDetector
+    FACE_DETECTOR_SEGMENT_MIN_DURATION = 30  # in seconds, shortest segment processed by SegmentParallelFaceDetector
+    FACE_DETECTOR_BATCH_SIZE = 8  # number of frames passed to the face detector at once
+    FACE_DETECTOR_QUEUE_SIZE = 32  # maximum number of frames (batches for ProcessPool) waiting for detection
+    FACE_DETECTOR_REORDER_WINDOW = 64  # maximum number of detected frames waiting to be written in order
+    FACE_DETECTOR_CACHE_ENABLED = False  # True: reuse the faces found in a video with the same content and settings
+    FACE_DETECTOR_CACHE_PATH = DATA_FOLDER / "cache" / "detections"
+    FACE_DETECTOR_CACHE_MAX_SIZE = 256 * 1024 * 1024  # in bytes, least recently used detections are removed first
 
     ## Datasets
 
@@ -74,6 +115,23 @@ class Config:
     ##### NUSSL
     MODEL_NUSSL_PATH = MODELS_PATH / "nussl" / "checkpoints" / "best.model.pth"
 
+    ### Video
+    #### Face Detector
+
+    ##### MTCNN
+    MODEL_MTCNN_ONNX_PATH = MODELS_PATH / "mtcnn"  # pnet.onnx, rnet.onnx and onet.onnx, for the onnxruntime backend
+
+    ##### SSD
+    MODEL_SSD_CONFIG_PATH = MODELS_PATH / "ssd" / "deploy.prototxt"
+    MODEL_SSD_WEIGHTS_PATH = MODELS_PATH / "ssd" / "res10_300x300_ssd_iter_140000.caffemodel"
+
+    ##### YOLO
+    MODEL_YOLO_CONFIG_PATH = MODELS_PATH / "yolo" / "yolov3-face.cfg"
+    MODEL_YOLO_WEIGHTS_PATH = MODELS_PATH / "yolo" / "yolov3-wider_16000.weights"
+
+    ##### RetinaFace
+    MODEL_RETINAFACE_PATH = MODELS_PATH / "retinaface" / "retinaface_mobilenet0.25.onnx"
+
     # logging configuration
     LOGS_FOLDER_PATH = BASE_DIR / "logs"
     LOG_LEVEL = "debug"  # possible options: ["debug", "info", "warning", "error", "critical",]
@@ -7,4 +7,7 @@ VIDEO_ASYNC_FACE_DETECTORS_LIST = [
     "AsyncTaskFaceDetector",
     "ConcurrentFuturesFaceDetector",
     "AsyncIOAndCPUFaceDetector",
+    "ProcessPoolFaceDetector",
+    "StreamingFaceDetector",
+    "SegmentParallelFaceDetector",
 ]
@@ -13,7 +13,7 @@ def download_models():
     """
     Function to download models
     """
-    models = ["nussl"]
+    models = ["nussl", "ssd"]
 
     for model in models:
         if model == "nussl":
@@ -21,6 +21,16 @@ def download_models():
             utils.download_file_from_google_drive(
                 "https://drive.google.com/uc?id=1CKwaqBj55b83qoZbg66gaUsewnQh4k8g", output_path
             )
+        elif model == "ssd":
+            utils.download_file(
+                "https://raw.githubusercontent.com/opencv/opencv/4.x/samples/dnn/face_detector/deploy.prototxt",
+                Config.MODEL_SSD_CONFIG_PATH,
+            )
+            utils.download_file(
+                "https://raw.githubusercontent.com/opencv/opencv_3rdparty/dnn_samples_face_detector_20170830/"
+                "res10_300x300_ssd_iter_140000.caffemodel",
+                Config.MODEL_SSD_WEIGHTS_PATH,
+            )
 
 
 def download_audios():
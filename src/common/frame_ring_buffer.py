@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Frame ring buffer, which holds a fixed number of preallocated frames
+------------------------------------------------------------------------------------------------
+
+Reading a video with cv2.VideoCapture allocates a new array for every frame (about 2.7 MB for 720p), and the
+arrays are freed again once the frame is written. FrameRingBuffer allocates the frames once and reuses them.
+
+1. The buffer is an array of num_slots frames, e.g. in the shared memory of the ProcessPoolFaceDetector.
+2. The reader takes a free slot (acquire) and decodes the next frame directly into it (read), with
+cv2.VideoCapture.read(image=...) or the pipe of the ffmpeg reader.
+3. The slot is passed on instead of the frame, the detection and the drawing of the faces work on the slot in place.
+4. The slot is given back (release) once its frame is written to the output video. The reader waits while no slot
+is free, so the number of slots also bounds the frames held in memory.
+5. Free slots are reused last in, first out: a slot which was just written is still in the CPU cache, and the pages
+of slots which are never needed are never touched.
+
+Example Usage:
+
+frame_buffer = FrameRingBuffer(num_slots=64, frame_shape=(720, 1280, 3))
+slot = await frame_buffer.acquire()
+if frame_buffer.read(video_capture, slot):
+    faces = face_detector.detect_faces(frame_buffer.frames[slot])
+frame_buffer.release(slot)
+"""
+
+import asyncio
+
+import numpy as np
+
+
+class FrameRingBuffer:
+    """
+    Class holding a fixed number of preallocated frames (slots) which are reused for the frames of a video.
+
+    Attributes:
+        frames (numpy.ndarray): The slots, an uint8 array of shape (num_slots, *frame_shape).
+        num_slots (int): The number of slots.
+        copied_frames (int): The number of frames which the reader could not decode into their slot,
+            they were copied into it.
+    """
+
+    def __init__(self, num_slots: int, frame_shape: tuple, buffer=None):
+        """
+        The constructor for the FrameRingBuffer class, the slots are allocated here.
+
+        Args:
+            num_slots (int): The number of slots.
+            frame_shape (tuple): The shape of a frame, e.g. (height, width, 3).
+            buffer: The memory of the slots (e.g. the buf of a SharedMemory block), a new array is allocated by default.
+        """
+        self.num_slots = max(1, int(num_slots))
+        shape = (self.num_slots, *frame_shape)
+        if buffer is None:
+            self.frames = np.empty(shape, dtype=np.uint8)
+        else:
+            self.frames = np.ndarray(shape, dtype=np.uint8, buffer=buffer)
+        self.copied_frames = 0
+
+        self.free_slots = asyncio.LifoQueue()
+        for slot in reversed(range(self.num_slots)):
+            self.free_slots.put_nowait(slot)
+
+    async def acquire(self) -> int:
+        """Take a free slot, waits until a slot is released when all slots are in use"""
+        return await self.free_slots.get()
+
+    def release(self, slot: int):
+        """Give a slot back once its frame is no longer needed"""
+        self.free_slots.put_nowait(slot)
+
+    def read(self, video_capture, slot: int) -> bool:
+        """
+        Read the next frame of a video into a slot.
+
+        Args:
+            video_capture (cv2.VideoCapture or FFmpegVideoReader): The reader of the video.
+            slot (int): The slot the frame is read into.
+
+        Returns:
+            bool: Whether a frame was read, False at the end of the video.
+        """
+        ret, frame = video_capture.read(image=self.frames[slot])
+        if ret and not np.shares_memory(frame, self.frames[slot]):
+            # the reader returned a new array, e.g. when the frame does not match the shape of the slot
+            self.frames[slot] = frame
+            self.copied_frames += 1
+        return ret
+
+    def close(self):
+        """Drop the reference to the memory of the slots, e.g. before a SharedMemory block is closed"""
+        self.frames = None
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Model registry, which keeps the loaded models of the process
+------------------------------------------------------------------------------------------------
+
+Loading a model (e.g. the TensorFlow networks of MTCNN or the checkpoint of NUSSL) takes seconds, much longer than
+most requests take to process. The registry loads every model once per process and hands out the loaded instance
+to every caller instead.
+
+1. A model type is registered with the factory which loads it, e.g. the class of the face detector. Models are keyed
+by their type and the keyword arguments given to the factory, so two configurations of a model are two entries.
+2. A thread safe model is loaded once and the same instance is shared by all threads.
+3. A model which is not thread safe (it keeps the data of the current request in its attributes) gets one instance
+per thread. The instance of a thread which has finished is kept and handed to the next thread which asks for the
+model, so the model is only loaded again when several threads use it at the same time.
+4. warm_up loads a model before it is needed (e.g. when the api starts) and runs the warm up function of the model
+type on it, which lets the model allocate its buffers before the first request.
+5. unload removes the loaded instances, the next caller loads the model again.
+
+Example Usage:
+
+model_registry.register("MTCNN", MTCNNDetector, warm_up=lambda detector: detector.detect_faces(frame))
+model_registry.warm_up("MTCNN")
+detector = model_registry.get("MTCNN")
+model_registry.unload("MTCNN")
+"""
+
+import threading
+import time
+import weakref
+
+from src.common.logger import Logger
+
+
+class _ThreadInstance:
+    """The instance of a model used by a thread, it is handed back to the registry when the thread finishes"""
+
+    def __init__(self, instance):
+        self.instance = instance
+
+
+class _ModelEntry:
+    """The loaded instances of a model type with a configuration"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # the instance shared by all threads (thread safe models)
+        self.instance = None
+        # the instances of the threads (other models), instances of finished threads wait in idle
+        self.local = threading.local()
+        self.idle = []
+        self.unloaded = False
+
+    def release(self, instance):
+        """called when the thread which used the instance has finished"""
+        with self.lock:
+            if not self.unloaded:
+                self.idle.append(instance)
+
+
+class ModelRegistry:
+    """
+    Class keeping the loaded models of the process.
+    """
+
+    def __init__(self):
+        # model type -> (factory, thread_safe, warm_up)
+        self.model_types = {}
+        # (model type, configuration) -> _ModelEntry
+        self.entries = {}
+        self.lock = threading.Lock()
+
+        self.logger = Logger(name=self.__class__.__name__)
+        self.logger.add_file_handler("model_registry.log")
+
+    def register(self, model_type: str, factory, thread_safe: bool = True, warm_up=None):
+        """
+        Register a model type.
+
+        Args:
+            model_type (str): The name of the model type, e.g. "MTCNN".
+            factory (callable): Loads the model, called with the keyword arguments given to get.
+            thread_safe (bool): Whether one instance of the model can be used by several threads at the same time,
+                otherwise every thread gets its own instance.
+            warm_up (callable): Called with a loaded instance by warm_up, e.g. to run the model on a dummy input.
+        """
+        self.model_types[model_type] = (factory, thread_safe, warm_up)
+
+    def get(self, model_type: str, **config):
+        """
+        Get the loaded instance of a model, the model is loaded on the first call.
+
+        Args:
+            model_type (str): The name of a registered model type.
+            **config: The keyword arguments of the factory of the model type.
+
+        Returns:
+            object: The instance shared by all threads for thread safe models, the instance of the calling thread
+            otherwise.
+        """
+        factory, thread_safe, _ = self._get_model_type(model_type)
+        entry = self._get_entry(model_type, config)
+
+        if thread_safe:
+            # the lock of the entry is held while loading, so that a model is not loaded twice by two threads
+            with entry.lock:
+                if entry.instance is None:
+                    entry.instance = self._load(model_type, factory, config)
+                return entry.instance
+
+        thread_instance = getattr(entry.local, "thread_instance", None)
+        if thread_instance is None:
+            with entry.lock:
+                instance = entry.idle.pop() if entry.idle else None
+            if instance is None:
+                instance = self._load(model_type, factory, config)
+            thread_instance = _ThreadInstance(instance)
+            # thread local values are deleted when their thread finishes, the instance goes back to the entry
+            weakref.finalize(thread_instance, entry.release, instance)
+            entry.local.thread_instance = thread_instance
+        return thread_instance.instance
+
+    def warm_up(self, model_type: str, **config):
+        """
+        Load a model and run the warm up function of its model type on it.
+
+        For models which are not thread safe a new instance is loaded and kept for the next thread which asks for
+        the model, the calling thread (e.g. the main thread of the api) does not keep it.
+        """
+        factory, thread_safe, warm_up = self._get_model_type(model_type)
+        if thread_safe:
+            instance = self.get(model_type, **config)
+        else:
+            instance = self._load(model_type, factory, config)
+
+        if warm_up is not None:
+            start_time = time.time()
+            warm_up(instance)
+            self.logger.info(f"Warmed up {model_type} in {time.time() - start_time:.2f} seconds")
+
+        if not thread_safe:
+            self._get_entry(model_type, config).release(instance)
+
+    def unload(self, model_type: str = None):
+        """
+        Remove the loaded instances of a model type (all configurations) or of all model types.
+        Instances which are used by a thread at the moment are removed when the thread has finished.
+        """
+        with self.lock:
+            keys = [key for key in self.entries if model_type is None or key[0] == model_type]
+            entries = [self.entries.pop(key) for key in keys]
+
+        for key, entry in zip(keys, entries):
+            with entry.lock:
+                entry.unloaded = True
+                entry.instance = None
+                entry.idle.clear()
+            self.logger.info(f"Unloaded {key[0]} {dict(key[1])}")
+
+    def _get_model_type(self, model_type: str):
+        if model_type not in self.model_types:
+            raise ValueError(f"Invalid model type: {model_type}")
+        return self.model_types[model_type]
+
+    @staticmethod
+    def _get_key(model_type: str, config: dict):
+        return model_type, tuple(sorted(config.items()))
+
+    def _get_entry(self, model_type: str, config: dict):
+        key = self._get_key(model_type, config)
+        with self.lock:
+            if key not in self.entries:
+                self.entries[key] = _ModelEntry()
+            return self.entries[key]
+
+    def _load(self, model_type: str, factory, config: dict):
+        start_time = time.time()
+        instance = factory(**config)
+        self.logger.info(
+            f"Loaded {model_type} {config} in {time.time() - start_time:.2f} seconds "
+            f"(thread {threading.current_thread().name})"
+        )
+        return instance
+
+
+# the models of the process, model types are registered by the modules which provide them
+model_registry = ModelRegistry()
@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+"""
+synthetic_media.py
+
+This module writes deterministic synthetic videos and audios, to test and benchmark mimasa without downloading
+the sample data (download_data.py).
+
+Functionality:
+------------------------------------------------------------------------------------------------
+
+1. The frames show drawn faces of chosen sizes (the height of a face in pixels) and motions (static, linear,
+circular, zoom) on a slowly panning background. The position of a face is a function of the time only, so every
+frame is rendered on its own and the same settings always give the same video.
+2. The audio mixes speech-like and music-like tracks. The speech is made of syllables (a pitched voice shaped by
+the formants of a vowel, with a noisy onset) spoken by two speakers in turns, with pauses, and the mouths of the
+faces of the speaker open with the syllables. The music is a chord progression with bass, kick and hi-hat.
+3. The frames and the audio are generated one after another and streamed to ffmpeg (the audio to a temporary wav
+file first), so the memory used is the same for a 5 second clip and for a video of several hours.
+4. fixtures: the sample videos of SYNTHETIC_FIXTURES are written to Config.VIDEO_INPUT_PATH and
+Config.TRANSLATION_INPUT_PATH.
+
+Usage:
+
+python -m src.common.synthetic_media fixtures
+python -m src.common.synthetic_media video synthetic_2h.mp4 --duration 7200 --faces 200:linear 80:zoom
+python -m src.common.synthetic_media audio data/audios/inputs/synthetic.wav --duration 60
+
+Note: without ffmpeg the videos are written with cv2.VideoWriter, without an audio track.
+"""
+
+import argparse
+import functools
+import os
+import shutil
+import subprocess
+import tempfile
+import wave
+
+import cv2
+import numpy as np
+
+from src.common.config import Config
+from src.common.logger import Logger
+
+SYNTHETIC_FACE_MOTIONS = ["static", "linear", "circular", "zoom"]
+
+# sample videos written by generate_fixtures: (folder of Config, file name, settings of write_synthetic_video)
+SYNTHETIC_FIXTURES = [
+    ("VIDEO_INPUT_PATH", "synthetic_5s.mp4", {"resolution": (1280, 720), "fps": 25, "duration": 5}),
+    ("VIDEO_INPUT_PATH", "synthetic_60s_1080p.mp4", {"resolution": (1920, 1080), "fps": 30, "duration": 60}),
+    ("TRANSLATION_INPUT_PATH", "synthetic_movie_5min.mp4", {"resolution": (1280, 720), "fps": 24, "duration": 300}),
+]
+
+# formants F1, F2 and F3 in Hz of the vowels a, i, u, e and o
+SPEECH_VOWELS = [(730, 1090, 2440), (270, 2290, 3010), (300, 870, 2240), (530, 1840, 2480), (570, 840, 2410)]
+# pitch in Hz of the two speakers, who take turns every PHRASE_DURATION seconds
+SPEAKER_PITCHES = (120.0, 210.0)
+PHRASE_DURATION = 4
+# chords of the music (C, G, Am, F) in Hz, a chord lasts 4 beats of MUSIC_BEAT seconds
+MUSIC_CHORDS = [(261.63, 329.63, 392.00), (196.00, 246.94, 293.66), (220.00, 261.63, 329.63), (174.61, 220.00, 261.63)]
+MUSIC_BEAT = 0.6
+
+SKIN_COLORS = [(150, 180, 225), (95, 135, 190), (70, 95, 140), (175, 200, 235)]
+HAIR_COLORS = [(30, 30, 40), (20, 60, 110), (60, 60, 60), (40, 90, 160)]
+
+logger = Logger(name="SyntheticMedia")
+
+
+class SyntheticFace:
+    """
+    Class describing a face of a synthetic video.
+
+    Attributes:
+        size (int): The height of the face in pixels.
+        motion (str): How the face moves, one of SYNTHETIC_FACE_MOTIONS.
+        position (tuple): The center of the face at the start, as fractions of the width and the height of the frame.
+        speed (float): Frame heights per second for the linear motion, turns or zoom cycles per second for the
+            circular and the zoom motions.
+        index (int): The index of the face in the video, it sets the colors, the direction and the speaker.
+    """
+
+    def __init__(self, size: int, motion: str = "linear", position: tuple = (0.5, 0.5), speed: float = 0.1, index=0):
+        if motion not in SYNTHETIC_FACE_MOTIONS:
+            raise ValueError(f"Invalid motion: {motion}, it should be one of {SYNTHETIC_FACE_MOTIONS}")
+        self.size = max(8, int(size))
+        self.motion = motion
+        self.position = position
+        self.speed = speed
+        self.index = index
+
+    def get_placement(self, time: float, width: int, height: int) -> tuple:
+        """returns the center (x, y) and the height of the face at a time in seconds"""
+        x, y = self.position[0] * width, self.position[1] * height
+        size = self.size
+        if self.motion == "linear":
+            # the golden angle spreads the directions of the faces
+            angle = 2.39996 * self.index + 0.5
+            distance = self.speed * height * time
+            x = _bounce(x + np.cos(angle) * distance, size * 0.4, width - size * 0.4)
+            y = _bounce(y + np.sin(angle) * distance, size * 0.5, height - size * 0.5)
+        elif self.motion == "circular":
+            radius = 0.15 * min(width, height)
+            angle = 2 * np.pi * self.speed * time + self.index
+            x, y = x + radius * np.cos(angle), y + radius * np.sin(angle)
+        elif self.motion == "zoom":
+            size = self.size * (1 + 0.5 * np.sin(2 * np.pi * self.speed * time))
+        return int(x), int(y), max(8, int(size))
+
+
+def _bounce(value: float, low: float, high: float) -> float:
+    """returns the position of a point moving on a line from low to high which bounces off its ends"""
+    span = high - low
+    if span <= 0:
+        return (low + high) / 2
+    value = (value - low) % (2 * span)
+    return low + (value if value <= span else 2 * span - value)
+
+
+def get_default_faces(height: int) -> list:
+    """returns a large linear, a medium circular and a small zooming face for frames of the given height"""
+    return [
+        SyntheticFace(0.4 * height, "linear", (0.3, 0.5), 0.08, index=0),
+        SyntheticFace(0.22 * height, "circular", (0.7, 0.35), 0.1, index=1),
+        SyntheticFace(0.12 * height, "zoom", (0.75, 0.75), 0.2, index=2),
+    ]
+
+
+def parse_faces(faces: list) -> list:
+    """returns the faces given as SIZE:MOTION, e.g. ["200:linear", "80:zoom"]"""
+    parsed = []
+    for index, face in enumerate(faces):
+        size, _, motion = face.partition(":")
+        position = ((0.3 + 0.37 * index) % 1.0, (0.5 + 0.29 * index) % 1.0)
+        parsed.append(SyntheticFace(int(size), motion or "linear", position, index=index))
+    return parsed
+
+
+@functools.lru_cache(maxsize=8)
+def get_syllables(second: int, seed: int = 0) -> tuple:
+    """
+    Get the syllables of a second of the synthetic speech.
+
+    Args:
+        second (int): The second of the audio.
+        seed (int): The seed of the audio.
+
+    Returns:
+        tuple: (start, duration, pitch, vowel) of every syllable, the start in seconds from the start of the second.
+    """
+    rng = np.random.default_rng([seed, second])
+    if rng.random() < 0.2:
+        # a pause between two sentences
+        return ()
+    pitch = SPEAKER_PITCHES[get_speaker(second)]
+    syllables = []
+    start = rng.uniform(0.0, 0.1)
+    while True:
+        duration = rng.uniform(0.12, 0.25)
+        if start + duration > 0.98:
+            break
+        syllables.append((start, duration, pitch * rng.uniform(0.9, 1.15), int(rng.integers(len(SPEECH_VOWELS)))))
+        start += duration + rng.uniform(0.02, 0.12)
+    return tuple(syllables)
+
+
+def get_speaker(second: int) -> int:
+    """returns the speaker (0 or 1) of a second of the synthetic speech"""
+    return (second // PHRASE_DURATION) % 2
+
+
+def get_mouth_opening(time: float, seed: int = 0) -> float:
+    """returns how far the mouth of the speaker is open at a time in seconds, from 0 to 1"""
+    second = int(time)
+    for start, duration, _, _ in get_syllables(second, seed):
+        offset = time - second - start
+        if 0 <= offset < duration:
+            return float(np.sin(np.pi * offset / duration))
+    return 0.0
+
+
+def synthesize_speech(second: int, sample_rate: int, seed: int = 0) -> np.ndarray:
+    """returns the samples of a second of the synthetic speech"""
+    samples = np.zeros(sample_rate)
+    noise = np.random.default_rng([seed, second, 1]).standard_normal(sample_rate)
+    for start, duration, pitch, vowel in get_syllables(second, seed):
+        offset, length = int(start * sample_rate), int(duration * sample_rate)
+        time = np.arange(length) / sample_rate
+        # the pitch falls over the syllable, the harmonics near the formants of the vowel are the loudest
+        phase = 2 * np.pi * np.cumsum(pitch * (1 - 0.1 * time / duration)) / sample_rate
+        voiced = np.zeros(length)
+        for harmonic in range(1, int(4000 // pitch) + 1):
+            gain = 0.02 + sum(
+                np.exp(-0.5 * ((harmonic * pitch - formant) / 100) ** 2) for formant in SPEECH_VOWELS[vowel]
+            )
+            voiced += gain / np.sqrt(harmonic) * np.sin(harmonic * phase)
+        voiced /= max(np.abs(voiced).max(), 1e-6)
+        # a short burst of noise is the consonant before the vowel
+        onset = np.diff(noise[offset : offset + length], prepend=0) * np.exp(-time * 60) * 0.3
+        samples[offset : offset + length] += voiced * np.hanning(length) + onset
+    return samples
+
+
+def synthesize_music(start_sample: int, num_samples: int, sample_rate: int, seed: int = 0) -> np.ndarray:
+    """returns num_samples samples of the synthetic music from start_sample on"""
+    time = (start_sample + np.arange(num_samples)) / sample_rate
+    beat = np.floor(time / MUSIC_BEAT)
+    since_beat = time - beat * MUSIC_BEAT
+    chord_index = (beat // 4 % len(MUSIC_CHORDS)).astype(int)
+
+    samples = np.zeros(num_samples)
+    for index, chord in enumerate(MUSIC_CHORDS):
+        mask = chord_index == index
+        if not mask.any():
+            continue
+        chord_time, chord_since_beat = time[mask], since_beat[mask]
+        pad = sum(np.sin(2 * np.pi * f * chord_time) + 0.3 * np.sin(4 * np.pi * f * chord_time) for f in chord)
+        bass = np.sin(np.pi * chord[0] * chord_time) * np.exp(-4 * chord_since_beat)
+        samples[mask] = 0.15 * pad * (0.4 + 0.6 * np.exp(-3 * chord_since_beat)) + 0.5 * bass
+
+    # kick on the beats, hi-hat on the off-beats from a fixed table of noise so that it is the same in every chunk
+    samples += np.sin(2 * np.pi * (50 + 100 * np.exp(-30 * since_beat)) * since_beat) * np.exp(-12 * since_beat)
+    noise = np.random.default_rng([seed, 2]).standard_normal(sample_rate)
+    since_off_beat = (time - MUSIC_BEAT / 2) % MUSIC_BEAT
+    samples += 0.15 * noise[(start_sample + np.arange(num_samples)) % sample_rate] * np.exp(-60 * since_off_beat)
+    return samples / 2.5
+
+
+def write_synthetic_audio(
+    file_path: str,
+    duration: float,
+    sample_rate: int = None,
+    speech_level: float = 0.6,
+    music_level: float = 0.3,
+    seed: int = 0,
+):
+    """
+    Write a mono 16 bit wav file of speech-like and music-like audio, one second at a time.
+
+    Args:
+        file_path (str): The file path of the audio.
+        duration (float): The length of the audio in seconds.
+        sample_rate (int): The sample rate, Config.ORIGINAL_SAMPLING_RATE by default.
+        speech_level (float): The level of the speech in the mix, 0 for music only.
+        music_level (float): The level of the music in the mix, 0 for speech only.
+        seed (int): The seed of the speech and the music.
+    """
+    sample_rate = sample_rate or Config.ORIGINAL_SAMPLING_RATE
+    total_samples = int(round(duration * sample_rate))
+    with wave.open(str(file_path), "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        for second, start_sample in enumerate(range(0, total_samples, sample_rate)):
+            num_samples = min(sample_rate, total_samples - start_sample)
+            samples = speech_level * synthesize_speech(second, sample_rate, seed)[:num_samples]
+            samples += music_level * synthesize_music(start_sample, num_samples, sample_rate, seed)
+            wav_file.writeframes((np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes())
+
+
+def make_background(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """returns a smooth background twice as wide as the frames, with equal halves so that it pans without a seam"""
+    rng = np.random.default_rng([seed, 3])
+    x = np.arange(width)[None, :, None] / width
+    y = np.arange(height)[:, None, None] / height
+    background = np.full((height, width, 3), 110.0)
+    for _ in range(6):
+        # whole periods along x, the background repeats after its width
+        frequency_x, frequency_y = rng.integers(1, 5), rng.uniform(0.5, 3)
+        amplitude = rng.uniform(10, 30, 3)
+        background += amplitude * np.sin(2 * np.pi * (frequency_x * x + frequency_y * y) + rng.uniform(0, 2 * np.pi))
+    background = np.clip(background, 0, 255).astype(np.uint8)
+    return np.concatenate([background, background], axis=1)
+
+
+def draw_face(frame: np.ndarray, x: int, y: int, size: int, mouth_opening: float, index: int = 0):
+    """draw a face of the given height centered at (x, y) into a frame"""
+    half_height, half_width = size // 2, int(size * 0.375)
+    skin, hair = SKIN_COLORS[index % len(SKIN_COLORS)], HAIR_COLORS[index % len(HAIR_COLORS)]
+    cv2.ellipse(frame, (x, y - size // 10), (half_width + size // 20, half_height), 0, 180, 360, hair, -1)
+    cv2.ellipse(frame, (x, y), (half_width, half_height), 0, 0, 360, skin, -1)
+    for side in (-1, 1):
+        eye_x, eye_y = x + side * size // 7, y - size // 10
+        cv2.ellipse(frame, (eye_x, eye_y), (size // 12, size // 20), 0, 0, 360, (235, 235, 235), -1)
+        cv2.circle(frame, (eye_x, eye_y), max(1, size // 30), (40, 30, 20), -1)
+        cv2.line(frame, (eye_x - size // 12, eye_y - size // 12), (eye_x + size // 12, eye_y - size // 12), hair, 2)
+    nose = tuple(int(channel * 0.8) for channel in skin)
+    cv2.line(frame, (x, y - size // 20), (x - size // 25, y + size // 10), nose, max(1, size // 60))
+    mouth_height = max(1, int(size / 40 + mouth_opening * size / 12))
+    cv2.ellipse(frame, (x, y + size // 4), (size // 7, mouth_height), 0, 0, 360, (60, 50, 140), -1)
+
+
+def render_frame(frame: np.ndarray, background: np.ndarray, frame_index: int, fps: float, faces: list, seed: int = 0):
+    """render a frame of a synthetic video into the given array, a function of the frame index only"""
+    height, width = frame.shape[:2]
+    time = frame_index / fps
+    # the background pans by 2% of the width per second
+    offset = int(time * width * 0.02) % width
+    np.copyto(frame, background[:, offset : offset + width])
+
+    mouth_opening = get_mouth_opening(time, seed)
+    speaker = get_speaker(int(time))
+    for face in faces:
+        x, y, size = face.get_placement(time, width, height)
+        draw_face(frame, x, y, size, mouth_opening if face.index % 2 == speaker else 0.0, face.index)
+    # the frame index in the corner shows whether the frames of an output video are in order
+    cv2.putText(frame, str(frame_index), (8, height - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+
+
+def write_synthetic_video(
+    file_path: str,
+    resolution: tuple = (1280, 720),
+    fps: float = 25,
+    duration: float = 5,
+    faces: list = None,
+    with_audio: bool = True,
+    seed: int = 0,
+) -> int:
+    """
+    Write a synthetic video, the frames are rendered one by one and streamed to ffmpeg.
+
+    Args:
+        file_path (str): The file path of the video.
+        resolution (tuple): The (width, height) of the frames.
+        fps (float): The frame rate.
+        duration (float): The length of the video in seconds.
+        faces (list): The SyntheticFace objects of the video, get_default_faces by default.
+        with_audio (bool): Whether the video has an audio track of speech and music.
+        seed (int): The seed of the background and of the audio.
+
+    Returns:
+        int: The number of frames of the video.
+    """
+    width, height = int(resolution[0]), int(resolution[1])
+    faces = get_default_faces(height) if faces is None else faces
+    num_frames = max(1, int(round(duration * fps)))
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+
+    background = make_background(width, height, seed)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    if not shutil.which(Config.FFMPEG_BINARY):
+        logger.warning(f"{Config.FFMPEG_BINARY} is not found, {file_path} is written with OpenCV and has no audio")
+        video_writer = cv2.VideoWriter(str(file_path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+        for frame_index in range(num_frames):
+            render_frame(frame, background, frame_index, fps, faces, seed)
+            video_writer.write(frame)
+        video_writer.release()
+        return num_frames
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(file_path))) as folder:
+        command = [Config.FFMPEG_BINARY, "-y", "-loglevel", "error"]
+        command += ["-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-"]
+        if with_audio:
+            audio_file = os.path.join(folder, "audio.wav")
+            write_synthetic_audio(audio_file, num_frames / fps, seed=seed)
+            command += ["-i", audio_file, "-c:a", "aac"]
+        command += ["-c:v", Config.VIDEO_WRITER_CODEC]
+        if Config.VIDEO_WRITER_PRESET:
+            command += ["-preset", Config.VIDEO_WRITER_PRESET]
+        # without the version of the encoder and the creation time, the same settings give the same file
+        command += ["-pix_fmt", "yuv420p", "-map_metadata", "-1", "-fflags", "+bitexact", str(file_path)]
+
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            for frame_index in range(num_frames):
+                render_frame(frame, background, frame_index, fps, faces, seed)
+                process.stdin.write(frame.data)
+            process.stdin.close()
+        except OSError as e:
+            process.kill()
+            raise IOError(f"Failed to write {file_path}: {process.stderr.read().decode(errors='replace')}") from e
+        stderr = process.stderr.read().decode(errors="replace").strip()
+        process.stderr.close()
+        if process.wait() != 0:
+            raise IOError(f"ffmpeg failed to write {file_path}: {stderr}")
+
+    logger.info(f"Wrote {num_frames} frames of {width}x{height} at {fps:g} fps with {len(faces)} faces to {file_path}")
+    return num_frames
+
+
+def generate_fixtures(overwrite: bool = False):
+    """
+    Write the sample videos of SYNTHETIC_FIXTURES, the existing ones are kept unless overwrite is set.
+    """
+    for folder, filename, settings in SYNTHETIC_FIXTURES:
+        file_path = os.path.join(getattr(Config, folder), filename)
+        if os.path.exists(file_path) and not overwrite:
+            logger.info(f"{file_path} exists already")
+            continue
+        write_synthetic_video(file_path, **settings)
+
+
+def parse_resolution(resolution: str) -> tuple:
+    """returns (width, height) of a resolution given as WIDTHxHEIGHT"""
+    width, height = resolution.lower().split("x")
+    return int(width), int(height)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic videos and audios for tests and benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fixtures_parser = subparsers.add_parser("fixtures", help="write the sample videos to the input folders")
+    fixtures_parser.add_argument("--overwrite", action="store_true", help="write the videos which exist again")
+
+    video_parser = subparsers.add_parser("video", help="write a synthetic video")
+    video_parser.add_argument("output", help="file path of the video")
+    video_parser.add_argument("--resolution", default="1280x720", help="WIDTHxHEIGHT")
+    video_parser.add_argument("--fps", type=float, default=25)
+    video_parser.add_argument("--duration", type=float, default=5, help="in seconds, up to several hours")
+    video_parser.add_argument(
+        "--faces", nargs="*", default=None, help=f"SIZE:MOTION, MOTION of {SYNTHETIC_FACE_MOTIONS}"
+    )
+    video_parser.add_argument("--no-audio", action="store_true", help="write the video without an audio track")
+    video_parser.add_argument("--seed", type=int, default=0)
+
+    audio_parser = subparsers.add_parser("audio", help="write a synthetic wav file")
+    audio_parser.add_argument("output", help="file path of the audio")
+    audio_parser.add_argument("--duration", type=float, default=5, help="in seconds")
+    audio_parser.add_argument("--sample-rate", type=int, default=None, help="ORIGINAL_SAMPLING_RATE by default")
+    audio_parser.add_argument("--speech-level", type=float, default=0.6)
+    audio_parser.add_argument("--music-level", type=float, default=0.3)
+    audio_parser.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    if args.command == "fixtures":
+        generate_fixtures(args.overwrite)
+    elif args.command == "video":
+        write_synthetic_video(
+            args.output,
+            parse_resolution(args.resolution),
+            args.fps,
+            args.duration,
+            None if args.faces is None else parse_faces(args.faces),
+            not args.no_audio,
+            args.seed,
+        )
+    else:
+        write_synthetic_audio(
+            args.output, args.duration, args.sample_rate, args.speech_level, args.music_level, args.seed
+        )
@@ -11,6 +11,7 @@ class Video:
     Attributes:
         file_path (str): The file path of the video.
         language (str): The language of the video.
+        scene_cuts (list): The indices of the frames which start a new scene, if they are known.
     """
 
     def __init__(self, file_path: str, language: str = "Unknown"):
@@ -23,6 +24,7 @@ class Video:
         """
         self.file_path = file_path
         self.language = language
+        self.scene_cuts = []
 
     def get_filename(self) -> str:
         """
@@ -59,3 +61,21 @@ class Video:
             language (str): The new language of the video.
         """
         self.language = language
+
+    def get_scene_cuts(self) -> list:
+        """
+        Get the indices of the frames which start a new scene.
+
+        Returns:
+            list: The indices of the frames which start a new scene, in increasing order.
+        """
+        return self.scene_cuts
+
+    def set_scene_cuts(self, scene_cuts: list):
+        """
+        Set the indices of the frames which start a new scene.
+
+        Args:
+            scene_cuts (list): The indices of the frames which start a new scene.
+        """
+        self.scene_cuts = list(scene_cuts)
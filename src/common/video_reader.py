@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Video readers, which decode the frames of a video file
+------------------------------------------------------------------------------------------------
+
+FFmpegVideoReader decodes a video with a local ffmpeg process and reads the raw frames from a pipe.
+It has the interface of cv2.VideoCapture used by the face detectors (read, get, isOpened, release),
+so both can be used in the same place.
+
+1. ffmpeg decodes with several threads (FFMPEG_DECODE_THREADS) in its own process, while the frames
+are read from the pipe. The pipe read releases the GIL, so the event loop is not blocked by decoding.
+2. ffmpeg scales the frames and converts them to the requested pixel format (e.g. "gray" for ViolaJones or
+a smaller size for detection), so no extra resize or color conversion is needed after decoding.
+3. A frame is read directly into a numpy array, which can be given by the caller (e.g. a slot of a
+preallocated buffer) so that no memory is allocated per frame.
+
+Example Usage:
+
+reader = open_video("input.mp4", size=(640, 360), pix_fmt="gray")
+while True:
+    ret, frame = reader.read()
+    if not ret:
+        break
+reader.release()
+
+FFmpegStreamReader reads a live stream (a named pipe or stdin, e.g. `ffmpeg -i rtsp://... -f mpegts - | python ...`)
+the same way. A stream can not be probed before it is read, so the size of its frames is given by the caller and
+ffmpeg scales every frame to it. ffmpeg does not buffer the input, so that the newest frame is read as soon as possible.
+A read waits until the stream produces a frame: terminate stops ffmpeg, so that a read in another thread returns,
+and the reader is released once that thread has finished.
+"""
+
+import shutil
+import subprocess
+
+import cv2
+import numpy as np
+
+from src.common.config import Config
+from src.common.logger import Logger
+
+# number of channels of the pixel formats which can be requested
+PIXEL_FORMAT_CHANNELS = {"bgr24": 3, "rgb24": 3, "gray": 1}
+
+
+class FFmpegVideoReader:
+    """
+    Class reading the frames of a video file from an ffmpeg process.
+
+    Attributes:
+        file_path (str): The file path of the video.
+        width (int): The width of the frames returned by read.
+        height (int): The height of the frames returned by read.
+        pix_fmt (str): The pixel format of the frames, one of PIXEL_FORMAT_CHANNELS.
+    """
+
+    def __init__(self, file_path: str, size: tuple = None, pix_fmt: str = "bgr24", threads: int = None):
+        """
+        The constructor for the FFmpegVideoReader class, the ffmpeg process is started here.
+
+        Args:
+            file_path (str): The file path of the video.
+            size (tuple): The (width, height) of the frames returned by read, the size of the video by default.
+            pix_fmt (str): The pixel format of the frames returned by read.
+            threads (int): The number of decoding threads, Config.FFMPEG_DECODE_THREADS is used by default.
+        """
+        if pix_fmt not in PIXEL_FORMAT_CHANNELS:
+            raise ValueError(f"Invalid pixel format: {pix_fmt}")
+
+        self.file_path = str(file_path)
+        self.pix_fmt = pix_fmt
+        self.process = None
+        self.frame_index = 0
+
+        self.logger = Logger(name=self.__class__.__name__)
+
+        # the properties of the video are read without decoding it
+        capture = cv2.VideoCapture(self.file_path)
+        is_opened = capture.isOpened()
+        self.fps = capture.get(cv2.CAP_PROP_FPS)
+        self.frame_count = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+        video_width, video_height = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)), int(
+            capture.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        )
+        capture.release()
+        if not is_opened or video_width <= 0 or video_height <= 0:
+            self.logger.error(f"Unable to open video file {self.file_path}")
+            return
+
+        self.width, self.height = size or (video_width, video_height)
+        channels = PIXEL_FORMAT_CHANNELS[pix_fmt]
+        self.shape = (self.height, self.width) if channels == 1 else (self.height, self.width, channels)
+        self.frame_size = self.width * self.height * channels
+
+        threads = Config.FFMPEG_DECODE_THREADS if threads is None else threads
+        command = [Config.FFMPEG_BINARY, "-nostdin", "-loglevel", "error", "-threads", str(threads)]
+        command += ["-i", self.file_path, "-an", "-sn", "-vsync", "0"]
+        if (self.width, self.height) != (video_width, video_height):
+            command += ["-vf", f"scale={self.width}:{self.height}:flags=area"]
+        command += ["-f", "rawvideo", "-pix_fmt", pix_fmt, "-"]
+
+        self.process = subprocess.Popen(
+            command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, bufsize=self.frame_size
+        )
+        self.logger.debug(f"Started ffmpeg to decode {self.width}x{self.height} {pix_fmt} frames")
+
+    def isOpened(self) -> bool:
+        return self.process is not None
+
+    def read(self, image: np.ndarray = None):
+        """
+        Read the next frame of the video.
+
+        Args:
+            image (numpy.ndarray): A contiguous uint8 array with the shape of the frames, the frame is read into it.
+                A new array is used by default.
+
+        Returns:
+            tuple: (True, frame) if a frame was read, (False, None) at the end of the video.
+        """
+        if self.process is None:
+            return False, None
+
+        frame = np.empty(self.shape, dtype=np.uint8) if image is None else image
+        buffer = memoryview(frame).cast("B")
+        size = 0
+        while size < self.frame_size:
+            count = self.process.stdout.readinto(buffer[size:])
+            if not count:
+                return False, None
+            size += count
+
+        self.frame_index += 1
+        return True, frame
+
+    def get(self, prop_id: int) -> float:
+        """
+        Get a property of the video, the same properties as cv2.VideoCapture.get are supported.
+        """
+        properties = {
+            cv2.CAP_PROP_FPS: self.fps,
+            cv2.CAP_PROP_FRAME_COUNT: self.frame_count,
+            cv2.CAP_PROP_FRAME_WIDTH: getattr(self, "width", 0),
+            cv2.CAP_PROP_FRAME_HEIGHT: getattr(self, "height", 0),
+            cv2.CAP_PROP_POS_FRAMES: self.frame_index,
+        }
+        return float(properties.get(prop_id, 0))
+
+    def terminate(self):
+        """
+        Stop the ffmpeg process without closing its pipe, a read waiting in another thread returns (False, None).
+        release still has to be called, after the read has returned.
+        """
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+
+    def release(self):
+        """
+        Stop the ffmpeg process.
+        """
+        if self.process is None:
+            return
+        self.process.stdout.close()
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.process = None
+
+
+class FFmpegStreamReader(FFmpegVideoReader):
+    """
+    Class reading the frames of a live stream (a named pipe or stdin) from an ffmpeg process.
+
+    Attributes:
+        source (str): The path of the named pipe or "-" for stdin.
+        width (int): The width of the frames returned by read.
+        height (int): The height of the frames returned by read.
+        pix_fmt (str): The pixel format of the frames, one of PIXEL_FORMAT_CHANNELS.
+    """
+
+    def __init__(self, source: str, size: tuple, pix_fmt: str = "bgr24", threads: int = None):
+        """
+        The constructor for the FFmpegStreamReader class, the ffmpeg process is started here.
+
+        Args:
+            source (str): The path of the named pipe or "-" for stdin, any stream format known to ffmpeg.
+            size (tuple): The (width, height) of the frames returned by read.
+            pix_fmt (str): The pixel format of the frames returned by read.
+            threads (int): The number of decoding threads, Config.FFMPEG_DECODE_THREADS is used by default.
+        """
+        if pix_fmt not in PIXEL_FORMAT_CHANNELS:
+            raise ValueError(f"Invalid pixel format: {pix_fmt}")
+
+        self.file_path = self.source = str(source)
+        self.pix_fmt = pix_fmt
+        self.frame_index = 0
+        # the frame rate and the length of a live stream are unknown
+        self.fps = 0.0
+        self.frame_count = 0
+
+        self.logger = Logger(name=self.__class__.__name__)
+
+        self.width, self.height = size
+        channels = PIXEL_FORMAT_CHANNELS[pix_fmt]
+        self.shape = (self.height, self.width) if channels == 1 else (self.height, self.width, channels)
+        self.frame_size = self.width * self.height * channels
+
+        read_stdin = self.source == "-"
+        threads = Config.FFMPEG_DECODE_THREADS if threads is None else threads
+        command = [Config.FFMPEG_BINARY, "-loglevel", "error", "-threads", str(threads)]
+        if not read_stdin:
+            command += ["-nostdin"]
+        command += ["-fflags", "nobuffer", "-flags", "low_delay"]
+        command += ["-i", "pipe:0" if read_stdin else self.source, "-an", "-sn", "-vsync", "0"]
+        command += ["-vf", f"scale={self.width}:{self.height}:flags=area", "-f", "rawvideo", "-pix_fmt", pix_fmt, "-"]
+
+        self.process = subprocess.Popen(
+            command,
+            stdin=None if read_stdin else subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=self.frame_size,
+        )
+        self.logger.debug(f"Started ffmpeg to decode {self.width}x{self.height} {pix_fmt} frames of {self.source}")
+
+
+def open_video(file_path: str, size: tuple = None, pix_fmt: str = "bgr24"):
+    """
+    Open a video file with the reader selected by Config.VIDEO_READER.
+
+    Args:
+        file_path (str): The file path of the video.
+        size (tuple): The (width, height) of the frames, only supported by the ffmpeg reader.
+        pix_fmt (str): The pixel format of the frames, only supported by the ffmpeg reader.
+
+    Returns:
+        cv2.VideoCapture or FFmpegVideoReader: The video reader.
+    """
+    if Config.VIDEO_READER == "ffmpeg":
+        if shutil.which(Config.FFMPEG_BINARY):
+            return FFmpegVideoReader(file_path, size=size, pix_fmt=pix_fmt)
+        Logger(name="VideoReader").warning(f"{Config.FFMPEG_BINARY} is not found, using OpenCV to read videos")
+    elif Config.VIDEO_READER != "opencv":
+        raise ValueError(f"Invalid video reader: {Config.VIDEO_READER}")
+
+    if size is not None or pix_fmt != "bgr24":
+        raise ValueError("Output size and pixel format of the frames are only supported by the ffmpeg video reader")
+    return cv2.VideoCapture(str(file_path))
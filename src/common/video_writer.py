@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Video writers, which encode frames to a video file
+------------------------------------------------------------------------------------------------
+
+FFmpegVideoWriter encodes a video with a local ffmpeg process, the raw frames are written to its pipe
+from a dedicated thread. It has the interface of cv2.VideoWriter used by the face detectors
+(write, isOpened, release), so both can be used in the same place.
+
+1. write copies the frame to a free buffer of the writer and queues it, the writer thread passes the frames to ffmpeg
+and gives the buffers back. The buffers are allocated once, and the frame can be reused by the caller as soon as
+write returns (e.g. a slot of a preallocated buffer).
+2. The pipe write and the encoding release the GIL / run in another process, so encoding overlaps with
+the face detection instead of being a serial step at the end of every job.
+3. The codec and the preset of the encoder are configurable (VIDEO_WRITER_CODEC, VIDEO_WRITER_PRESET),
+instead of the mp4v fourcc of cv2.VideoWriter.
+4. When the encoder is slower than the detection, write blocks once VIDEO_WRITER_QUEUE_SIZE frames are
+waiting, so the memory used by the queue is bounded. This is the backpressure of the encoder, coroutines check
+is_full and wait for the writer in a worker thread instead of blocking the event loop.
+5. libx264 with yuv420p only encodes even frame sizes, frames of an odd width or height are padded by one pixel.
+6. release raises IOError when ffmpeg failed, so a broken output video is never returned as a result.
+
+Example Usage:
+
+writer = open_video_writer("output.mp4", fps=25, frame_size=(1280, 720))
+writer.write(frame)
+writer.release()
+"""
+
+import queue
+import shutil
+import subprocess
+import threading
+
+import cv2
+import numpy as np
+
+from src.common.config import Config
+from src.common.logger import Logger
+
+
+class FFmpegVideoWriter:
+    """
+    Class writing the frames of a video file to an ffmpeg process from a background thread.
+
+    Attributes:
+        file_path (str): The file path of the video.
+        width (int): The width of the frames.
+        height (int): The height of the frames.
+        codec (str): The ffmpeg encoder of the video.
+        preset (str): The preset of the encoder, None to use the default of the encoder.
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        fps: float,
+        frame_size: tuple,
+        codec: str = None,
+        preset: str = None,
+        queue_size: int = None,
+    ):
+        """
+        The constructor for the FFmpegVideoWriter class, the ffmpeg process and the writer thread are started here.
+
+        Args:
+            file_path (str): The file path of the video.
+            fps (float): The frame rate of the video.
+            frame_size (tuple): The (width, height) of the frames, frames are BGR images as in cv2.VideoWriter.
+            codec (str): The ffmpeg encoder, Config.VIDEO_WRITER_CODEC is used by default.
+            preset (str): The preset of the encoder, Config.VIDEO_WRITER_PRESET is used by default.
+            queue_size (int): The maximum number of frames waiting to be encoded,
+                Config.VIDEO_WRITER_QUEUE_SIZE is used by default.
+        """
+        self.file_path = str(file_path)
+        self.width, self.height = int(frame_size[0]), int(frame_size[1])
+        self.codec = codec or Config.VIDEO_WRITER_CODEC
+        self.preset = Config.VIDEO_WRITER_PRESET if preset is None else preset
+        self.frame_size = self.width * self.height * 3
+        self.queue_size = max(1, queue_size or Config.VIDEO_WRITER_QUEUE_SIZE)
+        # the frames are copied to preallocated buffers, the queues pass the indices of the buffers
+        self.buffers = np.empty((self.queue_size, self.height, self.width, 3), dtype=np.uint8)
+        self.free_buffers = queue.LifoQueue()
+        for index in reversed(range(self.queue_size)):
+            self.free_buffers.put(index)
+        self.frames = queue.Queue()
+        self.error = None
+        self.frame_count = 0
+        # largest number of frames which waited to be encoded at once
+        self.high_water_mark = 0
+
+        self.logger = Logger(name=self.__class__.__name__)
+
+        command = [Config.FFMPEG_BINARY, "-y", "-loglevel", "error"]
+        command += ["-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{self.width}x{self.height}", "-r", str(fps)]
+        command += ["-i", "-", "-an", "-c:v", self.codec]
+        if self.width % 2 or self.height % 2:
+            # the chroma planes of yuv420p have half the size of the frame
+            command += ["-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"]
+        if self.preset:
+            command += ["-preset", self.preset]
+        command += ["-pix_fmt", "yuv420p", self.file_path]
+
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.thread = threading.Thread(target=self._write_frames, name=self.__class__.__name__, daemon=True)
+        self.thread.start()
+        self.logger.debug(f"Started ffmpeg to encode {self.width}x{self.height} frames with {self.codec}")
+
+    def isOpened(self) -> bool:
+        return self.process is not None
+
+    def is_full(self) -> bool:
+        """returns whether write would block until the encoder has taken a frame"""
+        return self.free_buffers.empty()
+
+    def write(self, frame: np.ndarray):
+        """
+        Queue a frame to be written to the video, blocks while the queue is full (see is_full).
+
+        Args:
+            frame (numpy.ndarray): A BGR image with the size of the video.
+        """
+        if self.process is None:
+            return
+        if self.error is not None:
+            raise IOError(f"Failed to write frame to {self.file_path} due to {self.error}")
+        if frame.shape[:2] != (self.height, self.width):
+            raise ValueError(f"Frame of shape {frame.shape} does not match the size {self.width}x{self.height}")
+        # the frame is copied, so the caller may reuse it
+        index = self.free_buffers.get()
+        np.copyto(self.buffers[index], frame, casting="unsafe")
+        self.frames.put(index)
+        self.frame_count += 1
+        self.high_water_mark = max(self.high_water_mark, self.frames.qsize())
+
+    def _write_frames(self):
+        """Write the queued frames to the pipe of ffmpeg until the end of the video"""
+        while True:
+            index = self.frames.get()
+            if index is None:
+                break
+            try:
+                # frames are still taken from the queue after an error, so write never blocks forever
+                if self.error is None:
+                    self.process.stdin.write(self.buffers[index].data)
+            except OSError as e:
+                self.error = e
+            finally:
+                self.free_buffers.put(index)
+
+    def release(self):
+        """
+        Write the queued frames, wait for ffmpeg to finish the video and stop it.
+
+        Raises:
+            IOError: If ffmpeg failed to encode the video.
+        """
+        if self.process is None:
+            return
+        self.frames.put(None)
+        self.thread.join()
+        if self.frame_count == 0:
+            # no video is created when no frame was written, e.g. when the output file is written by another writer
+            self.process.kill()
+            self.process.wait()
+            self.process.stdin.close()
+            self.process.stderr.close()
+            self.process = None
+            self.logger.debug(f"No frames were written to {self.file_path}")
+            return
+        try:
+            self.process.stdin.close()
+        except OSError as e:
+            self.error = self.error or e
+        stderr = self.process.stderr.read().decode(errors="replace").strip()
+        self.process.stderr.close()
+        return_code = self.process.wait()
+        self.process = None
+
+        if return_code != 0 or self.error is not None:
+            self.logger.error(f"ffmpeg failed to encode {self.file_path} (exit code {return_code}): {stderr}")
+            raise IOError(f"ffmpeg failed to encode {self.file_path} (exit code {return_code}): {stderr or self.error}")
+        else:
+            self.logger.debug(f"Wrote {self.frame_count} frames to {self.file_path}")
+
+
+def open_video_writer(file_path: str, fps: float, frame_size: tuple):
+    """
+    Open a video file for writing with the writer selected by Config.VIDEO_WRITER.
+
+    Args:
+        file_path (str): The file path of the video.
+        fps (float): The frame rate of the video.
+        frame_size (tuple): The (width, height) of the frames.
+
+    Returns:
+        cv2.VideoWriter or FFmpegVideoWriter: The video writer.
+    """
+    frame_size = (int(frame_size[0]), int(frame_size[1]))
+    if Config.VIDEO_WRITER == "ffmpeg":
+        if shutil.which(Config.FFMPEG_BINARY):
+            return FFmpegVideoWriter(file_path, fps, frame_size)
+        Logger(name="VideoWriter").warning(f"{Config.FFMPEG_BINARY} is not found, using OpenCV to write videos")
+    elif Config.VIDEO_WRITER != "opencv":
+        raise ValueError(f"Invalid video writer: {Config.VIDEO_WRITER}")
+
+    return cv2.VideoWriter(
+        str(file_path),
+        apiPreference=0,
+        fourcc=cv2.VideoWriter_fourcc(*Config.VIDEO_WRITER_FOURCC),
+        fps=fps,
+        frameSize=frame_size,
+    )
@@ -5,27 +5,47 @@ in a given video asynchronously
 """
 import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 from src.common.config import Config
+from src.common.frame_ring_buffer import FrameRingBuffer
 from src.common.libraries import *
 from src.common.logger import Logger
+from src.common.video_reader import open_video
+from src.common.video_writer import open_video_writer
+from src.facedetector.detection_cache import DetectionCache
+from src.facedetector.detections import Detections
+from src.facedetector.monitored_queue import MonitoredQueue
+from src.facedetector.reorder_buffer import ReorderBuffer
+from src.facedetector.resized_face_detector import ResizedFaceDetector, get_detection_scale
+from src.facedetector.scene_detector import SceneCutDetector
 from src.utils.utils import get_current_time
 
 
 class AsyncFaceDetector:
-    def __init__(self, video: Video, destination: str = None):
+    def __init__(self, video: Video, destination: str = None, detection_resolution=None):
         self.input_file = video.get_filename()
         self.output_file = ""
         self.logger = None
         self.video_capture = None
         self.video_writer = None
         self.total_frames = 0
+        self.frame_width = 0
+        self.frame_height = 0
+        # long side of the frames given to the face detector, see Config.FACE_DETECTOR_RESOLUTION
+        self.detection_resolution = detection_resolution
         self.num_processing_workers = Config.FACE_DETECTOR_NUM_WORK_THREADS
+        self.batch_size = max(1, Config.FACE_DETECTOR_BATCH_SIZE)
         self.face_detector = None
         self.output_folder = destination
+        self.scene_detector = SceneCutDetector() if Config.FACE_DETECTOR_DETECT_SCENE_CUTS else None
+        self.scene_cuts = []
+        # faces of the frames written to the output video, stored in the detection cache at the end
+        self.detection_cache = DetectionCache() if Config.FACE_DETECTOR_CACHE_ENABLED else None
+        self.detected_faces = {}
 
-        # Create a queue to store the frames from the video
-        self.frames_queue = asyncio.Queue()
+        # Create a bounded queue to store the frames from the video, the reader waits while it is full
+        self.frames_queue = MonitoredQueue("frames_queue", maxsize=max(1, Config.FACE_DETECTOR_QUEUE_SIZE))
 
         self._initialize_detector()
         self._initialize_face_detection()
@@ -57,41 +77,228 @@ class AsyncFaceDetector:
 
         try:
             # Create an instance of the video capture object
-            self.video_capture = cv2.VideoCapture(str(self.input_file))
+            self.video_capture = open_video(self.input_file)
 
             # Check if the video capture object is opened
             if not self.video_capture.isOpened():
                 self.logger.error("Unable to open video file")
                 return
 
-            fourcc = cv2.VideoWriter_fourcc("m", "p", "4", "v")
             video_fps = (self.video_capture.get(cv2.CAP_PROP_FPS),)
             self.total_frames = int(self.video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
             height = self.video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT)
             width = self.video_capture.get(cv2.CAP_PROP_FRAME_WIDTH)
+            self.frame_width, self.frame_height = int(width), int(height)
 
             self.logger.info(f"Frame Per second: {video_fps}")
             self.logger.info(f"Total Frames: {self.total_frames}")
             self.logger.info(f"Height: {height}, Width: {width}")
 
-            self.video_writer = cv2.VideoWriter(
-                str(self.output_file),
-                apiPreference=0,
-                fourcc=fourcc,
-                fps=video_fps[0],
-                frameSize=(int(width), int(height)),
-            )
+            # frames are encoded in the background while the faces of the next frames are detected
+            self.video_writer = open_video_writer(self.output_file, video_fps[0], (width, height))
             self.logger.debug("Initialization done. Video is taken from input folder")
         except Exception as e:
             self.logger.error("Failed to initialize face detection system due to {}".format(str(e)))
 
+    def initialize_approach(self, async_approach, face_detector):
+        """
+        give an approach the members of this instance, the methods stay bound to this instance, and a logger named
+        after the approach
+        """
+        for attr in dir(self):
+            if not attr.startswith("__"):
+                setattr(async_approach, attr, getattr(self, attr))
+        async_approach.face_detector = face_detector
+
+        async_approach.logger = Logger(name=async_approach.__class__.__name__)
+        async_approach.logger.add_file_handler("face_detection.log")
+
+    async def _get_batch(self):
+        """take the next batch of frames from the queue, the batch is shorter or empty at the end of the video"""
+        batch = []
+        while len(batch) < self.batch_size:
+            item = await self.frames_queue.get()
+            if item is None:
+                # the sentinel stays on the queue for the other workers
+                self.frames_queue.put_nowait(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _log_queue_usage(self, *queues):
+        """log the high-water marks of the queues between the stages, they bound the frames held in memory"""
+        for queue in queues:
+            self.logger.info(queue.usage())
+        high_water_mark = getattr(self.video_writer, "high_water_mark", None)
+        if high_water_mark is not None:
+            self.logger.info(f"video_writer: high-water mark {high_water_mark}/{self.video_writer.queue_size}")
+
+    def _detect_scene_cut(self, frame_index: int, frame):
+        """check if a frame that was just read starts a new scene and tell the face detector about it"""
+        if self.scene_detector is None or not self.scene_detector.is_scene_cut(frame_index, frame):
+            return False
+        self.scene_cuts.append(frame_index)
+        self.face_detector.add_scene_cuts([frame_index])
+        self.logger.debug(f"Scene cut detected at frame {frame_index}")
+        return True
+
+    def _record_faces(self, frame_index: int, faces):
+        """keep the faces of a frame for the detection cache"""
+        if self.detection_cache is not None:
+            self.detected_faces[frame_index] = faces
+
+    def _write_frame(self, frame_index: int, frame, faces):
+        """draw the faces on a frame and write it to the output video"""
+        self._record_faces(frame_index, faces)
+        if len(faces):
+            self._draw_bounding_boxes(frame, faces)
+        self.video_writer.write(frame)
+
+    async def _write_frame_async(self, frame_index: int, frame, faces):
+        """
+        _write_frame for the coroutines of the event loop. The video writer blocks while the encoder is behind,
+        then the frame is written from a worker thread, so that the reader and the detection go on meanwhile.
+        """
+        is_full = getattr(self.video_writer, "is_full", None)
+        if is_full is not None and is_full():
+            await asyncio.to_thread(self._write_frame, frame_index, frame, faces)
+        else:
+            self._write_frame(frame_index, frame, faces)
+
+    async def _release_video_writer(self):
+        """finish the output video in a worker thread, the video writer waits for the encoder"""
+        await asyncio.to_thread(self.video_writer.release)
+
+    async def _read_frames_into_queue(self, reorder_buffer=None, frame_buffer=None):
+        """
+        Read the frames of the video and put them on the queue along with their index, then the sentinel. The
+        frames are decoded into the free slots of the frame buffer and the slots are put on the queue, if one is given.
+        """
+        frame_index = 0
+        while True:
+            if frame_buffer is None:
+                ret, frame = self.video_capture.read()
+                item = frame
+            else:
+                # the frame is decoded directly into the slot
+                item = await frame_buffer.acquire()
+                ret = frame_buffer.read(self.video_capture, item)
+                frame = frame_buffer.frames[item]
+            if not ret:
+                if frame_buffer is not None:
+                    frame_buffer.release(item)
+                self.logger.debug("Unable to retrieve frame from video stream, breaking loop")
+                break
+            self._detect_scene_cut(frame_index, frame)
+            await self.frames_queue.put((frame_index, item))
+            self.logger.debug(f"Put frame {frame_index} on queue")
+            frame_index += 1
+
+        # sentinel for the detection of faces
+        await self.frames_queue.put(None)
+        if reorder_buffer is not None:
+            await reorder_buffer.close(frame_index)
+
+    async def _detect_batches_from_queue(self, detect_batch, max_tasks: int):
+        """
+        Take the batches of frames from the queue until the sentinel and run detect_batch for each of them in a task.
+        At most max_tasks batches are detected at the same time, the next frames wait in the bounded queue.
+        """
+        self.logger.info(f"Number of frames per batch: {self.batch_size}")
+        tasks = set()
+        while True:
+            # the batches are taken one after another, so that they are consecutive frames of the video
+            batch = await self._get_batch()
+            if not batch:
+                self.logger.debug("Queue is empty, breaking loop")
+                break
+            tasks.add(asyncio.create_task(detect_batch(batch)))
+            # a task also waits for the writer once its frames are too far ahead of the last written frame
+            if len(tasks) >= max_tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                # a failed detection is raised here
+                for task in done:
+                    task.result()
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    async def _detect_batches_in_executor(self, executor, reorder_buffer, max_tasks: int):
+        """
+        Detect faces in the batches of frames from the queue in the threads of the executor, or of the default executor
+        of the event loop when it is None, and put the frames with faces in the reorder buffer
+        """
+        loop = asyncio.get_running_loop()
+
+        async def detect_batch(batch: list):
+            frame_indices, frames = zip(*batch)
+            # Detect faces in all the frames of the batch, the event loop goes on meanwhile
+            faces = await loop.run_in_executor(executor, self.face_detector.detect_faces_batch, frames)
+            # the reorder buffer is used in the event loop only, it is not thread safe
+            await self._put_detected_frames(reorder_buffer, frame_indices, frames, faces)
+
+        await self._detect_batches_from_queue(detect_batch, max_tasks)
+
+    async def _detect_batches_in_thread_pool(self, reorder_buffer):
+        """batches of frames are processed concurrently, one batch per thread is taken from the queue at a time"""
+        self.logger.info(f"Maximum number of threads used: {self.num_processing_workers}")
+        with ThreadPoolExecutor(max_workers=self.num_processing_workers) as executor:
+            await self._detect_batches_in_executor(executor, reorder_buffer, self.num_processing_workers)
+
+    async def _put_detected_frames(self, reorder_buffer, frame_indices, items, faces):
+        """put the frames (or their slots) of a batch with their faces in the reorder buffer"""
+        for frame_index, item, frame_faces in zip(frame_indices, items, faces.split(len(items))):
+            # waits while the frame is too far ahead of the last written frame
+            await reorder_buffer.put(frame_index, (item, frame_faces))
+        self.logger.debug(f"Put frames with faces in the reorder buffer at indices {frame_indices}")
+
+    async def _write_frames_from_reorder_buffer(self, reorder_buffer, frame_buffer=None):
+        """
+        Write the frames with faces to the output video in order, while the next frames are detected, and finish
+        the output video. The slots are given back to the frame buffer once they are written, if one is given.
+        """
+        async for frame_index, (item, faces) in reorder_buffer:
+            if frame_buffer is None:
+                await self._write_frame_async(frame_index, item, faces)
+            else:
+                # the faces are drawn on the slot in place, the video writer copies the frame
+                await self._write_frame_async(frame_index, frame_buffer.frames[item], faces)
+                frame_buffer.release(item)
+            self.logger.debug(f"Wrote frame {frame_index} with faces to output video")
+        await self._release_video_writer()
+        self.logger.info("Finished writing to output video")
+
+    async def _read_detect_and_write(self, detect_faces):
+        """
+        Read the frames into the queue, detect their faces with the detection strategy of an approach and write
+        them to the output video in order, all at the same time. detect_faces takes the batches from the queue and
+        puts the frames with faces in the given reorder buffer.
+        """
+        # holds the frames with faces which are waiting for the frames before them
+        reorder_buffer = ReorderBuffer(Config.FACE_DETECTOR_REORDER_WINDOW)
+        await asyncio.gather(
+            self._read_frames_into_queue(reorder_buffer),
+            detect_faces(reorder_buffer),
+            self._write_frames_from_reorder_buffer(reorder_buffer),
+        )
+        self._log_queue_usage(self.frames_queue, reorder_buffer)
+
+    def _write_cached_frames(self, detections: Detections):
+        """write the frames of the input video with the faces loaded from the detection cache"""
+        try:
+            # every frame is decoded into the same slot, the video writer copies it
+            frame_buffer = FrameRingBuffer(1, (self.frame_height, self.frame_width, 3))
+            frame_index = 0
+            while frame_buffer.read(self.video_capture, 0):
+                self._write_frame(frame_index, frame_buffer.frames[0], detections.for_frames(frame_index))
+                frame_index += 1
+            self.logger.info(f"Wrote {frame_index} frames with cached faces to output video")
+        finally:
+            self.video_capture.release()
+            self.video_writer.release()
+
     def _draw_bounding_boxes(self, frame, faces):
         """draw bounding boxes with the given faces on a given frame"""
-        for face in faces:
-            if self.face_detector.__class__.__name__ == "ViolaJones":
-                x, y, w, h = face
-            else:
-                x, y, w, h = face["box"]
+        for x, y, w, h in faces.boxes.tolist():
             cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
         return frame
 
@@ -99,10 +306,57 @@ class AsyncFaceDetector:
         """
         Detect faces in a video in real-time and write the frames with faces to an output video file
         """
-        # added to maintain compatibility while drawing bounding boxes
-        self.face_detector = face_detector
         self.logger.info(
             f"Detecting faces in video using face detector: {face_detector.__class__.__name__} and approach: {async_approach.__class__.__name__}"
         )
-        await async_approach.detect_faces_in_realtime(self, face_detector)
-        return Video(self.output_file)
+
+        # frames are downscaled once before the detection, the faces are mapped back to the original frames
+        scale = get_detection_scale(self.frame_width, self.frame_height, self.detection_resolution, face_detector)
+
+        cache_key = None
+        if self.detection_cache is not None:
+            cache_key = self.detection_cache.get_key(self.input_file, face_detector, scale)
+            cached = self.detection_cache.load(cache_key)
+            if cached is not None:
+                detections, self.scene_cuts = cached
+                self.logger.info("Faces of the video are cached, skipping face detection")
+                await asyncio.to_thread(self._write_cached_frames, detections)
+                return self._get_output_video()
+
+        if scale < 1.0:
+            self.logger.info(f"Detecting faces on frames downscaled by {scale:.3f}")
+            face_detector = ResizedFaceDetector(face_detector, scale)
+
+        # added to maintain compatibility while drawing bounding boxes
+        self.face_detector = face_detector
+        if face_detector.sequential:
+            # frames have to be given to the face detector one after another in order
+            self.num_processing_workers = 1
+            self.logger.info("Face detector is sequential, frames are processed by a single worker")
+        try:
+            self.logger.info("Face detection started...")
+            # the approach reads the frames, detects the faces and writes the output video
+            await async_approach.detect_faces_in_realtime(self, face_detector)
+        except Exception as e:
+            self.logger.error("Failed to detect faces from the given video file due to {}".format(str(e)))
+            raise FaceDetectionError(str(e))
+        finally:
+            self.video_capture.release()
+            cv2.destroyAllWindows()
+
+            if self.video_writer:
+                self.video_writer.release()
+        self.logger.debug("Finished detecting faces in real-time")
+        self.logger.info(f"Number of scene cuts: {len(self.scene_cuts)}")
+
+        if cache_key is not None:
+            detections = Detections.concatenate(
+                faces.with_frame_idx(frame_index) for frame_index, faces in self.detected_faces.items()
+            )
+            self.detection_cache.save(cache_key, detections, self.scene_cuts)
+        return self._get_output_video()
+
+    def _get_output_video(self):
+        video = Video(self.output_file)
+        video.set_scene_cuts(self.scene_cuts)
+        return video
@@ -5,13 +5,15 @@ This class uses the asyncio library and concurrent futures for concurrency
 
 Functionality:
 
-1. A video is read frame by frame and the frames are added to a async queue.
-2. The frames are processed concurrently using concurrent futures and added to a output async queue.
-3. For each frame, the face detection function is called, which detects faces in the frame.
-4. The frames with faces stored in list are written to final_frames (with boxes) as soon as the output queue is available.
-5. All the processed frames are written to video writer
+1. A video is read frame by frame and the frames are added to a bounded async queue (FACE_DETECTOR_QUEUE_SIZE).
+2. The frames are processed concurrently in batches using concurrent futures and added to a bounded
+reorder buffer (FACE_DETECTOR_REORDER_WINDOW). A stage waits while the buffer in front of the next stage is full.
+3. For each batch of frames, the face detection function is called, which detects faces in all the frames at once.
+4. The frames with faces are taken from the reorder buffer in the order of the video.
+5. The frames are written to video writer as soon as all the frames before them have been processed.
 
-Note: (4) write operation is performed asynchronously
+Note: (4) and (5) are performed asynchronously, the frames are encoded by the video writer in the background
+(see src/common/video_writer.py)
 
 Background:
 
@@ -56,9 +58,6 @@ Memory usage of 'main': 1588.00 MB
 Average CPU usage of 'main': 41.65%
 """
 
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
-
 from src.common.libraries import *
 
 
@@ -66,119 +65,11 @@ class AsyncIOAndCPUFaceDetector:
     def __init__(self):
         self.face_detector = None
 
-        # create a queue to store the frames with faces and index to track the order of the frames
-        self.frame_with_faces_queue = asyncio.Queue()
-
-        # create a list to store the final processed frames
-        self.final_frames = None
-
-    def _initialize(self, async_detector, face_detector):
-        self.face_detector = face_detector
-
-        # get the members of AsyncFaceDetector instance
-        for attr in dir(async_detector):
-            if not attr.startswith("__"):
-                setattr(self, attr, getattr(async_detector, attr))
-
-        self.logger = Logger(name=self.__class__.__name__)
-        self.logger.add_file_handler("face_detection.log")
-
-    async def _read_frames(self):
-        """Read frames from the input video stream and put them on the queue"""
-        while True:
-            ret, frame = self.video_capture.read()
-            if not ret:
-                self.logger.debug("Unable to retrieve frame from video stream, breaking loop")
-                break
-            await self.frames_queue.put(frame)
-            self.logger.debug("Put frame on queue")
-
-    def _detect_and_enqueue_faces(self, frame_index: int):
-        """Detect faces in the given frame index and enqueue frames and faces information"""
-        try:
-            frame = self.frames_queue.get_nowait()
-        except asyncio.QueueEmptyException:
-            self.logger.error("Queue is empty, returning back")
-            return
-
-        if frame is None:
-            self.logger.debug("Queue is empty, breaking loop")
-            return
-
-        # Detect faces in the frame
-        faces = self.face_detector.detect_faces(frame)
-        frame_index, frame_with_faces = frame_index, (frame, faces)
-
-        try:
-            self.frame_with_faces_queue.put_nowait((frame_index, frame_with_faces))
-        except asyncio.QueueFull:
-            self.logger.error("Queue is full, skipping frame")
-        self.logger.debug(f"Enqueued frame with faces to frame_with_faces_queue at index {frame_index}")
-
-    async def _detect_faces_cpu_bound(self):
-        """frames are processed concurrently"""
-        await asyncio.sleep(2)
-        self.logger.info(f"Maximum number of threads used: {self.num_processing_workers}")
-        with ThreadPoolExecutor(max_workers=self.num_processing_workers) as executor:
-            loop = asyncio.get_event_loop()
-            futures = [
-                loop.run_in_executor(executor, self._detect_and_enqueue_faces, i) for i in range(self.total_frames)
-            ]
-            for f in asyncio.as_completed(futures):
-                await f
-        # sentinel for write to output from queue
-        await self.frame_with_faces_queue.put(None)
-
-    async def _write_to_output_from_queue(self):
-        """Write the frames with faces to an output video file"""
-        while True:
-            try:
-                result = await self.frame_with_faces_queue.get()
-                if result is None:
-                    self.logger.debug("Unable to write frame to the video, breaking loop")
-                    break
-                frame_index, frame_and_faces = result
-                frame, faces = frame_and_faces
-                if faces:
-                    frame = self._draw_bounding_boxes(frame, faces)
-                self.final_frames[frame_index] = frame
-                self.logger.debug(f"Saved frame at index: {frame_index}")
-            except Exception as e:
-                self.logger.error(f"Error while writing frame to video: {e}")
-                break
-        self.logger.info("Finished saving frames")
-
-    def _finish_video_writer(self):
-        for frame in self.final_frames:
-            self.video_writer.write(frame)
-        self.video_writer.release()
-        self.logger.debug("Finished writing video to output file")
-
     async def detect_faces_in_realtime(self, async_detector, face_detector):
         """
         Detect faces in a video in real-time and write the frames with faces to an output video file
         """
-        self._initialize(async_detector, face_detector)
-        try:
-            self.final_frames = [None] * self.total_frames
-
-            self.logger.info("Face detection started...")
-            tasks = [
-                self._read_frames(),
-                asyncio.ensure_future(self._detect_faces_cpu_bound()),
-                self._write_to_output_from_queue(),
-            ]
-            await asyncio.gather(*tasks)
-
-            self._finish_video_writer()
-        except Exception as e:
-            self.logger.error("Failed to detect faces from the given video file due to {}".format(str(e)))
-            raise FaceDetectionError(str(e))
-        finally:
-            self.video_capture.release()
-            cv2.destroyAllWindows()
-
-            if self.video_writer:
-                self.video_writer.release()
-
-        self.logger.debug("Finished detecting faces in real-time")
+        # get the members of AsyncFaceDetector instance
+        async_detector.initialize_approach(self, face_detector)
+        # reading and writing are I/O-bound and run in the event loop, the CPU-bound detection runs in threads
+        await self._read_detect_and_write(self._detect_batches_in_thread_pool)
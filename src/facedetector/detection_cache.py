@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+This module contains the DetectionCache class, which keeps the faces detected in a video in sidecar files
+so that the same video is not processed twice.
+
+Functionality:
+------------------------------------------------------------------------------------------------
+
+1. The key of a video is the SHA-256 hash of its content, combined with the type and parameters of the
+face detector, the scale of the frames given to it and the settings of the scene cut detection.
+2. The faces of all frames of the video (and its scene cuts) are stored in a compressed .npz file named
+after the key, in FACE_DETECTOR_CACHE_PATH.
+3. When the key of a video is found, the faces are loaded from the file and the detection is skipped.
+4. The modification time of a file is updated every time it is used. When the files take more than
+FACE_DETECTOR_CACHE_MAX_SIZE bytes, the least recently used files are removed.
+5. Several jobs may use the cache at once. A failure of the cache (e.g. a file removed by another job) is logged
+as a warning and the job goes on without the cache.
+
+Background:
+
+1. The same upload is often processed several times (e.g. by the face detection API and by the translation
+unit), and the detection is by far the most expensive part of processing a video.
+"""
+
+import hashlib
+import json
+import tempfile
+
+from src.common.libraries import *
+from src.facedetector.detections import Detections
+
+# suffix of the files which are being written, np.savez_compressed adds .npz to other file names
+TEMPORARY_SUFFIX = ".tmp.npz"
+
+
+class DetectionCache:
+    """
+    DetectionCache class stores and loads the faces detected in videos.
+    """
+
+    def __init__(self, cache_folder: str = None, max_size: int = None):
+        """
+        Initialize the class.
+
+        Args:
+            cache_folder (str): The folder of the sidecar files, Config.FACE_DETECTOR_CACHE_PATH is used by default.
+            max_size (int): The maximum total size of the sidecar files in bytes,
+                Config.FACE_DETECTOR_CACHE_MAX_SIZE is used by default.
+        """
+        self.cache_folder = str(cache_folder or Config.FACE_DETECTOR_CACHE_PATH)
+        self.max_size = Config.FACE_DETECTOR_CACHE_MAX_SIZE if max_size is None else max_size
+        os.makedirs(self.cache_folder, exist_ok=True)
+
+        self.logger = Logger(name=self.__class__.__name__)
+        self.logger.add_file_handler("face_detection.log")
+
+    @staticmethod
+    def get_content_hash(video_file: str) -> str:
+        """
+        Get the SHA-256 hash of the content of a video file, the file is read in chunks.
+        """
+        content_hash = hashlib.sha256()
+        with open(video_file, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                content_hash.update(chunk)
+        return content_hash.hexdigest()
+
+    def get_key(self, video_file: str, face_detector, detection_scale: float = 1.0) -> str:
+        """
+        Get the key of the faces detected in a video. The scene cuts change the faces found by the tracking
+        and roi modes, so the settings of the scene cut detection are part of the key as well.
+
+        Args:
+            video_file (str): The path of the video file.
+            face_detector (FaceDetector): The face detector, its type and parameters are part of the key.
+            detection_scale (float): The scale of the frames given to the face detector.
+
+        Returns:
+            str: The key of the faces detected in the video.
+        """
+        params = json.dumps(
+            {
+                "detector": face_detector.get_params(),
+                "scale": round(detection_scale, 6),
+                "scene_cuts": {
+                    "enabled": Config.FACE_DETECTOR_DETECT_SCENE_CUTS,
+                    "threshold": Config.FACE_DETECTOR_SCENE_CUT_THRESHOLD,
+                    "min_scene_length": Config.FACE_DETECTOR_MIN_SCENE_LENGTH,
+                },
+            },
+            sort_keys=True,
+        )
+        key = hashlib.sha256()
+        key.update(self.get_content_hash(video_file).encode())
+        key.update(params.encode())
+        return key.hexdigest()
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.cache_folder, f"{key}.npz")
+
+    def load(self, key: str):
+        """
+        Load the faces stored with the given key.
+
+        Args:
+            key (str): The key returned by get_key.
+
+        Returns:
+            tuple: The detections of all frames (frame_idx is the index of the frame in the video) and the list of
+            scene cuts, None if nothing is stored with the key.
+        """
+        path = self._get_path(key)
+        if not os.path.exists(path):
+            self.logger.debug(f"No detections cached for key {key}")
+            return None
+
+        try:
+            with np.load(path) as sidecar:
+                detections = Detections(sidecar["detections"])
+                scene_cuts = sidecar["scene_cuts"].tolist()
+        except Exception as e:
+            self.logger.warning(f"Failed to load cached detections from {path} due to {e}")
+            return None
+
+        try:
+            # mark the file as recently used
+            os.utime(path)
+        except OSError as e:
+            # the file was removed by another job after it was loaded
+            self.logger.debug(f"Failed to update the modification time of {path} due to {e}")
+        self.logger.info(f"Loaded {len(detections)} cached detections from {path}")
+        return detections, scene_cuts
+
+    def save(self, key: str, detections: Detections, scene_cuts: list = None):
+        """
+        Store the faces detected in a video with the given key and remove the least recently used files
+        when the cache is full. A failure is logged, the faces are then not cached.
+
+        Args:
+            key (str): The key returned by get_key.
+            detections (Detections): The detections of all frames, frame_idx is the index of the frame in the video.
+            scene_cuts (list): The indices of the frames which start a new scene.
+        """
+        path = self._get_path(key)
+        temporary_path = None
+        try:
+            # written to a temporary file of this job first, so that a partially written file is never loaded
+            file_descriptor, temporary_path = tempfile.mkstemp(
+                dir=self.cache_folder, prefix=f"{key}.", suffix=TEMPORARY_SUFFIX
+            )
+            os.close(file_descriptor)
+            np.savez_compressed(
+                temporary_path, detections=detections.array, scene_cuts=np.asarray(scene_cuts or [], dtype=np.int32)
+            )
+            os.replace(temporary_path, path)
+            temporary_path = None
+            self.logger.info(f"Saved {len(detections)} detections to {path}")
+            self._evict(keep=path)
+        except Exception as e:
+            self.logger.warning(f"Failed to cache the detections in {path} due to {e}")
+        finally:
+            if temporary_path is not None and os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def _evict(self, keep: str = None):
+        """
+        Remove the least recently used files until the total size is within the limit. The temporary files of
+        the jobs which are writing to the cache and the file keep (the one just saved) are never removed.
+        """
+        entries = []
+        for filename in os.listdir(self.cache_folder):
+            path = os.path.join(self.cache_folder, filename)
+            if not filename.endswith(".npz") or filename.endswith(TEMPORARY_SUFFIX):
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # removed by another job
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                self.logger.debug(f"Removed least recently used detections {path}")
+            except FileNotFoundError:
+                pass
+            total_size -= size
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+This module contains the Detections class, which holds the faces detected by a face detector
+in one or more frames.
+
+Functionality:
+------------------------------------------------------------------------------------------------
+
+1. Faces are stored in a NumPy structured array with one row per face: the index of the frame (frame_idx),
+the box (x, y, w, h) as int32 and the score as float32.
+2. Detectors which find facial landmarks add a landmarks column with the (x, y) coordinates of the
+5 points in LANDMARK_NAMES.
+3. The rows are sorted by frame_idx, so the faces of a range of frames are a slice of the array.
+
+Background:
+
+1. The detectors used to return a list of dictionaries (MTCNN) or a list of tuples (ViolaJones), and the code
+reading them had to know which detector produced them. Allocating a dictionary per face was also the
+largest cost on the hot path after the detection itself.
+
+2. A single array format lets drawing, tracking and serialization work on all faces at once.
+"""
+
+from src.common.libraries import *
+
+# names of the facial landmarks, in the order of the landmarks column
+LANDMARK_NAMES = ("left_eye", "right_eye", "nose", "mouth_left", "mouth_right")
+
+DETECTIONS_DTYPE = np.dtype(
+    [
+        ("frame_idx", np.int32),
+        ("x", np.int32),
+        ("y", np.int32),
+        ("w", np.int32),
+        ("h", np.int32),
+        ("score", np.float32),
+    ]
+)
+
+DETECTIONS_WITH_LANDMARKS_DTYPE = np.dtype(DETECTIONS_DTYPE.descr + [("landmarks", np.int32, (len(LANDMARK_NAMES), 2))])
+
+
+class Detections:
+    """
+    Detections class holds the faces detected in one or more frames in a structured array.
+
+    Attributes:
+        array (numpy.ndarray): The structured array of the faces, sorted by frame_idx.
+    """
+
+    def __init__(self, array: np.ndarray = None, with_landmarks: bool = False):
+        """
+        The constructor for the Detections class.
+
+        Args:
+            array (numpy.ndarray): A structured array with the dtype DETECTIONS_DTYPE or
+                DETECTIONS_WITH_LANDMARKS_DTYPE, sorted by frame_idx. An empty array is used by default.
+            with_landmarks (bool): Whether the empty array has a landmarks column, when array is not given.
+        """
+        if array is None:
+            array = np.empty(0, dtype=DETECTIONS_WITH_LANDMARKS_DTYPE if with_landmarks else DETECTIONS_DTYPE)
+        self.array = array
+
+    @classmethod
+    def from_boxes(cls, boxes, scores=None, landmarks=None, frame_idx=0):
+        """
+        Create detections from arrays of boxes, scores and landmarks.
+
+        Args:
+            boxes: The boxes of the faces with shape (N, 4) in the format (x, y, width, height).
+            scores: The scores of the faces with shape (N,), 1.0 is used by default.
+            landmarks: The landmarks of the faces with shape (N, 5, 2), optional.
+            frame_idx: The index of the frame of all faces, or of each face with shape (N,).
+
+        Returns:
+            Detections: The detections, sorted by frame_idx.
+        """
+        boxes = np.asarray(boxes).reshape(-1, 4)
+        dtype = DETECTIONS_DTYPE if landmarks is None else DETECTIONS_WITH_LANDMARKS_DTYPE
+        array = np.empty(len(boxes), dtype=dtype)
+        array["frame_idx"] = frame_idx
+        array["x"], array["y"], array["w"], array["h"] = boxes.T
+        array["score"] = 1.0 if scores is None else scores
+        if landmarks is not None:
+            array["landmarks"] = np.asarray(landmarks).reshape(-1, len(LANDMARK_NAMES), 2)
+        if np.ndim(frame_idx):
+            array = array[np.argsort(array["frame_idx"], kind="stable")]
+        return cls(array)
+
+    @classmethod
+    def concatenate(cls, detections_list):
+        """
+        Concatenate detections, the frame indices of the given detections are kept.
+
+        Args:
+            detections_list (list[Detections]): The detections to concatenate.
+
+        Returns:
+            Detections: The detections of all the given detections, sorted by frame_idx.
+        """
+        detections_list = list(detections_list)
+        if not detections_list:
+            return cls()
+        if any(detections.has_landmarks != detections_list[0].has_landmarks for detections in detections_list):
+            # landmarks can not be kept for faces which do not have them
+            detections_list = [detections.without_landmarks() for detections in detections_list]
+        array = np.concatenate([detections.array for detections in detections_list])
+        return cls(array[np.argsort(array["frame_idx"], kind="stable")])
+
+    @classmethod
+    def from_frames(cls, detections_per_frame):
+        """
+        Combine the detections of consecutive frames, the faces of the i-th detections are given frame_idx i.
+
+        Args:
+            detections_per_frame (list[Detections]): The detections of every frame.
+
+        Returns:
+            Detections: The detections of all frames.
+        """
+        return cls.concatenate(
+            detections.with_frame_idx(frame_idx) for frame_idx, detections in enumerate(detections_per_frame)
+        )
+
+    def __len__(self):
+        return len(self.array)
+
+    def __getitem__(self, index):
+        """Select faces with an integer, a slice, an index array or a boolean mask"""
+        return Detections(np.atleast_1d(self.array[index]))
+
+    def __repr__(self):
+        return f"Detections(faces={len(self)}, frames={len(np.unique(self.frame_idx))})"
+
+    @property
+    def has_landmarks(self) -> bool:
+        return "landmarks" in self.array.dtype.names
+
+    @property
+    def frame_idx(self) -> np.ndarray:
+        return self.array["frame_idx"]
+
+    @property
+    def scores(self) -> np.ndarray:
+        return self.array["score"]
+
+    @property
+    def boxes(self) -> np.ndarray:
+        """The boxes of the faces with shape (N, 4) in the format (x, y, width, height)"""
+        return np.stack([self.array["x"], self.array["y"], self.array["w"], self.array["h"]], axis=1)
+
+    @property
+    def landmarks(self):
+        """The landmarks of the faces with shape (N, 5, 2), None if the detector does not find landmarks"""
+        return self.array["landmarks"] if self.has_landmarks else None
+
+    def for_frames(self, start: int, stop: int = None):
+        """
+        Get the faces of a range of frames.
+
+        Args:
+            start (int): The index of the first frame.
+            stop (int): The index after the last frame, start + 1 is used by default.
+
+        Returns:
+            Detections: The faces with start <= frame_idx < stop.
+        """
+        stop = start + 1 if stop is None else stop
+        first, last = np.searchsorted(self.frame_idx, [start, stop])
+        return Detections(self.array[first:last])
+
+    def split(self, num_frames: int):
+        """
+        Split the detections into the detections of every frame.
+
+        Args:
+            num_frames (int): The number of frames, frames without faces get empty detections.
+
+        Returns:
+            list[Detections]: The detections of the frames 0 to num_frames - 1, in the order of the frames.
+        """
+        bounds = np.searchsorted(self.frame_idx, np.arange(num_frames + 1))
+        return [Detections(self.array[bounds[i] : bounds[i + 1]]) for i in range(num_frames)]
+
+    def with_frame_idx(self, frame_idx: int):
+        """Get a copy of the detections with the frame index of all faces set to frame_idx"""
+        array = self.array.copy()
+        array["frame_idx"] = frame_idx
+        return Detections(array)
+
+    def without_landmarks(self):
+        """Get a copy of the detections without the landmarks column"""
+        if not self.has_landmarks:
+            return self
+        array = np.empty(len(self), dtype=DETECTIONS_DTYPE)
+        for name in DETECTIONS_DTYPE.names:
+            array[name] = self.array[name]
+        return Detections(array)
+
+    def transformed(self, scale: float = 1.0, dx: float = 0.0, dy: float = 0.0):
+        """
+        Get a copy of the detections with every point p moved to p * scale + (dx, dy).
+        The width and height of the boxes are multiplied by scale.
+
+        Args:
+            scale (float): The scale of the boxes and landmarks.
+            dx (float): The horizontal offset, either a number or an array with one offset per face.
+            dy (float): The vertical offset, either a number or an array with one offset per face.
+
+        Returns:
+            Detections: The transformed detections.
+        """
+        array = self.array.copy()
+        array["x"] = np.round(self.array["x"] * scale + dx)
+        array["y"] = np.round(self.array["y"] * scale + dy)
+        array["w"] = np.round(self.array["w"] * scale)
+        array["h"] = np.round(self.array["h"] * scale)
+        if self.has_landmarks:
+            offset = np.stack(np.broadcast_arrays(dx, dy), axis=-1).reshape(-1, 1, 2)
+            array["landmarks"] = np.round(self.array["landmarks"] * np.reshape(scale, (-1, 1, 1)) + offset)
+        return Detections(array)
+
+    def to_list(self):
+        """
+        Convert the detections to a list of dictionaries which can be serialized to JSON.
+
+        Returns:
+            list[dict]: One dictionary per face with the keys frame_idx, box, score and keypoints (if available).
+        """
+        faces = []
+        for face in self.array.tolist():
+            frame_idx, x, y, w, h, score = face[:6]
+            item = {"frame_idx": frame_idx, "box": [x, y, w, h], "score": score}
+            if self.has_landmarks:
+                item["keypoints"] = dict(zip(LANDMARK_NAMES, (tuple(point) for point in face[6].tolist())))
+            faces.append(item)
+        return faces
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+export_onnx_models.py
+
+This module makes the ONNX models of the face detectors for the onnxruntime backend (src/facedetector/onnx_backend.py).
+
+Functionality:
+------------------------------------------------------------------------------------------------
+
+1. export: P-Net, R-Net and O-Net of MTCNN are exported from Keras to ONNX with tf2onnx, to
+Config.MODEL_MTCNN_ONNX_PATH. The model of RetinaFace is an ONNX model already.
+2. quantize: the float models of a detector are quantized to int8 (<name>.int8.onnx next to the float model).
+The weights are quantized per channel. The ranges of the activations are calibrated on the inputs which the
+detector gives to its models for frames of a video, read and resized as in the face detection.
+
+Usage:
+
+python -m src.facedetector.export_onnx_models export
+python -m src.facedetector.export_onnx_models quantize --detector MTCNN --video data/videos/inputs/input2.mp4
+
+Note: SSD (Caffe) and YOLO (Darknet) are run with cv2.dnn only, their models have no converter to ONNX in the
+requirements of mimasa.
+"""
+
+import argparse
+import tempfile
+
+from src.common.libraries import *
+from src.common.video_reader import open_video
+from src.facedetector.mtcnn import MTCNN_NETWORKS, MTCNNDetector
+from src.facedetector.onnx_backend import get_model_path
+from src.facedetector.resized_face_detector import ResizedFaceDetector, get_detection_scale
+from src.facedetector.retina_face import RetinaFace
+
+# detectors with an onnxruntime backend
+ONNX_FACE_DETECTORS = {"MTCNN": MTCNNDetector, "RetinaFace": RetinaFace}
+
+logger = Logger(name="OnnxExporter")
+logger.add_file_handler("face_detection.log")
+
+
+def export_mtcnn(folder: str = None):
+    """
+    Export the networks of MTCNN to ONNX.
+
+    Args:
+        folder (str): The folder of the ONNX models, Config.MODEL_MTCNN_ONNX_PATH is used by default.
+    """
+    import tensorflow as tf
+    import tf2onnx
+    from mtcnn import MTCNN
+
+    folder = str(folder or Config.MODEL_MTCNN_ONNX_PATH)
+    os.makedirs(folder, exist_ok=True)
+
+    detector = MTCNN()
+    # P-Net is run on every scale of the image pyramid, its height and width depend on the input
+    networks = {
+        "pnet": (detector._pnet, (None, None, None, 3)),
+        "rnet": (detector._rnet, (None, 24, 24, 3)),
+        "onet": (detector._onet, (None, 48, 48, 3)),
+    }
+    for name in MTCNN_NETWORKS:
+        model, shape = networks[name]
+        output_path = os.path.join(folder, f"{name}.onnx")
+        signature = (tf.TensorSpec(shape, tf.float32, name="input"),)
+        tf2onnx.convert.from_keras(model, input_signature=signature, opset=13, output_path=output_path)
+        logger.info(f"Exported {name} of MTCNN to {output_path}")
+
+
+def read_calibration_frames(video_file: str, num_frames: int):
+    """returns num_frames frames spread over the video"""
+    video_capture = open_video(str(video_file))
+    try:
+        total_frames = int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        step = max(1, total_frames // num_frames)
+        frames = []
+        frame_index = 0
+        while len(frames) < num_frames:
+            ret, frame = video_capture.read()
+            if not ret:
+                break
+            if frame_index % step == 0:
+                frames.append(frame)
+            frame_index += 1
+    finally:
+        video_capture.release()
+
+    if not frames:
+        raise FaceDetectionError(f"No frames could be read from {video_file}")
+    return frames
+
+
+def quantize(detector_type: str, video_file: str, num_frames: int = 32):
+    """
+    Quantize the ONNX models of a detector to int8.
+
+    Args:
+        detector_type (str): The detector, one of ONNX_FACE_DETECTORS.
+        video_file (str): The video whose frames are used to calibrate the ranges of the activations.
+        num_frames (int): The number of frames used for the calibration.
+    """
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    class RecordedInputs(CalibrationDataReader):
+        def __init__(self, inputs):
+            self.inputs = iter(inputs)
+
+        def get_next(self):
+            return next(self.inputs, None)
+
+    if detector_type not in ONNX_FACE_DETECTORS:
+        raise ValueError(f"Invalid detector type: {detector_type}")
+
+    # the float models record the inputs which the detector gives them
+    face_detector = ONNX_FACE_DETECTORS[detector_type](backend="onnxruntime", quantized=False)
+    for model in face_detector.onnx_models:
+        model.recorded_inputs = []
+
+    frames = read_calibration_frames(video_file, num_frames)
+    height, width = frames[0].shape[:2]
+    detector = ResizedFaceDetector(face_detector, get_detection_scale(width, height, face_detector=face_detector))
+    for start in range(0, len(frames), Config.FACE_DETECTOR_BATCH_SIZE):
+        detector.detect_faces_batch(frames[start : start + Config.FACE_DETECTOR_BATCH_SIZE])
+
+    for model in face_detector.onnx_models:
+        if not model.recorded_inputs:
+            logger.warning(f"{model.model_path} was not run on the frames of {video_file}, it is not quantized")
+            continue
+
+        output_path = str(get_model_path(model.model_path, quantized=True))
+        with tempfile.TemporaryDirectory() as folder:
+            # the shapes of all tensors are inferred and the graph is optimized before it is quantized
+            preprocessed_path = os.path.join(folder, os.path.basename(model.model_path))
+            quant_pre_process(model.model_path, preprocessed_path)
+            quantize_static(
+                preprocessed_path,
+                output_path,
+                RecordedInputs(model.recorded_inputs),
+                quant_format=QuantFormat.QDQ,
+                activation_type=QuantType.QUInt8,
+                weight_type=QuantType.QInt8,
+                per_channel=True,
+            )
+        logger.info(f"Quantized {model.model_path} to {output_path} with {len(model.recorded_inputs)} inputs")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Make the ONNX models of the face detectors")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="export the networks of MTCNN to ONNX")
+    export_parser.add_argument("--folder", default=None, help="folder of the models, MODEL_MTCNN_ONNX_PATH by default")
+
+    quantize_parser = subparsers.add_parser("quantize", help="quantize the ONNX models of a detector to int8")
+    quantize_parser.add_argument("--detector", choices=list(ONNX_FACE_DETECTORS), default=Config.VIDEO_DETECTOR)
+    quantize_parser.add_argument("--video", default=Config.VIDEO_INPUT_FILENAME, help="video used for calibration")
+    quantize_parser.add_argument("--frames", type=int, default=32, help="number of frames used for calibration")
+
+    args = parser.parse_args()
+    if args.command == "export":
+        export_mtcnn(args.folder)
+    else:
+        quantize(args.detector, args.video, args.frames)
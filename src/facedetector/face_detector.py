@@ -4,12 +4,48 @@ This module contains the FaceDetector class, which is an abstract base class
 for different face detection algorithms.
 """
 
+from src.facedetector.detections import Detections
+
 
 class FaceDetector:
     """
     This class is responsible for detecting faces in an image or video frame.
     """
 
+    # set by detectors which carry state from one frame to the next,
+    # the frames of a video have to be given to them one after another in order
+    sequential = False
+
+    # smallest face in pixels which is found reliably by the detector
+    min_face_size = 20
+
+    def __reduce__(self):
+        """
+        Detectors hold native models which can not be pickled, a new detector with the same
+        configuration is created instead (e.g. when a detector is sent to a worker process).
+        """
+        return (self.__class__, ())
+
+    def get_params(self):
+        """
+        Get the type and the parameters of the detector, the faces found by two detectors with the same
+        parameters are the same.
+
+        Returns:
+            dict: The type and the parameters of the detector, which can be serialized to JSON.
+        """
+        return {"type": self.__class__.__name__}
+
+    def add_scene_cuts(self, frame_indices):
+        """
+        Tell the detector which frames of the video start a new scene. Detectors which carry faces from
+        one frame to the next must not do so across a scene cut.
+
+        Args:
+            frame_indices (list[int]): The indices of the frames which start a new scene.
+        """
+        pass
+
     def detect_faces(self, frame):
         """
         Detect faces in the given frame.
@@ -18,6 +54,21 @@ class FaceDetector:
             frame (numpy.ndarray): The image or video frame in which faces need to be detected.
 
         Returns:
-            list: A list of bounding boxes for the detected faces.
+            Detections: The detected faces, with frame_idx 0.
         """
         raise NotImplementedError
+
+    def detect_faces_batch(self, frames):
+        """
+        Detect faces in a batch of frames.
+
+        The default implementation calls detect_faces for every frame. Detectors which are able to run
+        inference on several frames at once should override this method.
+
+        Args:
+            frames (list[numpy.ndarray]): The images or video frames in which faces need to be detected.
+
+        Returns:
+            Detections: The detected faces of all frames, frame_idx is the position of the frame in frames.
+        """
+        return Detections.from_frames([self.detect_faces(frame) for frame in frames])
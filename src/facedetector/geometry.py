@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+This module contains the box geometry shared by the face detectors and trackers.
+
+Functionality:
+------------------------------------------------------------------------------------------------
+
+1. Conversion between the box formats of the detectors: (x, y, width, height) as in Detections,
+corners (x0, y0, x1, y1) and center (center_x, center_y, width, height).
+2. Clipping of boxes to the size of a frame.
+3. Intersection over union of all pairs of boxes of two arrays.
+4. Non-maximum suppression, for the boxes of one frame (nms) and for the boxes of several frames at once
+(batched_nms), where boxes of different frames never suppress each other.
+
+All functions work on NumPy arrays of shape (N, 4), boxes are given as corners unless stated otherwise.
+
+Background:
+
+1. Every detector used to convert its boxes to Python lists for cv2.dnn.NMSBoxes, each in its own box format.
+The functions below work on whole arrays, so a frame with many candidates does not pay for a Python loop
+per candidate.
+"""
+
+from src.common.libraries import *
+
+
+def xywh_to_xyxy(boxes):
+    """Convert boxes (x, y, width, height) to corners (x0, y0, x1, y1)"""
+    boxes = np.asarray(boxes)
+    return np.concatenate([boxes[:, :2], boxes[:, :2] + boxes[:, 2:4]], axis=1)
+
+
+def xyxy_to_xywh(boxes):
+    """Convert corners (x0, y0, x1, y1) to boxes (x, y, width, height)"""
+    boxes = np.asarray(boxes)
+    return np.concatenate([boxes[:, :2], boxes[:, 2:4] - boxes[:, :2]], axis=1)
+
+
+def cxcywh_to_xyxy(boxes):
+    """Convert boxes (center_x, center_y, width, height) to corners (x0, y0, x1, y1)"""
+    boxes = np.asarray(boxes)
+    return np.concatenate([boxes[:, :2] - boxes[:, 2:4] / 2, boxes[:, :2] + boxes[:, 2:4] / 2], axis=1)
+
+
+def clip_boxes(boxes, width, height):
+    """
+    Clip corners (x0, y0, x1, y1) to a frame.
+
+    Args:
+        boxes (numpy.ndarray): The corners of the boxes with shape (N, 4).
+        width: The width of the frame, either a number or an array with one width per box.
+        height: The height of the frame, either a number or an array with one height per box.
+
+    Returns:
+        numpy.ndarray: The clipped corners, boxes outside of the frame get an empty area.
+    """
+    boxes = np.asarray(boxes)
+    upper = np.stack(np.broadcast_arrays(width, height, width, height), axis=-1).reshape(-1, 4)
+    return np.clip(boxes, 0, upper).astype(boxes.dtype, copy=False)
+
+
+def box_areas(boxes):
+    """The areas of corners (x0, y0, x1, y1), empty boxes have an area of 0"""
+    boxes = np.asarray(boxes, dtype=np.float64)
+    return np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+
+
+def iou(boxes_a, boxes_b, mode: str = "union"):
+    """
+    Get the overlap of all pairs of boxes of two arrays.
+
+    Args:
+        boxes_a (numpy.ndarray): The corners of the first boxes with shape (N, 4).
+        boxes_b (numpy.ndarray): The corners of the second boxes with shape (M, 4).
+        mode (str): "union" to divide the intersection by the union of the boxes (intersection over union),
+            "min" to divide it by the area of the smaller box.
+
+    Returns:
+        numpy.ndarray: The overlaps with shape (N, M), 0 for pairs of empty boxes.
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+
+    areas_a, areas_b = box_areas(boxes_a), box_areas(boxes_b)
+    if mode == "union":
+        denominator = areas_a[:, None] + areas_b[None, :] - intersection
+    elif mode == "min":
+        denominator = np.minimum(areas_a[:, None], areas_b[None, :])
+    else:
+        raise ValueError(f"Invalid overlap mode: {mode}")
+    return np.divide(intersection, denominator, out=np.zeros_like(intersection), where=denominator > 0)
+
+
+def nms(boxes, scores, threshold: float, mode: str = "union"):
+    """
+    Greedy non-maximum suppression: the box with the highest score is kept and the boxes which overlap it
+    by more than threshold are removed, until no box is left.
+
+    Args:
+        boxes (numpy.ndarray): The corners of the boxes with shape (N, 4).
+        scores (numpy.ndarray): The scores of the boxes with shape (N,).
+        threshold (float): The overlap above which a box is removed.
+        mode (str): How the overlap is measured, see iou.
+
+    Returns:
+        numpy.ndarray: The indices of the kept boxes, in the order of decreasing score.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    # boxes with the same score are taken in the reverse order of np.argsort, as in the nms of mtcnn
+    order = np.argsort(np.asarray(scores))[::-1]
+    keep = []
+    while order.size > 0:
+        best = order[0]
+        keep.append(best)
+        overlaps = iou(boxes[best : best + 1], boxes[order[1:]], mode)[0]
+        order = order[1:][overlaps <= threshold]
+    return np.array(keep, dtype=np.intp)
+
+
+def batched_nms(boxes, scores, groups, threshold: float, mode: str = "union"):
+    """
+    Non-maximum suppression of the boxes of several groups (e.g. the frames of a batch) at once,
+    boxes of different groups never suppress each other.
+
+    Args:
+        boxes (numpy.ndarray): The corners of the boxes with shape (N, 4).
+        scores (numpy.ndarray): The scores of the boxes with shape (N,).
+        groups (numpy.ndarray): The group of every box with shape (N,), e.g. the index of its frame.
+        threshold (float): The overlap above which a box is removed.
+        mode (str): How the overlap is measured, see iou.
+
+    Returns:
+        numpy.ndarray: The indices of the kept boxes in increasing order, so boxes sorted by group stay sorted.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    # the boxes of every group are moved apart, so that boxes of different groups do not overlap
+    offsets = np.asarray(groups, dtype=np.float64) * (boxes.max() - boxes.min() + 1)
+    return np.sort(nms(boxes + offsets[:, None], scores, threshold, mode))
@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+This module contains the LiveFaceDetector class, which detects faces in a live stream with a bounded latency.
+
+Functionality:
+------------------------------------------------------------------------------------------------
+
+1. The live stream is a camera (Config.LIVE_SOURCE is its index), a named pipe or stdin ("-"). Named pipes and
+stdin are decoded by ffmpeg to frames of Config.LIVE_FRAME_SIZE.
+2. A grabber thread reads the stream as fast as it produces frames and keeps only the newest frame. A frame which
+is replaced before it was taken is dropped, so the detection always starts on the newest frame.
+3. Every frame has a deadline of Config.LIVE_LATENCY_BUDGET seconds after it was captured. A frame which is older
+than its deadline when it is taken is dropped. The detection runs in a worker thread, and when it does not finish
+before the deadline the frame is shown with the faces of the last detected frame, while the detection goes on
+in the background.
+4. The frames with faces are shown in a window (Config.LIVE_DISPLAY, "q" stops the live mode) and/or written to
+an output video.
+5. The achieved frames per second, the dropped frames and the percentiles of the end to end latency (from capturing
+a frame to showing it) are logged every Config.LIVE_REPORT_INTERVAL seconds and when the stream ends.
+
+Background:
+
+1. The camera branch of detect_faces_in_realtime processed every frame serially. When the detection is slower than
+the camera, the frames wait in the buffers of the camera and the latency grows for as long as the stream runs.
+Here the latency is bounded by the budget, and the frame rate drops instead.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.common.libraries import *
+from src.common.video_reader import FFmpegStreamReader
+from src.common.video_writer import open_video_writer
+from src.facedetector.detections import Detections
+from src.facedetector.resized_face_detector import ResizedFaceDetector, get_detection_scale
+
+# frame rate of the output video, the frame rate of a live stream is often unknown
+DEFAULT_LIVE_FPS = 25.0
+
+
+def open_live_source(source=None, size: tuple = None):
+    """
+    Open a live stream.
+
+    Args:
+        source: A camera index, the path of a named pipe or "-" for stdin, Config.LIVE_SOURCE by default.
+        size (tuple): The (width, height) of the frames of a named pipe or stdin, Config.LIVE_FRAME_SIZE by default.
+
+    Returns:
+        cv2.VideoCapture or FFmpegStreamReader: The reader of the stream.
+    """
+    source = Config.LIVE_SOURCE if source is None else source
+    if isinstance(source, int) or str(source).isdigit():
+        return cv2.VideoCapture(int(source))
+    return FFmpegStreamReader(source, size or Config.LIVE_FRAME_SIZE)
+
+
+class LatestFrameGrabber:
+    """
+    Class reading a live stream in a thread and keeping only its newest frame.
+
+    Attributes:
+        num_captured (int): The number of frames read from the stream.
+        num_dropped (int): The number of frames replaced by a newer frame before they were taken.
+        finished (bool): Whether the stream has ended or the grabber was stopped.
+    """
+
+    def __init__(self, video_capture):
+        self.video_capture = video_capture
+        self.condition = threading.Condition()
+        self.frame = None
+        self.captured_at = None
+        self.frame_index = -1
+        self.taken_index = -1
+
+        self.num_captured = 0
+        self.num_dropped = 0
+        self.finished = False
+        self.thread = threading.Thread(target=self._grab, name="LatestFrameGrabber", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop grabbing and wait for the thread, the video capture can be released afterwards.
+        """
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+        # a read which waits for the stream returns once ffmpeg is stopped, a camera returns its next frame
+        terminate = getattr(self.video_capture, "terminate", None)
+        if terminate is not None:
+            terminate()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    def _grab(self):
+        while not self.finished:
+            ret, frame = self.video_capture.read()
+            captured_at = time.monotonic()
+            with self.condition:
+                if not ret:
+                    self.finished = True
+                elif not self.finished:
+                    if self.frame_index > self.taken_index:
+                        self.num_dropped += 1
+                    self.frame, self.captured_at = frame, captured_at
+                    self.frame_index += 1
+                    self.num_captured += 1
+                self.condition.notify_all()
+
+    def take(self):
+        """
+        Wait for a frame newer than the last taken frame.
+
+        Returns:
+            tuple: (frame index, frame, capture time) of the newest frame, None when the stream has ended.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.frame_index > self.taken_index or self.finished)
+            if self.frame_index <= self.taken_index:
+                return None
+            self.taken_index = self.frame_index
+            frame, self.frame = self.frame, None
+            return self.frame_index, frame, self.captured_at
+
+
+class LiveStats:
+    """
+    Class measuring the frame rate and the latency of the live mode.
+    """
+
+    def __init__(self):
+        self.start_time = time.monotonic()
+        self.latencies = []
+        self.num_stale = 0
+        self.num_late = 0
+        self.last_report_time = self.start_time
+        self.last_report_frames = 0
+
+    def record(self, latency: float, on_time: bool):
+        """Record a shown frame, with its end to end latency in seconds and whether its own faces were shown"""
+        self.latencies.append(latency)
+        if not on_time:
+            self.num_late += 1
+
+    def report(self, grabber: LatestFrameGrabber, interval_only: bool = False) -> dict:
+        """
+        Get the frame rate and the latency percentiles.
+
+        Args:
+            grabber (LatestFrameGrabber): The grabber of the stream, for the captured and dropped frames.
+            interval_only (bool): Whether the frame rate and the latencies of the frames shown since the last
+                report are returned, instead of those of the whole stream.
+
+        Returns:
+            dict: The frame rate, the frame counts and the latency percentiles in milliseconds.
+        """
+        now = time.monotonic()
+        start_time, first_frame = (
+            (self.last_report_time, self.last_report_frames) if interval_only else (self.start_time, 0)
+        )
+        latencies = np.array(self.latencies[first_frame:]) * 1000
+        elapsed = max(now - start_time, 1e-6)
+        self.last_report_time, self.last_report_frames = now, len(self.latencies)
+
+        percentiles = np.percentile(latencies, [50, 90, 99]) if len(latencies) else [np.nan] * 3
+        return {
+            "fps": len(latencies) / elapsed,
+            "frames_captured": grabber.num_captured,
+            "frames_shown": len(self.latencies),
+            "frames_dropped": grabber.num_dropped + self.num_stale,
+            "frames_late": self.num_late,
+            "latency_p50_ms": float(percentiles[0]),
+            "latency_p90_ms": float(percentiles[1]),
+            "latency_p99_ms": float(percentiles[2]),
+        }
+
+
+class LiveFaceDetector:
+    """
+    Class detecting faces in a live stream within a latency budget.
+    """
+
+    def __init__(self, face_detector, source=None, latency_budget: float = None, detection_resolution=None):
+        """
+        The constructor for the LiveFaceDetector class.
+
+        Args:
+            face_detector (FaceDetector): The face detector.
+            source: A camera index, the path of a named pipe or "-" for stdin, Config.LIVE_SOURCE by default.
+            latency_budget (float): The maximum time in seconds from capturing a frame to showing it,
+                Config.LIVE_LATENCY_BUDGET by default.
+            detection_resolution: The resolution of the frames given to the face detector, see get_detection_scale.
+        """
+        self.face_detector = face_detector
+        self.source = Config.LIVE_SOURCE if source is None else source
+        self.latency_budget = Config.LIVE_LATENCY_BUDGET if latency_budget is None else latency_budget
+        self.detection_resolution = detection_resolution
+        self.stopped = False
+
+        self.logger = Logger(name=self.__class__.__name__)
+        self.logger.add_file_handler("face_detection.log")
+
+    def stop(self):
+        """Stop the live mode after the current frame"""
+        self.stopped = True
+
+    async def detect_faces_in_realtime(self, output_file: str = None, max_frames: int = None) -> dict:
+        """
+        Detect faces in the live stream until it ends or the live mode is stopped.
+
+        Args:
+            output_file (str): The file the frames with faces are written to, they are only shown by default.
+            max_frames (int): The number of shown frames after which the live mode stops.
+
+        Returns:
+            dict: The final report, see LiveStats.report.
+        """
+        video_capture = open_live_source(self.source)
+        if not video_capture.isOpened():
+            self.logger.error(f"Error opening live stream {self.source}")
+            raise FaceDetectionError(f"Error opening live stream {self.source}")
+
+        width = int(video_capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        scale = get_detection_scale(width, height, self.detection_resolution, self.face_detector)
+        detector = ResizedFaceDetector(self.face_detector, scale) if scale < 1.0 else self.face_detector
+        self.logger.info(
+            f"Live stream {self.source}: {width}x{height}, latency budget {1000 * self.latency_budget:.0f} ms, "
+            f"detection scale {scale:.3f}"
+        )
+
+        video_writer = None
+        if output_file:
+            fps = video_capture.get(cv2.CAP_PROP_FPS) or DEFAULT_LIVE_FPS
+            video_writer = open_video_writer(output_file, fps, (width, height))
+
+        grabber = LatestFrameGrabber(video_capture)
+        stats = LiveStats()
+        loop = asyncio.get_running_loop()
+        # a single worker, a detection which missed its deadline is not started again for a newer frame
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="LiveDetection")
+        detection, detection_index = None, None
+        faces = Detections()
+        self.stopped = False
+
+        try:
+            grabber.start()
+            while not self.stopped:
+                taken = await asyncio.to_thread(grabber.take)
+                if taken is None:
+                    break
+                frame_index, frame, captured_at = taken
+                deadline = captured_at + self.latency_budget
+                if time.monotonic() > deadline:
+                    stats.num_stale += 1
+                    continue
+
+                # the frame is detected when the worker is free, an earlier detection which finishes before the
+                # deadline gives the faces of the frame until the detection of the frame itself is done
+                on_time = False
+                while True:
+                    if detection is None:
+                        detection = loop.run_in_executor(executor, detector.detect_faces, frame)
+                        detection_index = frame_index
+                    try:
+                        timeout = max(0.0, deadline - time.monotonic())
+                        faces = await asyncio.wait_for(asyncio.shield(detection), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                    detection, on_time = None, detection_index == frame_index
+                    if on_time:
+                        break
+
+                for x, y, w, h in faces.boxes.tolist():
+                    cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
+                if video_writer:
+                    video_writer.write(frame)
+                if Config.LIVE_DISPLAY:
+                    cv2.imshow("Live", frame)
+                    if cv2.waitKey(1) & 0xFF == ord("q"):
+                        self.stop()
+
+                stats.record(time.monotonic() - captured_at, on_time)
+                if max_frames is not None and len(stats.latencies) >= max_frames:
+                    break
+                if time.monotonic() - stats.last_report_time >= Config.LIVE_REPORT_INTERVAL:
+                    self._log_report(stats.report(grabber, interval_only=True), "last interval")
+        except Exception as e:
+            self.logger.error(f"Face detection in the live stream failed: {e}")
+            raise FaceDetectionError(f"Face detection in the live stream failed: {e}")
+        finally:
+            # the grabber thread may still be reading, the reader is released once the thread has finished
+            grabber.stop()
+            video_capture.release()
+            executor.shutdown(wait=True)
+            if video_writer:
+                video_writer.release()
+            if Config.LIVE_DISPLAY:
+                cv2.destroyAllWindows()
+
+        report = stats.report(grabber)
+        self._log_report(report, "live stream")
+        return report
+
+    def _log_report(self, report: dict, period: str):
+        self.logger.info(
+            f"{period}: {report['fps']:.1f} fps, latency p50 {report['latency_p50_ms']:.0f} ms, "
+            f"p90 {report['latency_p90_ms']:.0f} ms, p99 {report['latency_p99_ms']:.0f} ms, "
+            f"{report['frames_shown']}/{report['frames_captured']} frames shown, {report['frames_dropped']} dropped, "
+            f"{report['frames_late']} shown with the faces of an earlier frame"
+        )
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+This module contains the MonitoredQueue class, an asyncio.Queue which records how full it got.
+
+Functionality:
+------------------------------------------------------------------------------------------------
+
+1. The queues between the stages of the face detection (read -> detect -> write) are bounded, a stage which is
+ahead waits in put until the next stage has taken an item, so the slowest stage sets the pace of the whole job.
+2. Every queue records its high-water mark (the largest number of items it held at once), the number of puts
+which had to wait for a free place and the time they waited.
+3. The approaches log the usage of their queues at the end of a job (see AsyncFaceDetector._log_queue_usage).
+
+Background:
+
+1. With an unbounded queue the reader never waits, it decodes the whole video into memory before the detection
+catches up, so the memory usage grows with the length of the video. With bounded queues the frames in memory are
+at most the sum of the queue sizes plus the frames being detected, and the high-water marks show which of the
+sizes (FACE_DETECTOR_QUEUE_SIZE, FACE_DETECTOR_REORDER_WINDOW, VIDEO_WRITER_QUEUE_SIZE) is worth tuning:
+a queue which stays at its size is in front of the bottleneck.
+"""
+
+import asyncio
+import time
+
+
+class MonitoredQueue(asyncio.Queue):
+    """
+    asyncio.Queue recording its high-water mark and the time its producers waited for a free place.
+
+    Attributes:
+        name (str): The name of the queue in the logs.
+        high_water_mark (int): The largest number of items held by the queue at once.
+        blocked_puts (int): The number of puts which waited because the queue was full.
+        blocked_time (float): The time in seconds the puts waited.
+    """
+
+    def __init__(self, name: str, maxsize: int = 0):
+        super().__init__(maxsize=maxsize)
+        self.name = name
+        self.high_water_mark = 0
+        self.blocked_puts = 0
+        self.blocked_time = 0.0
+
+    def _put(self, item):
+        super()._put(item)
+        self.high_water_mark = max(self.high_water_mark, self.qsize())
+
+    async def put(self, item):
+        """Put an item on the queue, waits while the queue is full"""
+        if not self.full():
+            return self.put_nowait(item)
+
+        start_time = time.perf_counter()
+        await super().put(item)
+        self.blocked_puts += 1
+        self.blocked_time += time.perf_counter() - start_time
+
+    def usage(self) -> str:
+        """returns the high-water mark and the waiting of the producers, as logged at the end of a job"""
+        size = self.maxsize if self.maxsize > 0 else "unbounded"
+        return (
+            f"{self.name}: high-water mark {self.high_water_mark}/{size}, "
+            f"{self.blocked_puts} puts waited {self.blocked_time:.2f} seconds for a free place"
+        )
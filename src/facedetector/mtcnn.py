@@ -1,12 +1,191 @@
 #!/usr/bin/env python3
 """
 This module contains the MTCNNDetector class, which is a concrete implementation of the FaceDetector class.
-"""
 
-from mtcnn import MTCNN
+The networks (P-Net, R-Net and O-Net) are run with TensorFlow, or with ONNX Runtime when
+Config.FACE_DETECTOR_BACKEND is "onnxruntime". The ONNX models are exported to Config.MODEL_MTCNN_ONNX_PATH
+by src/facedetector/export_onnx_models.py.
+
+The mtcnn package imports TensorFlow, so it is only imported by the default backend. The NumPy steps between
+the networks are ported from mtcnn 0.1.1 (MIT License, see the notice above the helpers), the onnxruntime backend
+never loads TensorFlow or Keras.
+"""
 
 from src.common.libraries import *
+from src.facedetector.detections import LANDMARK_NAMES, Detections
 from src.facedetector.face_detector import FaceDetector
+from src.facedetector.geometry import nms
+from src.facedetector.onnx_backend import OnnxModel, get_model_path, validate_backend
+
+# names of the ONNX models of the networks in Config.MODEL_MTCNN_ONNX_PATH, in the order of the stages
+MTCNN_NETWORKS = ("pnet", "rnet", "onet")
+
+# the parameters of the detection, the defaults of mtcnn.MTCNN
+MTCNN_MIN_FACE_SIZE = 20
+MTCNN_STEPS_THRESHOLD = (0.6, 0.7, 0.7)
+MTCNN_SCALE_FACTOR = 0.709
+
+
+# _StageStatus and the helpers below, up to _nms, are ported from mtcnn 0.1.1 (mtcnn/mtcnn.py),
+# https://github.com/ipazc/mtcnn, under the MIT License:
+#
+# Copyright (c) 2019 Iván de Paz Centeno
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+
+class _StageStatus:
+    """The padding of the candidates of a frame between the stages, as mtcnn.mtcnn.StageStatus"""
+
+    def __init__(self, pad_result: tuple = None, width=0, height=0):
+        self.width = width
+        self.height = height
+        self.dy = self.edy = self.dx = self.edx = self.y = self.ey = self.x = self.ex = self.tmpw = self.tmph = []
+        if pad_result is not None:
+            self.dy, self.edy, self.dx, self.edx, self.y, self.ey, self.x, self.ex, self.tmpw, self.tmph = pad_result
+
+
+# the helpers below are the private helpers of mtcnn.MTCNN (see the license above), so that the batched pipeline
+# returns exactly the same boxes as MTCNN.detect_faces
+
+
+def _compute_scale_pyramid(m, min_layer):
+    """The scales of the image pyramid, until the smaller side of the frame is below the input size of P-Net"""
+    scales = []
+    factor_count = 0
+    while min_layer >= 12:
+        scales += [m * np.power(MTCNN_SCALE_FACTOR, factor_count)]
+        min_layer = min_layer * MTCNN_SCALE_FACTOR
+        factor_count += 1
+    return scales
+
+
+def _scale_image(image, scale: float):
+    """Resize the image by scale and normalize its pixels to [-1, 1]"""
+    height, width, _ = image.shape
+    width_scaled = int(np.ceil(width * scale))
+    height_scaled = int(np.ceil(height * scale))
+    im_data = cv2.resize(image, (width_scaled, height_scaled), interpolation=cv2.INTER_AREA)
+    return (im_data - 127.5) * 0.0078125
+
+
+def _generate_bounding_box(imap, reg, scale, t):
+    """Turn the heatmap and the regression of P-Net into candidate boxes with their scores and regressions"""
+    stride = 2
+    cellsize = 12
+
+    imap = np.transpose(imap)
+    dx1 = np.transpose(reg[:, :, 0])
+    dy1 = np.transpose(reg[:, :, 1])
+    dx2 = np.transpose(reg[:, :, 2])
+    dy2 = np.transpose(reg[:, :, 3])
+
+    y, x = np.where(imap >= t)
+
+    if y.shape[0] == 1:
+        dx1 = np.flipud(dx1)
+        dy1 = np.flipud(dy1)
+        dx2 = np.flipud(dx2)
+        dy2 = np.flipud(dy2)
+
+    score = imap[(y, x)]
+    reg = np.transpose(np.vstack([dx1[(y, x)], dy1[(y, x)], dx2[(y, x)], dy2[(y, x)]]))
+
+    if reg.size == 0:
+        reg = np.empty(shape=(0, 3))
+
+    bb = np.transpose(np.vstack([y, x]))
+
+    q1 = np.fix((stride * bb + 1) / scale)
+    q2 = np.fix((stride * bb + cellsize) / scale)
+    boundingbox = np.hstack([q1, q2, np.expand_dims(score, 1), reg])
+
+    return boundingbox, reg
+
+
+def _pad(total_boxes, w, h):
+    """Compute the coordinates of the candidates in the frame and in their crops, for candidates outside of it"""
+    tmpw = (total_boxes[:, 2] - total_boxes[:, 0] + 1).astype(np.int32)
+    tmph = (total_boxes[:, 3] - total_boxes[:, 1] + 1).astype(np.int32)
+    numbox = total_boxes.shape[0]
+
+    dx = np.ones(numbox, dtype=np.int32)
+    dy = np.ones(numbox, dtype=np.int32)
+    edx = tmpw.copy().astype(np.int32)
+    edy = tmph.copy().astype(np.int32)
+
+    x = total_boxes[:, 0].copy().astype(np.int32)
+    y = total_boxes[:, 1].copy().astype(np.int32)
+    ex = total_boxes[:, 2].copy().astype(np.int32)
+    ey = total_boxes[:, 3].copy().astype(np.int32)
+
+    tmp = np.where(ex > w)
+    edx.flat[tmp] = np.expand_dims(-ex[tmp] + w + tmpw[tmp], 1)
+    ex[tmp] = w
+
+    tmp = np.where(ey > h)
+    edy.flat[tmp] = np.expand_dims(-ey[tmp] + h + tmph[tmp], 1)
+    ey[tmp] = h
+
+    tmp = np.where(x < 1)
+    dx.flat[tmp] = np.expand_dims(2 - x[tmp], 1)
+    x[tmp] = 1
+
+    tmp = np.where(y < 1)
+    dy.flat[tmp] = np.expand_dims(2 - y[tmp], 1)
+    y[tmp] = 1
+
+    return dy, edy, dx, edx, y, ey, x, ex, tmpw, tmph
+
+
+def _rerec(bbox):
+    """Make the candidates square, around their centers"""
+    height = bbox[:, 3] - bbox[:, 1]
+    width = bbox[:, 2] - bbox[:, 0]
+    max_side_length = np.maximum(width, height)
+    bbox[:, 0] = bbox[:, 0] + width * 0.5 - max_side_length * 0.5
+    bbox[:, 1] = bbox[:, 1] + height * 0.5 - max_side_length * 0.5
+    bbox[:, 2:4] = bbox[:, 0:2] + np.transpose(np.tile(max_side_length, (2, 1)))
+    return bbox
+
+
+def _bbreg(boundingbox, reg):
+    """Calibrate the candidates with the regression of a network"""
+    if reg.shape[1] == 1:
+        reg = np.reshape(reg, (reg.shape[2], reg.shape[3]))
+
+    w = boundingbox[:, 2] - boundingbox[:, 0] + 1
+    h = boundingbox[:, 3] - boundingbox[:, 1] + 1
+    b1 = boundingbox[:, 0] + reg[:, 0] * w
+    b2 = boundingbox[:, 1] + reg[:, 1] * h
+    b3 = boundingbox[:, 2] + reg[:, 2] * w
+    b4 = boundingbox[:, 3] + reg[:, 3] * h
+    boundingbox[:, 0:4] = np.transpose(np.vstack([b1, b2, b3, b4]))
+    return boundingbox
+
+
+def _nms(boxes, threshold: float, method: str):
+    """
+    Non-maximum suppression of the candidates of mtcnn with the shared geometry, the boxes are the corners of
+    the candidates in inclusive pixel coordinates, followed by their scores
+    """
+    return nms(boxes[:, :4] + [0, 0, 1, 1], boxes[:, 4], threshold, mode=method.lower())
 
 
 class MTCNNDetector(FaceDetector):
@@ -14,11 +193,57 @@ class MTCNNDetector(FaceDetector):
     This class is responsible for detecting faces in an image or video frame using MTCNN Algorithm.
     """
 
-    def __init__(self):
+    def __init__(self, backend: str = None, quantized: bool = None):
         """
         Initialize the class and call the parent class constructor
+
+        Parameters:
+        - backend (str): "default" (TensorFlow) or "onnxruntime", Config.FACE_DETECTOR_BACKEND by default
+        - quantized (bool): onnxruntime backend: whether the int8 models are used,
+          Config.FACE_DETECTOR_ONNX_QUANTIZED by default
         """
-        self.detector = MTCNN()
+        self.backend = validate_backend(backend)
+        self.quantized = Config.FACE_DETECTOR_ONNX_QUANTIZED if quantized is None else quantized
+        self.min_face_size = MTCNN_MIN_FACE_SIZE
+
+        # the networks of the stages, called with the input batch and returning the list of their outputs
+        if self.backend == "onnxruntime":
+            self.detector = None
+            self.onnx_models = [
+                OnnxModel(get_model_path(Config.MODEL_MTCNN_ONNX_PATH / f"{name}.onnx", self.quantized))
+                for name in MTCNN_NETWORKS
+            ]
+            self.pnet, self.rnet, self.onet = (model.run for model in self.onnx_models)
+        else:
+            # imported here, so that only the default backend loads TensorFlow
+            from mtcnn import MTCNN
+
+            self.detector = MTCNN(
+                min_face_size=MTCNN_MIN_FACE_SIZE,
+                steps_threshold=list(MTCNN_STEPS_THRESHOLD),
+                scale_factor=MTCNN_SCALE_FACTOR,
+            )
+            self.onnx_models = []
+            self.pnet, self.rnet, self.onet = (
+                self.detector._pnet.predict,
+                self.detector._rnet.predict,
+                self.detector._onet.predict,
+            )
+
+    def __reduce__(self):
+        return (self.__class__, (self.backend, self.quantized))
+
+    def get_params(self):
+        params = {
+            "type": self.__class__.__name__,
+            "min_face_size": self.min_face_size,
+            "steps_threshold": list(MTCNN_STEPS_THRESHOLD),
+            "scale_factor": MTCNN_SCALE_FACTOR,
+            "backend": self.backend,
+        }
+        if self.backend == "onnxruntime":
+            params["quantized"] = self.quantized
+        return params
 
     def detect_faces(self, frame):
         """
@@ -28,7 +253,212 @@ class MTCNNDetector(FaceDetector):
         - frame (numpy array): The frame in which faces need to be detected
 
         Returns:
-        - faces (List[Dict]): List of dictionaries containing the coordinates of the detected faces
+        - faces (Detections): The boxes, confidences and keypoints of the detected faces
         """
+        if self.backend == "onnxruntime":
+            # the networks of mtcnn.MTCNN are TensorFlow models, the batched pipeline runs the ONNX models
+            return self.detect_faces_batch([frame])
+
         faces = self.detector.detect_faces(frame)
-        return faces
+        return Detections.from_boxes(
+            [face["box"] for face in faces],
+            scores=[face["confidence"] for face in faces],
+            landmarks=[[face["keypoints"][name] for name in LANDMARK_NAMES] for face in faces],
+        )
+
+    def detect_faces_batch(self, frames):
+        """
+        Detect faces in a batch of frames using MTCNN
+
+        P-Net is run once per pyramid scale and R-Net, O-Net are run once per stage for the whole batch,
+        instead of once per frame.
+
+        Parameters:
+        - frames (List[numpy array]): The frames in which faces need to be detected
+
+        Returns:
+        - faces (Detections): The boxes, confidences and keypoints of the faces detected in all frames,
+          frame_idx is the position of the frame in frames
+        """
+        frames = list(frames)
+        # a single frame is given to mtcnn.MTCNN, unless the networks are ONNX models
+        single_frame = len(frames) == 1 and self.backend == "default"
+        if len(frames) == 0 or single_frame or any(frame.shape != frames[0].shape for frame in frames):
+            return super().detect_faces_batch(frames)
+
+        height, width = frames[0].shape[:2]
+        m = 12 / self.min_face_size
+        scales = _compute_scale_pyramid(m, min(height, width) * m)
+
+        total_boxes, statuses = self._stage1(frames, scales)
+        total_boxes = self._stage2(frames, total_boxes, statuses)
+        total_boxes, points = self._stage3(frames, total_boxes, statuses)
+
+        return Detections.from_frames(
+            self._to_detections(boxes, frame_points) for boxes, frame_points in zip(total_boxes, points)
+        )
+
+    def _stage1(self, frames, scales):
+        """Run P-Net on the scale pyramid of all frames"""
+        height, width = frames[0].shape[:2]
+        threshold = MTCNN_STEPS_THRESHOLD[0]
+        total_boxes = [np.empty((0, 9)) for _ in frames]
+
+        for scale in scales:
+            scaled_frames = np.stack([_scale_image(frame, scale) for frame in frames])
+            out = self.pnet(np.transpose(scaled_frames, (0, 2, 1, 3)))
+
+            out0 = np.transpose(out[0], (0, 2, 1, 3))
+            out1 = np.transpose(out[1], (0, 2, 1, 3))
+
+            for i in range(len(frames)):
+                boxes, _ = _generate_bounding_box(out1[i, :, :, 1].copy(), out0[i, :, :, :].copy(), scale, threshold)
+
+                # inter-scale nms
+                pick = _nms(boxes.copy(), 0.5, "Union")
+                if boxes.size > 0 and pick.size > 0:
+                    total_boxes[i] = np.append(total_boxes[i], boxes[pick, :], axis=0)
+
+        statuses = []
+        for i, boxes in enumerate(total_boxes):
+            status = _StageStatus(width=width, height=height)
+            if boxes.shape[0] > 0:
+                boxes = boxes[_nms(boxes.copy(), 0.7, "Union"), :]
+
+                regw = boxes[:, 2] - boxes[:, 0]
+                regh = boxes[:, 3] - boxes[:, 1]
+
+                qq1 = boxes[:, 0] + boxes[:, 5] * regw
+                qq2 = boxes[:, 1] + boxes[:, 6] * regh
+                qq3 = boxes[:, 2] + boxes[:, 7] * regw
+                qq4 = boxes[:, 3] + boxes[:, 8] * regh
+
+                boxes = _rerec(np.transpose(np.vstack([qq1, qq2, qq3, qq4, boxes[:, 4]])))
+                boxes[:, 0:4] = np.fix(boxes[:, 0:4]).astype(np.int32)
+                status = _StageStatus(_pad(boxes.copy(), width, height), width=width, height=height)
+            total_boxes[i] = boxes
+            statuses.append(status)
+
+        return total_boxes, statuses
+
+    def _stage2(self, frames, total_boxes, statuses):
+        """Refine the candidates of all frames with a single R-Net pass"""
+        crops = [
+            self._crop_candidates(frame, boxes, status, 24)
+            for frame, boxes, status in zip(frames, total_boxes, statuses)
+        ]
+        counts = [0 if crop is None else crop.shape[0] for crop in crops]
+        if sum(counts) == 0:
+            return [boxes if crop is not None else np.empty((0, 5)) for boxes, crop in zip(total_boxes, crops)]
+
+        batch = np.concatenate([crop for crop in crops if crop is not None])
+        out = self.rnet(np.transpose((batch - 127.5) * 0.0078125, (0, 2, 1, 3)))
+
+        out0 = np.transpose(out[0])
+        out1 = np.transpose(out[1])
+
+        result = []
+        offsets = np.cumsum([0] + counts)
+        for i, boxes in enumerate(total_boxes):
+            if counts[i] == 0:
+                result.append(boxes if crops[i] is not None else np.empty((0, 5)))
+                continue
+
+            score = out1[1, offsets[i] : offsets[i + 1]]
+            ipass = np.where(score > MTCNN_STEPS_THRESHOLD[1])
+
+            boxes = np.hstack([boxes[ipass[0], 0:4].copy(), np.expand_dims(score[ipass].copy(), 1)])
+            mv = out0[:, offsets[i] : offsets[i + 1]][:, ipass[0]]
+
+            if boxes.shape[0] > 0:
+                pick = _nms(boxes, 0.7, "Union")
+                boxes = _bbreg(boxes[pick, :].copy(), np.transpose(mv[:, pick]))
+                boxes = _rerec(boxes.copy())
+            result.append(boxes)
+
+        return result
+
+    def _stage3(self, frames, total_boxes, statuses):
+        """Compute the final boxes and facial landmarks of all frames with a single O-Net pass"""
+        crops = []
+        for i, (frame, boxes, status) in enumerate(zip(frames, total_boxes, statuses)):
+            if boxes.shape[0] == 0:
+                crops.append(None)
+                continue
+            boxes = np.fix(boxes).astype(np.int32)
+            status = _StageStatus(
+                _pad(boxes.copy(), status.width, status.height), width=status.width, height=status.height
+            )
+            total_boxes[i] = boxes
+            crops.append(self._crop_candidates(frame, boxes, status, 48))
+
+        counts = [0 if crop is None else crop.shape[0] for crop in crops]
+        if sum(counts) == 0:
+            return [np.empty((0, 5)) for _ in frames], [np.empty((10, 0)) for _ in frames]
+
+        batch = np.concatenate([crop for crop in crops if crop is not None])
+        out = self.onet(np.transpose((batch - 127.5) * 0.0078125, (0, 2, 1, 3)))
+
+        out0 = np.transpose(out[0])
+        out1 = np.transpose(out[1])
+        out2 = np.transpose(out[2])
+
+        result_boxes, result_points = [], []
+        offsets = np.cumsum([0] + counts)
+        for i, boxes in enumerate(total_boxes):
+            if counts[i] == 0:
+                result_boxes.append(np.empty((0, 5)))
+                result_points.append(np.empty((10, 0)))
+                continue
+
+            score = out2[1, offsets[i] : offsets[i + 1]]
+            ipass = np.where(score > MTCNN_STEPS_THRESHOLD[2])
+
+            points = out1[:, offsets[i] : offsets[i + 1]][:, ipass[0]]
+            boxes = np.hstack([boxes[ipass[0], 0:4].copy(), np.expand_dims(score[ipass].copy(), 1)])
+            mv = out0[:, offsets[i] : offsets[i + 1]][:, ipass[0]]
+
+            w = boxes[:, 2] - boxes[:, 0] + 1
+            h = boxes[:, 3] - boxes[:, 1] + 1
+
+            points[0:5, :] = np.tile(w, (5, 1)) * points[0:5, :] + np.tile(boxes[:, 0], (5, 1)) - 1
+            points[5:10, :] = np.tile(h, (5, 1)) * points[5:10, :] + np.tile(boxes[:, 1], (5, 1)) - 1
+
+            if boxes.shape[0] > 0:
+                boxes = _bbreg(boxes.copy(), np.transpose(mv))
+                pick = _nms(boxes.copy(), 0.7, "Min")
+                boxes = boxes[pick, :]
+                points = points[:, pick]
+            result_boxes.append(boxes)
+            result_points.append(points)
+
+        return result_boxes, result_points
+
+    @staticmethod
+    def _crop_candidates(frame, boxes, status, size):
+        """
+        Crop and resize the candidate boxes of a frame to the input size of the next network.
+        Returns None when a candidate can not be cropped, in which case the frame has no faces.
+        """
+        crops = np.zeros((boxes.shape[0], size, size, 3))
+        for k in range(boxes.shape[0]):
+            tmp = np.zeros((int(status.tmph[k]), int(status.tmpw[k]), 3))
+            tmp[status.dy[k] - 1 : status.edy[k], status.dx[k] - 1 : status.edx[k], :] = frame[
+                status.y[k] - 1 : status.ey[k], status.x[k] - 1 : status.ex[k], :
+            ]
+            if tmp.shape[0] > 0 and tmp.shape[1] > 0 or tmp.shape[0] == 0 and tmp.shape[1] == 0:
+                crops[k] = cv2.resize(tmp, (size, size), interpolation=cv2.INTER_AREA)
+            else:
+                return None
+        return crops
+
+    @staticmethod
+    def _to_detections(total_boxes, points):
+        """Convert the raw output of the last stage to detections, rounded like MTCNN.detect_faces"""
+        x = np.maximum(0, total_boxes[:, 0].astype(np.int32))
+        y = np.maximum(0, total_boxes[:, 1].astype(np.int32))
+        w = (total_boxes[:, 2] - x).astype(np.int32)
+        h = (total_boxes[:, 3] - y).astype(np.int32)
+        # points holds the x coordinates of the 5 landmarks in its first rows and the y coordinates in the others
+        landmarks = np.stack([points[0:5].T, points[5:10].T], axis=-1).astype(np.int32)
+        return Detections.from_boxes(np.stack([x, y, w, h], axis=1), scores=total_boxes[:, -1], landmarks=landmarks)
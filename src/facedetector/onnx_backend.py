@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+This module contains the OnnxModel class, which runs the networks of the face detectors with ONNX Runtime.
+
+Functionality:
+------------------------------------------------------------------------------------------------
+
+1. With Config.FACE_DETECTOR_BACKEND = "onnxruntime", MTCNN and RetinaFace run their networks with an OnnxModel
+instead of TensorFlow and cv2.dnn. The pre and post processing of the detectors stays the same.
+2. The models are run on the CPU with all graph optimizations of ONNX Runtime, with
+Config.FACE_DETECTOR_ONNX_NUM_THREADS threads per model.
+3. With Config.FACE_DETECTOR_ONNX_QUANTIZED the int8 models (<name>.int8.onnx next to the float models) are used.
+The ONNX models of MTCNN and the int8 models are made by src/facedetector/export_onnx_models.py.
+
+Background:
+
+1. TensorFlow runs the small networks of MTCNN with a large overhead per call, and cv2.dnn does not use the int8
+instructions (AVX2, AVX-512 VNNI) of CPU servers. ONNX Runtime runs the same networks with fused kernels and, for
+the quantized models, with int8 arithmetic.
+
+2. An InferenceSession can be run by several threads at the same time, so unlike the cv2.dnn networks the models
+do not need a lock.
+"""
+
+from pathlib import Path
+
+from src.common.libraries import *
+
+# values of Config.FACE_DETECTOR_BACKEND
+FACE_DETECTOR_BACKENDS = ("default", "onnxruntime")
+
+
+def get_model_path(model_path, quantized: bool = None) -> Path:
+    """
+    Get the path of the float model or of its int8 model.
+
+    Args:
+        model_path: The path of the float model, e.g. data/models/retinaface/retinaface_mobilenet0.25.onnx.
+        quantized (bool): Whether the int8 model is used, Config.FACE_DETECTOR_ONNX_QUANTIZED by default.
+
+    Returns:
+        Path: The path of the model, <name>.int8.onnx for the int8 model.
+    """
+    quantized = Config.FACE_DETECTOR_ONNX_QUANTIZED if quantized is None else quantized
+    model_path = Path(model_path)
+    return model_path.with_suffix(".int8.onnx") if quantized else model_path
+
+
+def validate_backend(backend: str) -> str:
+    """returns the backend, Config.FACE_DETECTOR_BACKEND by default"""
+    backend = backend or Config.FACE_DETECTOR_BACKEND
+    if backend not in FACE_DETECTOR_BACKENDS:
+        raise ValueError(f"Invalid face detector backend: {backend}")
+    return backend
+
+
+class OnnxModel:
+    """
+    Class running an ONNX model with ONNX Runtime on the CPU.
+
+    Attributes:
+        model_path (str): The path of the model.
+        session (onnxruntime.InferenceSession): The session running the model.
+        recorded_inputs (list): The inputs given to run when it is a list, they are used to calibrate the
+            quantization of the model.
+    """
+
+    def __init__(self, model_path, num_threads: int = None):
+        """
+        The constructor for the OnnxModel class, the model is loaded here.
+
+        Args:
+            model_path: The path of the model.
+            num_threads (int): The number of threads used by the model, Config.FACE_DETECTOR_ONNX_NUM_THREADS
+                by default. 0 lets ONNX Runtime decide.
+        """
+        try:
+            import onnxruntime
+        except ImportError:
+            raise FaceDetectionError("onnxruntime is not installed, it is needed by the onnxruntime backend")
+
+        self.model_path = str(model_path)
+        if not os.path.isfile(self.model_path):
+            raise FaceDetectionError(
+                f"ONNX model file {self.model_path} not found, create it with src/facedetector/export_onnx_models.py"
+            )
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = Config.FACE_DETECTOR_ONNX_NUM_THREADS if num_threads is None else num_threads
+        self.session = onnxruntime.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+        self.output_names = [model_output.name for model_output in self.session.get_outputs()]
+        self.recorded_inputs = None
+
+    @property
+    def input_shape(self):
+        """The shape of the first input, the dimensions which depend on the input are names or None"""
+        return self.session.get_inputs()[0].shape
+
+    def run(self, *inputs):
+        """
+        Run the model.
+
+        Args:
+            *inputs (numpy.ndarray): The inputs of the model in the order of its inputs, they are converted to float32.
+
+        Returns:
+            list: The outputs of the model in the order of its outputs, as the predict method of a Keras model.
+        """
+        feed = {name: np.ascontiguousarray(value, dtype=np.float32) for name, value in zip(self.input_names, inputs)}
+        if self.recorded_inputs is not None:
+            self.recorded_inputs.append(feed)
+        return self.session.run(self.output_names, feed)
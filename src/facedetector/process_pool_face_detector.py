@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+This module contains the ProcessPoolFaceDetector class.
+This class uses a pool of worker processes for concurrency
+
+Functionality:
+------------------------------------------------------------------------------------------------
+
+1. Every worker process creates its own face detector once, when the process is started.
+2. A video is read frame by frame and every frame is copied to a free slot of a shared memory block.
+3. Batches of slots are sent to the worker processes, which detect faces in the frames directly from
+the shared memory.
+4. The frames with faces are written to video writer in the order of the input video as soon as
+they are available, and their slots are given back to the reader.
+
+Note: (4) write operation is performed while the remaining frames are being processed
+
+Background:
+
+1. The threads used by the other approaches compete for the GIL and for the TensorFlow/OpenCV
+thread pools, which keeps the CPU usage low on multi-core machines. Worker processes have their
+own interpreter and their own detector, so the detection scales with the number of cores.
+
+2. Only slot indices are sent to the worker processes and only the detected faces are sent back,
+the frames themselves are never pickled.
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import shared_memory
+
+from src.common.frame_ring_buffer import FrameRingBuffer
+from src.common.libraries import *
+
+# face detector and frames of the shared memory block owned by a worker process
+_worker_face_detector = None
+_worker_shared_memory = None
+_worker_frames = None
+
+
+def _initialize_worker(face_detector, shared_memory_name: str, frames_shape: tuple):
+    """Keep the face detector of the worker process and attach to the shared memory block"""
+    global _worker_face_detector, _worker_shared_memory, _worker_frames
+
+    # face detectors are not pickled with their models, a new detector is created when it is unpickled
+    _worker_face_detector = face_detector
+    _worker_shared_memory = shared_memory.SharedMemory(name=shared_memory_name)
+    _worker_frames = np.ndarray(frames_shape, dtype=np.uint8, buffer=_worker_shared_memory.buf)
+
+
+def _detect_faces_in_slots(slots: tuple, scene_cuts: list):
+    """Detect faces in the frames stored in the given slots of the shared memory block"""
+    if scene_cuts:
+        _worker_face_detector.add_scene_cuts(scene_cuts)
+    return _worker_face_detector.detect_faces_batch([_worker_frames[slot] for slot in slots])
+
+
+class ProcessPoolFaceDetector:
+    def __init__(self):
+        self.face_detector = None
+
+        # shared memory block holding the frames and the ring buffer of its slots
+        self.shared_memory = None
+        self.frame_buffer = None
+
+        # create a dict to track the detected frames which are not yet written to the output video
+        self.detected_frames = {}
+        self.next_frame_index = 0
+        # the batches write the frames which are ready, one batch at a time so that the frames stay in order
+        self.write_lock = None
+
+    def _initialize(self, async_detector, face_detector):
+        # get the members of AsyncFaceDetector instance
+        async_detector.initialize_approach(self, face_detector)
+
+        self.num_processes = 1 if face_detector.sequential else max(1, Config.FACE_DETECTOR_NUM_WORK_PROCESSES)
+        # keep enough frames in flight to feed every process while the previous batches are written
+        self.num_slots = 2 * self.num_processes * self.batch_size
+
+        self.write_lock = asyncio.Lock()
+
+    def _create_shared_frames(self):
+        """Allocate the shared memory block which is used to pass the frames to the worker processes"""
+        height = int(self.video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        width = int(self.video_capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        shape = (self.num_slots, height, width, 3)
+
+        self.shared_memory = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+        self.frame_buffer = FrameRingBuffer(self.num_slots, shape[1:], buffer=self.shared_memory.buf)
+        self.logger.debug(f"Allocated {self.num_slots} shared memory slots of {height}x{width} frames")
+
+    def _release_shared_frames(self):
+        if self.frame_buffer:
+            self.frame_buffer.close()
+            self.frame_buffer = None
+        if self.shared_memory:
+            self.shared_memory.close()
+            self.shared_memory.unlink()
+            self.shared_memory = None
+
+    async def _detect_faces_in_batch(self, executor, batch: list):
+        """Detect faces of a batch of frames in a worker process and write the frames which are ready"""
+        loop = asyncio.get_running_loop()
+        frame_indices, slots = zip(*batch)
+        # the face detector of the worker process does not see the scene cuts found by the reader
+        scene_cuts = [frame_index for frame_index in frame_indices if frame_index in self.scene_cuts]
+        faces = await loop.run_in_executor(executor, _detect_faces_in_slots, slots, scene_cuts)
+
+        for frame_index, slot, frame_faces in zip(frame_indices, slots, faces.split(len(slots))):
+            self.detected_frames[frame_index] = (slot, frame_faces)
+        self.logger.debug(f"Detected faces in frames at indices {frame_indices}")
+        await self._write_ready_frames()
+
+    async def _detect_faces_with_process_pool(self, executor):
+        """batches of frames are processed concurrently by the worker processes"""
+        # every slot of the shared memory can be in a batch which is detected or waits to be written
+        max_batches = self.num_slots // self.batch_size
+        await self._detect_batches_from_queue(partial(self._detect_faces_in_batch, executor), max_batches)
+
+    async def _write_ready_frames(self):
+        """Write the frames which are next in order to the output video and give their slots back"""
+        async with self.write_lock:
+            while self.next_frame_index in self.detected_frames:
+                slot, faces = self.detected_frames.pop(self.next_frame_index)
+                await self._write_frame_async(self.next_frame_index, self.frame_buffer.frames[slot], faces)
+                self.frame_buffer.release(slot)
+                self.logger.debug(f"Wrote frame {self.next_frame_index} with faces to output video")
+                self.next_frame_index += 1
+
+    async def detect_faces_in_realtime(self, async_detector, face_detector):
+        """
+        Detect faces in a video in real-time and write the frames with faces to an output video file
+        """
+        self._initialize(async_detector, face_detector)
+        try:
+            self._create_shared_frames()
+            self.logger.info(f"Number of worker processes: {self.num_processes}")
+
+            # worker processes are spawned, forking a process which already loaded TensorFlow is not safe
+            with ProcessPoolExecutor(
+                max_workers=self.num_processes,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_initialize_worker,
+                initargs=(face_detector, self.shared_memory.name, self.frame_buffer.frames.shape),
+            ) as executor:
+                await asyncio.gather(
+                    self._read_frames_into_queue(frame_buffer=self.frame_buffer),
+                    self._detect_faces_with_process_pool(executor),
+                )
+            await self._release_video_writer()
+            self.logger.info("Finished writing to output video")
+            self._log_queue_usage(self.frames_queue)
+        finally:
+            self._release_shared_frames()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+This module contains the ReorderBuffer class, which gives back the frames detected out of order in the order
+of the video.
+
+Functionality:
+------------------------------------------------------------------------------------------------
+
+1. The detection workers put every frame with its index (put), in the order in which they finish.
+2. The frames wait in a heap keyed by their index, the writer awaits the next frame in order (get) and gets it
+as soon as it was put, or None once all the frames of the video were taken.
+3. The window bounds the frames held by the buffer: a frame is only put when its index is less than
+window frames ahead of the next frame in order, otherwise its worker waits until the writer has caught up.
+4. The reader tells the buffer the number of frames of the video when it has read them all (close).
+
+Example Usage:
+
+reorder_buffer = ReorderBuffer(window=64)
+await reorder_buffer.put(1, frame_1)     # in a worker
+await reorder_buffer.put(0, frame_0)     # in another worker
+await reorder_buffer.close(2)            # in the reader
+async for frame_index, frame in reorder_buffer:
+    video_writer.write(frame)
+
+Background:
+
+1. AsyncQueue inserted the frames into a list at their index, which moves every later frame (O(n) per frame) and
+puts a frame at the wrong position when the frames before it are not in the list yet. A heap keeps the frames
+which arrived in order with O(log n) per frame, and only the frames of the window are held.
+"""
+
+import asyncio
+import heapq
+
+
+class ReorderBuffer:
+    """
+    Class ordering the items put with their index out of order.
+
+    Attributes:
+        window (int): The maximum distance of the index of a put item from the next index.
+        next_index (int): The index of the next item returned by get.
+        end_index (int): The index after the last item, None until the buffer is closed.
+        high_water_mark (int): The largest number of items held by the buffer at once.
+    """
+
+    def __init__(self, window: int, start_index: int = 0):
+        self.window = max(1, window)
+        self.next_index = start_index
+        self.end_index = None
+        self.high_water_mark = 0
+
+        self._heap = []
+        self._condition = asyncio.Condition()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def _is_next_ready(self) -> bool:
+        return bool(self._heap) and self._heap[0][0] == self.next_index
+
+    async def put(self, index: int, item):
+        """Add an item, waits until its index is within the window of the next index"""
+        async with self._condition:
+            if index < self.next_index:
+                raise ValueError(f"Item {index} was already returned by the reorder buffer")
+            await self._condition.wait_for(lambda: index < self.next_index + self.window)
+            heapq.heappush(self._heap, (index, item))
+            self.high_water_mark = max(self.high_water_mark, len(self._heap))
+            self._condition.notify_all()
+
+    async def get(self):
+        """
+        Wait for the next item in order.
+
+        Returns:
+            tuple: (index, item) of the next item, None once every item before the end index was returned.
+        """
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._is_next_ready() or self.next_index == self.end_index)
+            if not self._is_next_ready():
+                return None
+            index, item = heapq.heappop(self._heap)
+            self.next_index += 1
+            self._condition.notify_all()
+            return index, item
+
+    async def close(self, end_index: int):
+        """Tell the buffer that no item with an index of end_index or above is put"""
+        async with self._condition:
+            self.end_index = end_index
+            self._condition.notify_all()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        entry = await self.get()
+        if entry is None:
+            raise StopAsyncIteration
+        return entry
+
+    def usage(self) -> str:
+        """returns the high-water mark, as logged at the end of a job"""
+        return f"reorder_buffer: high-water mark {self.high_water_mark}/{self.window}"
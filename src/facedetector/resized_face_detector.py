@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+This module contains the ResizedFaceDetector class, which runs a face detector on downscaled frames
+and maps the detected faces back to the coordinates of the original frames.
+
+Functionality:
+------------------------------------------------------------------------------------------------
+
+1. The scale of the frames is chosen once per video by get_detection_scale, either from a fixed length of
+the long side of the frames (FACE_DETECTOR_RESOLUTION) or from the smallest face which is expected in
+the video (FACE_DETECTOR_MIN_FACE_SIZE) and the smallest face the face detector is able to find.
+2. Every frame is downscaled before it is given to the face detector.
+3. The boxes and keypoints of the detected faces are scaled back to the original frame.
+
+Background:
+
+1. The cost of detectors such as MTCNN grows with the number of pixels of a frame, while faces in a
+1080p or 4K video are large enough to be found in a much smaller frame. With a fixed detection resolution,
+a 4K video costs about the same as a 480p video.
+"""
+
+from src.common.libraries import *
+from src.facedetector.face_detector import FaceDetector
+
+
+def get_detection_scale(
+    frame_width: int, frame_height: int, detection_resolution=None, face_detector: FaceDetector = None
+) -> float:
+    """
+    Get the scale of the frames given to the face detector.
+
+    Args:
+        frame_width (int): The width of the frames of the video.
+        frame_height (int): The height of the frames of the video.
+        detection_resolution: The length of the long side of the frames given to the face detector, "auto" to
+            choose it from Config.FACE_DETECTOR_MIN_FACE_SIZE or None to keep the original frames.
+            Config.FACE_DETECTOR_RESOLUTION is used by default.
+        face_detector (FaceDetector): The face detector, used to find the smallest detectable face in "auto" mode.
+
+    Returns:
+        float: The scale of the frames, frames are never upscaled.
+    """
+    if detection_resolution is None:
+        detection_resolution = Config.FACE_DETECTOR_RESOLUTION
+
+    long_side = max(frame_width, frame_height)
+    if not detection_resolution or not long_side:
+        return 1.0
+    if detection_resolution == "auto":
+        min_detectable_face_size = face_detector.min_face_size if face_detector else FaceDetector.min_face_size
+        scale = min_detectable_face_size / max(1, Config.FACE_DETECTOR_MIN_FACE_SIZE)
+    else:
+        scale = int(detection_resolution) / long_side
+    return min(1.0, scale)
+
+
+class ResizedFaceDetector(FaceDetector):
+    """
+    ResizedFaceDetector class is a subclass of FaceDetector. It runs the given face detector on
+    frames which are resized with the given scale.
+    """
+
+    def __init__(self, detector: FaceDetector, scale: float):
+        """
+        Initialize the class with the face detector and the scale of the frames.
+
+        Args:
+            detector (FaceDetector): The face detector which is run on the resized frames.
+            scale (float): The scale of the frames given to the face detector.
+        """
+        self.detector = detector
+        self.scale = scale
+        self.sequential = detector.sequential
+        self.min_face_size = detector.min_face_size / scale
+
+    def __reduce__(self):
+        return (self.__class__, (self.detector, self.scale))
+
+    def get_params(self):
+        return {"type": self.__class__.__name__, "detector": self.detector.get_params(), "scale": self.scale}
+
+    def add_scene_cuts(self, frame_indices):
+        self.detector.add_scene_cuts(frame_indices)
+
+    def detect_faces(self, frame):
+        """
+        Detect faces in the given frame.
+
+        Args:
+            frame (numpy.ndarray): The frame in which faces need to be detected.
+
+        Returns:
+            Detections: The detected faces in the coordinates of the given frame.
+        """
+        return self.detector.detect_faces(self._resize(frame)).transformed(scale=1 / self.scale)
+
+    def detect_faces_batch(self, frames):
+        """
+        Detect faces in a batch of frames, the resized frames are given to the face detector at once.
+        """
+        faces = self.detector.detect_faces_batch([self._resize(frame) for frame in frames])
+        return faces.transformed(scale=1 / self.scale)
+
+    def _resize(self, frame):
+        height, width = frame.shape[:2]
+        size = (max(1, round(width * self.scale)), max(1, round(height * self.scale)))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
@@ -2,10 +2,39 @@
 """
 This module contains the RetinaFace class, which is a concrete implementation of the
 FaceDetector class.
+
+The detector is the RetinaFace model of Pytorch_Retinaface (MobileNet-0.25 backbone) exported to ONNX,
+run with cv2.dnn, or with ONNX Runtime when Config.FACE_DETECTOR_BACKEND is "onnxruntime".
+The path of the model is Config.MODEL_RETINAFACE_PATH.
+
+Functionality:
+------------------------------------------------------------------------------------------------
+
+1. The frames of a batch are resized to an input size with the aspect ratio of the first frame and its
+long side equal to RETINAFACE_INPUT_SIZE, and given to the network at once. A model exported with a fixed
+input size is given frames of that size.
+2. The network predicts offsets from a fixed grid of prior boxes. The priors only depend on the input size,
+they are computed once per input size and cached.
+3. The boxes, scores and the five landmarks of all priors of all frames are decoded with NumPy at once,
+and overlapping boxes of the same frame are suppressed.
 """
 
+import threading
+
 from src.common.libraries import *
+from src.facedetector.detections import LANDMARK_NAMES, Detections
 from src.facedetector.face_detector import FaceDetector
+from src.facedetector.geometry import batched_nms, clip_boxes, cxcywh_to_xyxy, xyxy_to_xywh
+from src.facedetector.onnx_backend import OnnxModel, get_model_path, validate_backend
+
+# long side of the images given to the network, the input size is a multiple of the largest step
+RETINAFACE_INPUT_SIZE = 640
+RETINAFACE_MEAN = (104.0, 117.0, 123.0)
+
+# sizes of the prior boxes of every feature map and the stride of the feature map in pixels
+RETINAFACE_MIN_SIZES = ((16, 32), (64, 128), (256, 512))
+RETINAFACE_STEPS = (8, 16, 32)
+RETINAFACE_VARIANCES = (0.1, 0.2)
 
 
 class RetinaFace(FaceDetector):
@@ -14,11 +43,52 @@ class RetinaFace(FaceDetector):
     RetinaFace Algorithm.
     """
 
-    def __init__(self, model_path):
+    def __init__(self, confidence: float = None, threshold: float = None, backend: str = None, quantized: bool = None):
         """
-        Initialize the class and set the model path
+        Initialize the class and load the model from Config.MODEL_RETINAFACE_PATH
+
+        Parameters:
+        - confidence (float): The minimum score of a face, Config.FACE_DETECTOR_CONFIDENCE_THRESHOLD by default
+        - threshold (float): The threshold for non-maxima suppression, Config.FACE_DETECTOR_NMS_THRESHOLD by default
+        - backend (str): "default" (cv2.dnn) or "onnxruntime", Config.FACE_DETECTOR_BACKEND by default
+        - quantized (bool): onnxruntime backend: whether the int8 model is used,
+          Config.FACE_DETECTOR_ONNX_QUANTIZED by default
         """
-        self.net = cv2.dnn.readNet(model_path)
+        self.confidence = Config.FACE_DETECTOR_CONFIDENCE_THRESHOLD if confidence is None else confidence
+        self.threshold = Config.FACE_DETECTOR_NMS_THRESHOLD if threshold is None else threshold
+        self.backend = validate_backend(backend)
+        self.quantized = Config.FACE_DETECTOR_ONNX_QUANTIZED if quantized is None else quantized
+
+        if self.backend == "onnxruntime":
+            self.onnx_models = [OnnxModel(get_model_path(Config.MODEL_RETINAFACE_PATH, self.quantized))]
+            self.net = None
+        else:
+            if not os.path.isfile(Config.MODEL_RETINAFACE_PATH):
+                raise FaceDetectionError(f"RetinaFace model file {Config.MODEL_RETINAFACE_PATH} not found")
+            self.onnx_models = []
+            self.net = cv2.dnn.readNet(str(Config.MODEL_RETINAFACE_PATH))
+            self.output_layers = self.net.getUnconnectedOutLayersNames()
+
+        # prior boxes of every input size, see _get_priors
+        self.priors = {}
+
+        # the network keeps its input between setInput and forward, threads have to take turns,
+        # and the priors are cached by the thread which first decodes the outputs of an input size
+        self.lock = threading.Lock()
+
+    def __reduce__(self):
+        return (self.__class__, (self.confidence, self.threshold, self.backend, self.quantized))
+
+    def get_params(self):
+        params = {
+            "type": self.__class__.__name__,
+            "confidence": self.confidence,
+            "threshold": self.threshold,
+            "backend": self.backend,
+        }
+        if self.backend == "onnxruntime":
+            params["quantized"] = self.quantized
+        return params
 
     def detect_faces(self, frame):
         """
@@ -28,40 +98,102 @@ class RetinaFace(FaceDetector):
         - frame (numpy array): The frame in which faces need to be detected
 
         Returns:
-        - None
+        - faces (Detections): The boxes, scores and landmarks of the detected faces
+        """
+        return self.detect_faces_batch([frame])
+
+    def detect_faces_batch(self, frames):
+        """
+        Detect faces in a batch of frames with a single forward pass of the network
+
+        Parameters:
+        - frames (list): The frames in which faces need to be detected
+
+        Returns:
+        - faces (Detections): The boxes, scores and landmarks of the faces detected in all frames,
+          frame_idx is the position of the frame in frames
+        """
+        if len(frames) == 0:
+            return Detections(with_landmarks=True)
+
+        input_size = self._get_input_size(*frames[0].shape[1::-1])
+        blob = cv2.dnn.blobFromImages(frames, 1.0, input_size, RETINAFACE_MEAN)
+        if self.net is None:
+            outputs = self.onnx_models[0].run(blob)
+        else:
+            with self.lock:
+                self.net.setInput(blob)
+                outputs = self.net.forward(self.output_layers)
+        return self._decode(outputs, frames, input_size)
+
+    def _get_input_size(self, width: int, height: int):
+        """The size of the network input with the aspect ratio of the frame, a multiple of the largest step"""
+        if self.net is None:
+            # the height and width of a model exported with a fixed input size are numbers
+            _, _, input_height, input_width = self.onnx_models[0].input_shape
+            if isinstance(input_width, int) and isinstance(input_height, int):
+                return input_width, input_height
+
+        scale = RETINAFACE_INPUT_SIZE / max(width, height)
+        step = max(RETINAFACE_STEPS)
+        return tuple(max(step, int(round(side * scale / step)) * step) for side in (width, height))
+
+    def _get_priors(self, input_size: tuple):
+        """
+        Get the prior boxes (center_x, center_y, width, height) of an input size, relative to the input size.
+        The priors are ordered by feature map, then by row, column and size, as the outputs of the network.
         """
-        (H, W) = frame.shape[:2]
-
-        # construct a blob from the input frame and then perform a forward
-        # pass of the RetinaFace object detector, giving us our bounding boxes and
-        # associated probabilities
-        blob = cv2.dnn.blobFromImage(frame, 1.0, (W, H), (104.0, 177.0, 123.0))
-        self.net.setInput(blob)
-        detections = self.net.forward()
-
-        boxes = []
-        confidences = []
-        for i in range(detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
-            if confidence > 0.8:
-                box = detections[0, 0, i, 3:7] * np.array([W, H, W, H])
-                (startX, startY, endX, endY) = box.astype("int")
-
-                # update our list of bounding box coordinates, confidences
-                boxes.append([startX, startY, endX, endY])
-                confidences.append(confidence)
-
-        # apply non-maxima suppression to suppress weak, overlapping bounding
-        # boxes
-        idxs = cv2.dnn.NMSBoxes(boxes, confidences, 0.5, 0.3)
-
-        # ensure at least one detection exists
-        if len(idxs) > 0:
-            # loop over the indexes we are keeping
-            for i in idxs.flatten():
-                # extract the bounding box coordinates
-                (x, y) = (boxes[i][0], boxes[i][1])
-                (w, h) = (boxes[i][2], boxes[i][3])
-
-                # draw a rectangle around the face
-                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+        # the worker threads of the async approaches decode the outputs of their batches at the same time
+        with self.lock:
+            if input_size not in self.priors:
+                self.priors[input_size] = self._compute_priors(input_size)
+            return self.priors[input_size]
+
+    @staticmethod
+    def _compute_priors(input_size: tuple):
+        """Compute the prior boxes of an input size, see _get_priors"""
+        width, height = input_size
+        priors = []
+        for step, min_sizes in zip(RETINAFACE_STEPS, RETINAFACE_MIN_SIZES):
+            rows, columns = int(np.ceil(height / step)), int(np.ceil(width / step))
+            center_y, center_x = np.meshgrid(
+                (np.arange(rows) + 0.5) * step / height, (np.arange(columns) + 0.5) * step / width, indexing="ij"
+            )
+            grid = np.empty((rows, columns, len(min_sizes), 4), dtype=np.float32)
+            grid[..., 0] = center_x[..., None]
+            grid[..., 1] = center_y[..., None]
+            grid[..., 2] = np.array(min_sizes) / width
+            grid[..., 3] = np.array(min_sizes) / height
+            priors.append(grid.reshape(-1, 4))
+
+        return np.concatenate(priors)
+
+    def _decode(self, outputs, frames, input_size: tuple):
+        """Convert the offsets predicted from the prior boxes to the boxes and landmarks of the faces"""
+        priors = self._get_priors(input_size)
+        # the outputs are told apart by the length of their rows: boxes (4), scores (2) and landmarks (10)
+        outputs = {output.shape[-1]: output.reshape(len(frames), len(priors), -1) for output in outputs}
+        locations, scores, landmarks = outputs[4], outputs[2][:, :, 1], outputs[2 * len(LANDMARK_NAMES)]
+
+        image_ids, prior_ids = np.nonzero(scores > self.confidence)
+        if len(image_ids) == 0:
+            return Detections(with_landmarks=True)
+
+        priors = priors[prior_ids]
+        locations = locations[image_ids, prior_ids]
+        sizes = np.array([frame.shape[1::-1] for frame in frames], dtype=np.float32)[image_ids]
+
+        centers = priors[:, :2] + locations[:, :2] * RETINAFACE_VARIANCES[0] * priors[:, 2:]
+        box_sizes = priors[:, 2:] * np.exp(locations[:, 2:] * RETINAFACE_VARIANCES[1])
+        boxes = cxcywh_to_xyxy(np.concatenate([centers, box_sizes], axis=1)) * np.tile(sizes, 2)
+        boxes = clip_boxes(boxes, sizes[:, 0], sizes[:, 1])
+
+        points = landmarks[image_ids, prior_ids].reshape(-1, len(LANDMARK_NAMES), 2)
+        points = priors[:, None, :2] + points * RETINAFACE_VARIANCES[0] * priors[:, None, 2:]
+        points = np.round(points * sizes[:, None, :]).astype(np.int32)
+        scores = scores[image_ids, prior_ids]
+
+        # overlapping boxes of the same frame are suppressed
+        keep = batched_nms(boxes, scores, image_ids, self.threshold)
+        boxes = np.round(xyxy_to_xywh(boxes[keep])).astype(np.int32)
+        return Detections.from_boxes(boxes, scores=scores[keep], landmarks=points[keep], frame_idx=image_ids[keep])
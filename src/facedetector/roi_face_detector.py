@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+This module contains the RoiFaceDetector class, which searches for faces only in regions of interest
+around the faces of the previous frame.
+
+Functionality:
+------------------------------------------------------------------------------------------------
+
+1. The wrapped face detector is run on the whole frame on the first frame, on every
+FACE_DETECTOR_KEYFRAME_STRIDE-th frame and on the frames which start a new scene.
+2. In the other frames, the box of every face of the previous frame is enlarged by FACE_DETECTOR_ROI_PADDING
+on each side and the face detector is run on these crops of the frame only.
+3. The faces found in the crops are mapped back to the coordinates of the frame. When no face is found
+in one of the crops, the face is lost and the face detector is run on the whole frame instead.
+
+Background:
+
+1. On close-up footage a face covers a small part of the frame and moves little from one frame to the next,
+so searching the enlarged box is much cheaper than searching the whole frame.
+
+2. Faces which appear in a new part of the frame are only found by the next pass over the whole frame.
+
+Note: the faces of a frame depend on the previous frame, the frames of a video have to be given to
+the detector one after another in order.
+"""
+
+from src.common.libraries import *
+from src.facedetector.face_detector import FaceDetector
+from src.facedetector.geometry import clip_boxes, nms, xywh_to_xyxy
+
+
+class RoiFaceDetector(FaceDetector):
+    """
+    RoiFaceDetector class is a subclass of FaceDetector. It runs the given face detector on padded regions
+    around the faces of the previous frame and on the whole frame from time to time.
+    """
+
+    sequential = True
+
+    def __init__(self, detector, full_frame_stride: int = None, padding: float = None):
+        """
+        Initialize the class with the face detector which is run on the regions of interest.
+
+        Args:
+            detector (FaceDetector): The face detector.
+            full_frame_stride (int): Number of frames from one pass over the whole frame to the next,
+                Config.FACE_DETECTOR_KEYFRAME_STRIDE is used by default.
+            padding (float): Fraction of the size of a face which is added on each side of its box,
+                Config.FACE_DETECTOR_ROI_PADDING is used by default.
+        """
+        self.detector = detector
+        self.min_face_size = detector.min_face_size
+        self.full_frame_stride = max(1, full_frame_stride or Config.FACE_DETECTOR_KEYFRAME_STRIDE)
+        self.padding = Config.FACE_DETECTOR_ROI_PADDING if padding is None else padding
+
+        self.logger = Logger(name=self.__class__.__name__)
+        self.reset()
+
+    def __reduce__(self):
+        return (self.__class__, (self.detector, self.full_frame_stride, self.padding))
+
+    def get_params(self):
+        return {
+            "type": self.__class__.__name__,
+            "detector": self.detector.get_params(),
+            "full_frame_stride": self.full_frame_stride,
+            "padding": self.padding,
+        }
+
+    def reset(self):
+        """
+        Forget the faces of the previous frame and the scene cuts, the next frame is the first frame of a video.
+        """
+        self.previous_faces = None
+        self.previous_shape = None
+        self.frames_since_full_frame = 0
+        self.frame_index = 0
+        self.scene_cuts = set()
+
+    def add_scene_cuts(self, frame_indices):
+        self.scene_cuts.update(frame_indices)
+
+    def detect_faces(self, frame):
+        """
+        Detect faces in the given frame, in the regions around the faces of the previous frame
+        or in the whole frame.
+
+        Args:
+            frame (numpy.ndarray): The next frame of the video.
+
+        Returns:
+            Detections: The detected faces.
+        """
+        faces = None
+        if self._is_roi_search_possible(frame):
+            faces = self._detect_faces_in_regions(frame)
+            if faces is None:
+                self.logger.debug(f"Face lost in frame {self.frame_index}, detecting faces in the whole frame")
+
+        if faces is None:
+            faces = self.detector.detect_faces(frame)
+            self.frames_since_full_frame = 0
+        else:
+            self.frames_since_full_frame += 1
+
+        self.previous_faces = faces
+        self.previous_shape = frame.shape
+        self.frame_index += 1
+        return faces
+
+    def _is_roi_search_possible(self, frame):
+        """Regions around the previous faces are searched unless the whole frame has to be searched"""
+        return (
+            self.previous_faces is not None
+            and len(self.previous_faces) > 0
+            and self.previous_shape == frame.shape
+            and self.frames_since_full_frame + 1 < self.full_frame_stride
+            and self.frame_index not in self.scene_cuts
+        )
+
+    def _get_regions(self, boxes, frame_width: int, frame_height: int):
+        """Enlarge the face boxes by the padding on each side and clip them to the frame"""
+        pad = np.round(self.padding * boxes[:, 2:].max(axis=1))[:, None]
+        regions = xywh_to_xyxy(boxes) + np.concatenate([-pad, -pad, pad, pad], axis=1)
+        return clip_boxes(regions, frame_width, frame_height).astype(int)
+
+    def _detect_faces_in_regions(self, frame):
+        """
+        Detect faces in the regions around the faces of the previous frame.
+
+        Returns:
+            Detections: The detected faces in the coordinates of the frame, None if a face of the previous frame
+            was lost.
+        """
+        frame_height, frame_width = frame.shape[:2]
+        regions = self._get_regions(self.previous_faces.boxes, frame_width, frame_height)
+        if (regions[:, 2:] - regions[:, :2] < self.min_face_size).any():
+            return None
+
+        crops = [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in regions]
+        faces = self.detector.detect_faces_batch(crops)
+        if len(np.unique(faces.frame_idx)) < len(crops):
+            return None
+
+        # frame_idx of the faces is the index of their crop
+        faces = faces.transformed(dx=regions[faces.frame_idx, 0], dy=regions[faces.frame_idx, 1])
+        return self._remove_duplicates(faces).with_frame_idx(0)
+
+    @staticmethod
+    def _remove_duplicates(faces):
+        """Regions of faces which are close to each other overlap, a face found in several regions is kept once"""
+        keep = nms(xywh_to_xyxy(faces.boxes), faces.scores, 0.5)
+        return faces[np.sort(keep)]
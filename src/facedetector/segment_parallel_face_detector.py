@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+This module contains the SegmentParallelFaceDetector class.
+This class splits a video into segments and processes every segment in its own process
+
+Functionality:
+------------------------------------------------------------------------------------------------
+
+1. The video is split at keyframes into about FACE_DETECTOR_NUM_WORK_PROCESSES segments with ffmpeg,
+without re-encoding (-c copy with the segment muxer, which only cuts at keyframes).
+2. Every segment is processed by a worker process with its own video reader, face detector and video writer:
+the frames are read, the faces are detected in batches and the frames with faces are written to an output
+segment.
+3. The output segments are joined into the output video with the ffmpeg concat demuxer, without re-encoding.
+4. The faces and the scene cuts of all segments are mapped back to the indices of the frames in the video.
+
+Note: segments are never shorter than FACE_DETECTOR_SEGMENT_MIN_DURATION seconds, a short video is processed
+as a single segment. The video is processed as a single segment as well when ffmpeg is not installed.
+
+Background:
+
+1. In the other approaches a single reader decodes the whole video and a single writer encodes it, so for long
+movies decoding and encoding are the bottleneck no matter how many detection workers are used.
+
+2. Here every process decodes, detects and encodes its own segment, so the time to process a long video
+scales with the number of cores.
+
+3. A sequential face detector (tracking and roi modes) processes every segment on its own, the first frame
+of a segment is searched by the face detector as if the video started there.
+"""
+
+import asyncio
+import glob
+import multiprocessing
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from src.common.frame_ring_buffer import FrameRingBuffer
+from src.common.libraries import *
+from src.common.video_reader import open_video
+from src.common.video_writer import open_video_writer
+from src.facedetector.detections import Detections
+from src.facedetector.scene_detector import SceneCutDetector
+
+
+def _process_segment(face_detector, input_file: str, output_file: str, batch_size: int, detect_scene_cuts: bool):
+    """
+    Detect faces in a segment of the video and write its frames with faces to the output segment.
+
+    Returns:
+        tuple: The faces of the segment (frame_idx is the index of the frame in the segment), the number of frames
+        and the indices of the frames which start a new scene.
+    """
+    video_capture = open_video(input_file)
+    fps = video_capture.get(cv2.CAP_PROP_FPS)
+    frame_size = (video_capture.get(cv2.CAP_PROP_FRAME_WIDTH), video_capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    video_writer = open_video_writer(output_file, fps, frame_size)
+    scene_detector = SceneCutDetector() if detect_scene_cuts else None
+    # the frames of a batch are decoded into the same slots for every batch
+    frame_buffer = FrameRingBuffer(batch_size, (int(frame_size[1]), int(frame_size[0]), 3))
+
+    faces_per_frame = []
+    scene_cuts = []
+    try:
+        while True:
+            frames = []
+            while len(frames) < batch_size:
+                if not frame_buffer.read(video_capture, len(frames)):
+                    break
+                frame = frame_buffer.frames[len(frames)]
+                frame_index = len(faces_per_frame) + len(frames)
+                if scene_detector is not None and scene_detector.is_scene_cut(frame_index, frame):
+                    scene_cuts.append(frame_index)
+                    face_detector.add_scene_cuts([frame_index])
+                frames.append(frame)
+            if not frames:
+                break
+
+            faces = face_detector.detect_faces_batch(frames)
+            for frame, frame_faces in zip(frames, faces.split(len(frames))):
+                for x, y, w, h in frame_faces.boxes.tolist():
+                    cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
+                video_writer.write(frame)
+                faces_per_frame.append(frame_faces)
+    finally:
+        video_capture.release()
+        video_writer.release()
+
+    return Detections.from_frames(faces_per_frame), len(faces_per_frame), scene_cuts
+
+
+class SegmentParallelFaceDetector:
+    def __init__(self):
+        self.face_detector = None
+        self.num_processes = 1
+        self.fps = 0
+
+    def _initialize(self, async_detector, face_detector):
+        # get the members of AsyncFaceDetector instance
+        async_detector.initialize_approach(self, face_detector)
+
+        # every segment has its own face detector, so sequential face detectors are run in parallel as well
+        self.num_processes = max(1, Config.FACE_DETECTOR_NUM_WORK_PROCESSES)
+        self.fps = self.video_capture.get(cv2.CAP_PROP_FPS)
+
+    def _get_num_segments(self):
+        """returns the number of segments, every segment is at least FACE_DETECTOR_SEGMENT_MIN_DURATION seconds"""
+        if not shutil.which(Config.FFMPEG_BINARY):
+            self.logger.warning(f"{Config.FFMPEG_BINARY} is not found, processing the video as a single segment")
+            return 1
+        if self.fps <= 0 or self.total_frames <= 0:
+            return 1
+        duration = self.total_frames / self.fps
+        return max(1, min(self.num_processes, int(duration // max(1, Config.FACE_DETECTOR_SEGMENT_MIN_DURATION))))
+
+    def _split_video(self, folder: str, num_segments: int):
+        """Split the video at keyframes into segments without re-encoding, returns the files of the segments"""
+        segment_time = self.total_frames / self.fps / num_segments
+        extension = os.path.splitext(str(self.input_file))[1] or f".{Config.VIDEO_DEFAULT_FORMAT}"
+        command = [Config.FFMPEG_BINARY, "-nostdin", "-y", "-loglevel", "error", "-i", str(self.input_file)]
+        command += [
+            "-map",
+            "0:v:0",
+            "-an",
+            "-sn",
+            "-c",
+            "copy",
+            "-f",
+            "segment",
+            "-segment_time",
+            f"{segment_time:.3f}",
+        ]
+        command += ["-reset_timestamps", "1", os.path.join(folder, f"input_%04d{extension}")]
+        subprocess.run(command, check=True, capture_output=True)
+        return sorted(glob.glob(os.path.join(folder, f"input_*{extension}")))
+
+    def _concat_segments(self, folder: str, segment_files: list):
+        """Join the output segments into the output video without re-encoding"""
+        list_file = os.path.join(folder, "segments.txt")
+        with open(list_file, "w") as file:
+            for segment_file in segment_files:
+                file.write(f"file '{segment_file}'\n")
+        command = [Config.FFMPEG_BINARY, "-nostdin", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0"]
+        command += ["-i", list_file, "-c", "copy", str(self.output_file)]
+        subprocess.run(command, check=True, capture_output=True)
+
+    async def _process_segments(self, input_files: list, output_files: list):
+        """every segment is processed by a worker process"""
+        # worker processes are spawned, forking a process which already loaded TensorFlow is not safe
+        with ProcessPoolExecutor(
+            max_workers=min(self.num_processes, len(input_files)), mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            loop = asyncio.get_event_loop()
+            futures = [
+                loop.run_in_executor(
+                    executor,
+                    _process_segment,
+                    self.face_detector,
+                    input_file,
+                    output_file,
+                    self.batch_size,
+                    self.scene_detector is not None,
+                )
+                for input_file, output_file in zip(input_files, output_files)
+            ]
+            results = await asyncio.gather(*futures)
+
+        # frame indices of the segments start at 0, they are mapped back to the indices of the video
+        start = 0
+        for faces, num_frames, scene_cuts in results:
+            for frame_index, frame_faces in enumerate(faces.split(num_frames)):
+                self._record_faces(start + frame_index, frame_faces)
+            self.scene_cuts.extend(start + frame_index for frame_index in scene_cuts)
+            start += num_frames
+        self.logger.info(f"Processed {start} frames in {len(input_files)} segments")
+
+    async def detect_faces_in_realtime(self, async_detector, face_detector):
+        """
+        Detect faces in a video in real-time and write the frames with faces to an output video file
+        """
+        self._initialize(async_detector, face_detector)
+        num_segments = self._get_num_segments()
+        # the output video is written by the worker processes, not by the video writer of AsyncFaceDetector
+        self.video_capture.release()
+        self.video_writer.release()
+
+        self.logger.info(f"Number of worker processes: {min(self.num_processes, num_segments)}")
+
+        if num_segments == 1:
+            await self._process_segments([str(self.input_file)], [str(self.output_file)])
+        else:
+            with tempfile.TemporaryDirectory() as folder:
+                input_files = await asyncio.to_thread(self._split_video, folder, num_segments)
+                self.logger.info(f"Split the video into {len(input_files)} segments at keyframes")
+                output_files = [
+                    os.path.join(folder, f"output_{i:04d}.{Config.VIDEO_DEFAULT_FORMAT}")
+                    for i in range(len(input_files))
+                ]
+                await self._process_segments(input_files, output_files)
+                await asyncio.to_thread(self._concat_segments, folder, output_files)
+        self.logger.info("Finished writing to output video")
@@ -2,10 +2,22 @@
 """
 This module contains the SSD class, which is a concrete implementation
 of the FaceDetector class.
+
+The detector is the ResNet-10 Single Shot Detector of the OpenCV face detector sample
+(res10_300x300_ssd_iter_140000), run with cv2.dnn. The model files are downloaded to Config.MODELS_PATH
+by src/common/download_data.py.
 """
 
+import threading
+
 from src.common.libraries import *
+from src.facedetector.detections import Detections
 from src.facedetector.face_detector import FaceDetector
+from src.facedetector.geometry import clip_boxes, xyxy_to_xywh
+
+# size of the images given to the network and the mean subtracted from them (BGR)
+SSD_INPUT_SIZE = (300, 300)
+SSD_MEAN = (104.0, 177.0, 123.0)
 
 
 class SSD(FaceDetector):
@@ -13,26 +25,69 @@ class SSD(FaceDetector):
     This class is responsible for detecting faces in an image or video frame using SSD Algorithm.
     """
 
-    def init(self):
+    def __init__(self, confidence_threshold: float = None):
         """
         Initialize the class by loading the pre-trained model
+
+        :param confidence_threshold: The minimum score of a face, Config.FACE_DETECTOR_CONFIDENCE_THRESHOLD by default
         """
-        self.detector = cv2.dnn.readNetFromCaffe("path/to/model.prototxt", "path/to/weights.caffemodel")
+        self.confidence_threshold = (
+            Config.FACE_DETECTOR_CONFIDENCE_THRESHOLD if confidence_threshold is None else confidence_threshold
+        )
+
+        for path in (Config.MODEL_SSD_CONFIG_PATH, Config.MODEL_SSD_WEIGHTS_PATH):
+            if not os.path.isfile(path):
+                raise FaceDetectionError(
+                    f"SSD model file {path} not found, download it with src/common/download_data.py"
+                )
+        self.detector = cv2.dnn.readNetFromCaffe(str(Config.MODEL_SSD_CONFIG_PATH), str(Config.MODEL_SSD_WEIGHTS_PATH))
+
+        # the network keeps its input between setInput and forward, threads have to take turns
+        self.lock = threading.Lock()
+
+    def __reduce__(self):
+        return (self.__class__, (self.confidence_threshold,))
+
+    def get_params(self):
+        return {"type": self.__class__.__name__, "confidence": self.confidence_threshold}
 
     def detect_faces(self, frame):
         """
         Detect faces in the given frame using the pre-trained model
         :param frame: The frame in which faces need to be detected
-        :return: List of tuples containing the coordinates of the detected faces in the format (x, y, width, height)
-        """
-        (h, w) = frame.shape[:2]
-        blob = cv2.dnn.blobFromImage(frame, 1.0, (300, 300), (104.0, 177.0, 123.0))
-        self.detector.setInput(blob)
-        detections = self.detector.forward()
-        faces = []
-        for i in range(0, detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
-            if confidence > 0.5:
-                box = detections[0, 0, i, 3:7] * np.array([w, h, w, h])
-                (startX, startY, endX, endY) = box.astype("int")
-                faces.append((startX, startY, endX - startX, endY - startY))
+        :return: Detections with the boxes of the detected faces in the format (x, y, width, height)
+        """
+        return self.detect_faces_batch([frame])
+
+    def detect_faces_batch(self, frames):
+        """
+        Detect faces in a batch of frames with a single forward pass of the pre-trained model
+        :param frames: The frames in which faces need to be detected
+        :return: Detections with the boxes of the faces detected in all frames in the format (x, y, width, height),
+                 frame_idx is the position of the frame in frames
+        """
+        if len(frames) == 0:
+            return Detections()
+
+        blob = cv2.dnn.blobFromImages(frames, 1.0, SSD_INPUT_SIZE, SSD_MEAN)
+        with self.lock:
+            self.detector.setInput(blob)
+            # detections of all the images are returned together, the first column is the index of the image
+            detections = self.detector.forward()
+        return self._decode(detections.reshape(-1, 7), frames)
+
+    def _decode(self, detections, frames):
+        """
+        Convert the rows (image_id, label, score, x0, y0, x1, y1) of the network output to detections,
+        the coordinates of the boxes are relative to the size of their image
+        """
+        detections = detections[detections[:, 2] > self.confidence_threshold]
+
+        image_ids = detections[:, 0].astype(np.int32)
+        sizes = np.array([frame.shape[1::-1] for frame in frames], dtype=np.float32)[image_ids]
+        corners = clip_boxes(detections[:, 3:7] * np.tile(sizes, 2), sizes[:, 0], sizes[:, 1])
+        boxes = np.round(xyxy_to_xywh(corners)).astype(np.int32)
+
+        # boxes outside of the image have no area left after clipping
+        keep = (boxes[:, 2] > 0) & (boxes[:, 3] > 0)
+        return Detections.from_boxes(boxes[keep], scores=detections[keep, 2], frame_idx=image_ids[keep])
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+This module contains the StreamingFaceDetector class.
+This class uses the asyncio library and a pool of detection workers for concurrency
+
+Functionality:
+------------------------------------------------------------------------------------------------
+
+1. A video is read frame by frame into the slots of a preallocated frame ring buffer (src/common/frame_ring_buffer.py),
+and the slots are added to a bounded async queue.
+2. The detection workers take batches of frames from the queue and detect faces in a thread pool.
+3. The frames with faces are put in a bounded reorder buffer, keyed by the index of the frame.
+4. The frames are written to video writer as soon as the next frame in order is available, and their slots are
+given back to the reader. No frame is allocated while the video is processed.
+5. With FACE_DETECTOR_AUTOSCALE_ENABLED a WorkerAutoscaler decides how many of the workers are active,
+from the frames per second, the queue and the CPU use of the last interval. The job starts with
+FACE_DETECTOR_NUM_WORK_THREADS active workers.
+
+Note: (4) write operation is performed while the remaining frames are being processed
+
+Background:
+
+1. The other approaches keep every frame of the video in memory until all the frames are processed,
+so their memory usage grows with the length of the video.
+
+2. Here the reader waits when the queue is full and the workers wait when a frame is too far ahead
+of the last written frame, so at most FACE_DETECTOR_QUEUE_SIZE + FACE_DETECTOR_REORDER_WINDOW frames
+are held in memory at any time, no matter how long the video is.
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.common.frame_ring_buffer import FrameRingBuffer
+from src.common.libraries import *
+from src.facedetector.reorder_buffer import ReorderBuffer
+from src.facedetector.worker_autoscaler import WorkerAutoscaler
+
+
+class StreamingFaceDetector:
+    def __init__(self):
+        self.face_detector = None
+
+        # holds the frames with faces which are waiting for the frames before them
+        self.reorder_buffer = None
+
+        self.autoscaler = None
+        self.num_workers = 1
+
+        # preallocated frames, the queues and the reorder buffer pass the slots of the frames
+        self.frame_buffer = None
+
+    def _initialize(self, async_detector, face_detector):
+        # get the members of AsyncFaceDetector instance
+        async_detector.initialize_approach(self, face_detector)
+
+        self.reorder_buffer = ReorderBuffer(Config.FACE_DETECTOR_REORDER_WINDOW)
+
+        # a sequential face detector is run by a single worker, there is nothing to scale
+        if Config.FACE_DETECTOR_AUTOSCALE_ENABLED and not face_detector.sequential:
+            self.autoscaler = WorkerAutoscaler(self.num_processing_workers)
+            self.num_workers = self.autoscaler.max_workers
+        else:
+            self.num_workers = self.num_processing_workers
+        # workers wait here while they are not active
+        self.workers_condition = asyncio.Condition()
+        self.reading_finished = asyncio.Event()
+
+        # a slot for every frame which can be queued, detected or waiting in the reorder window at the same time,
+        # so the reader only waits for a slot when it would wait for the queue anyway
+        num_slots = self.frames_queue.maxsize + self.reorder_buffer.window + self.num_workers * self.batch_size + 1
+        self.frame_buffer = FrameRingBuffer(num_slots, (self.frame_height, self.frame_width, 3))
+
+    async def _read_frames(self):
+        """Read frames from the input video stream into the slots and put the slots on the bounded queue"""
+        await self._read_frames_into_queue(self.reorder_buffer, self.frame_buffer)
+
+        # all workers are activated to take the sentinel, it stays on the queue for the other workers
+        self.reading_finished.set()
+        async with self.workers_condition:
+            self.workers_condition.notify_all()
+
+    async def _detect_faces(self, executor, worker_index: int):
+        """Detect faces in batches of frames from the queue until the end of the video is reached"""
+        loop = asyncio.get_running_loop()
+        while True:
+            if self.autoscaler is not None:
+                async with self.workers_condition:
+                    await self.workers_condition.wait_for(
+                        lambda: worker_index < self.autoscaler.active_workers or self.reading_finished.is_set()
+                    )
+
+            batch = await self._get_batch()
+            if not batch:
+                break
+
+            frame_indices, slots = zip(*batch)
+            frames = [self.frame_buffer.frames[slot] for slot in slots]
+            start_time = time.perf_counter()
+            faces = await loop.run_in_executor(executor, self.face_detector.detect_faces_batch, frames)
+            if self.autoscaler is not None:
+                self.autoscaler.record(len(frames), time.perf_counter() - start_time)
+            self.logger.debug(f"Worker {worker_index} detected faces in frames at indices {frame_indices}")
+            await self._put_detected_frames(self.reorder_buffer, frame_indices, slots, faces)
+
+    async def _autoscale(self):
+        """Adjust the number of active workers every interval until the whole video is read"""
+        while not self.reading_finished.is_set():
+            try:
+                await asyncio.wait_for(self.reading_finished.wait(), timeout=self.autoscaler.interval)
+            except asyncio.TimeoutError:
+                self.autoscaler.update(self.frames_queue.qsize())
+                async with self.workers_condition:
+                    self.workers_condition.notify_all()
+
+    async def detect_faces_in_realtime(self, async_detector, face_detector):
+        """
+        Detect faces in a video in real-time and write the frames with faces to an output video file
+        """
+        self._initialize(async_detector, face_detector)
+        if self.autoscaler is None:
+            self.logger.info(f"Number of detection workers: {self.num_workers}")
+        else:
+            self.logger.info(
+                f"Number of detection workers: {self.autoscaler.active_workers} active, "
+                f"at most {self.num_workers} within a budget of {self.autoscaler.cpu_budget:g} cores"
+            )
+
+        with ThreadPoolExecutor(max_workers=self.num_workers) as executor:
+            tasks = [
+                self._read_frames(),
+                *[self._detect_faces(executor, i) for i in range(self.num_workers)],
+                self._write_frames_from_reorder_buffer(self.reorder_buffer, self.frame_buffer),
+            ]
+            if self.autoscaler is not None:
+                tasks.append(self._autoscale())
+            await asyncio.gather(*tasks)
+        self._log_queue_usage(self.frames_queue, self.reorder_buffer)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+This module contains the TrackingFaceDetector class, which runs a face detector on keyframes only
+and tracks the detected faces in the frames between them.
+
+Functionality:
+------------------------------------------------------------------------------------------------
+
+1. The wrapped face detector is run on the first frame and on every FACE_DETECTOR_KEYFRAME_STRIDE-th frame.
+2. In the frames between two keyframes, the faces of the previous frame are tracked with sparse
+Lucas-Kanade optical flow: corner points are picked inside every face, followed to the next frame and
+the face box is moved and scaled with the median motion of the points.
+3. The face detector is also run on the frames which start a new scene, as given by add_scene_cuts.
+4. Every point is tracked forward and backward, the fraction of points which come back to where they
+started is the tracking confidence. When it drops below FACE_DETECTOR_MIN_TRACKING_CONFIDENCE,
+the face detector is run on the frame instead.
+
+Background:
+
+1. Faces barely move from one frame to the next in a talking-head video, so running a detector such as
+MTCNN on every frame is mostly wasted work. Optical flow on a handful of points per face is much cheaper.
+
+2. The boxes and landmarks of the tracked faces are moved with the motion of their points, the scores of
+the faces are kept from the last keyframe.
+
+Note: the faces of a frame depend on the previous frame, the frames of a video have to be given to
+the detector one after another in order.
+"""
+
+from src.common.libraries import *
+from src.facedetector.face_detector import FaceDetector
+from src.facedetector.geometry import clip_boxes, xywh_to_xyxy
+
+
+class TrackingFaceDetector(FaceDetector):
+    """
+    TrackingFaceDetector class is a subclass of FaceDetector. It runs the given face detector on keyframes
+    and tracks the faces with optical flow in the other frames.
+    """
+
+    sequential = True
+
+    def __init__(self, detector, keyframe_stride: int = None, min_tracking_confidence: float = None):
+        """
+        Initialize the class with the face detector which is run on keyframes.
+
+        Args:
+            detector (FaceDetector): The face detector which is run on keyframes.
+            keyframe_stride (int): Number of frames from one keyframe to the next,
+                Config.FACE_DETECTOR_KEYFRAME_STRIDE is used by default.
+            min_tracking_confidence (float): The face detector is run when the tracking confidence of a frame
+                is lower, Config.FACE_DETECTOR_MIN_TRACKING_CONFIDENCE is used by default.
+        """
+        self.detector = detector
+        self.min_face_size = detector.min_face_size
+        self.keyframe_stride = max(1, keyframe_stride or Config.FACE_DETECTOR_KEYFRAME_STRIDE)
+        if min_tracking_confidence is None:
+            min_tracking_confidence = Config.FACE_DETECTOR_MIN_TRACKING_CONFIDENCE
+        self.min_tracking_confidence = min_tracking_confidence
+
+        self.logger = Logger(name=self.__class__.__name__)
+        self.lk_params = dict(
+            winSize=(21, 21),
+            maxLevel=3,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 30, 0.01),
+        )
+        self.reset()
+
+    def __reduce__(self):
+        return (self.__class__, (self.detector, self.keyframe_stride, self.min_tracking_confidence))
+
+    def get_params(self):
+        return {
+            "type": self.__class__.__name__,
+            "detector": self.detector.get_params(),
+            "keyframe_stride": self.keyframe_stride,
+            "min_tracking_confidence": self.min_tracking_confidence,
+        }
+
+    def reset(self):
+        """
+        Forget the faces of the previous frame and the scene cuts, the next frame is the first frame of a video.
+        """
+        self.previous_gray_frame = None
+        self.previous_faces = None
+        self.frames_since_keyframe = 0
+        self.frame_index = 0
+        self.scene_cuts = set()
+
+    def add_scene_cuts(self, frame_indices):
+        self.scene_cuts.update(frame_indices)
+
+    def detect_faces(self, frame):
+        """
+        Detect faces in the given frame, by running the face detector on keyframes and tracking
+        the faces of the previous frame otherwise.
+
+        Args:
+            frame (numpy.ndarray): The next frame of the video.
+
+        Returns:
+            Detections: The detected faces.
+        """
+        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+
+        faces = None
+        if self._is_tracking_possible(gray_frame):
+            faces, confidence = self._track_faces(gray_frame)
+            if confidence < self.min_tracking_confidence:
+                self.logger.debug(f"Tracking confidence {confidence:.2f}, detecting faces")
+                faces = None
+
+        if faces is None:
+            faces = self.detector.detect_faces(frame)
+            self.frames_since_keyframe = 0
+        else:
+            self.frames_since_keyframe += 1
+
+        self.previous_gray_frame = gray_frame
+        self.previous_faces = faces
+        self.frame_index += 1
+        return faces
+
+    def _is_tracking_possible(self, gray_frame):
+        """The faces of the previous frame can be tracked unless the next keyframe or a new scene is reached"""
+        return (
+            self.previous_gray_frame is not None
+            and self.previous_gray_frame.shape == gray_frame.shape
+            and self.frames_since_keyframe + 1 < self.keyframe_stride
+            and self.frame_index not in self.scene_cuts
+        )
+
+    def _track_faces(self, gray_frame):
+        """
+        Track the faces of the previous frame to the given frame.
+
+        Returns:
+            tuple: The tracked faces and the lowest tracking confidence of all faces.
+        """
+        faces = self.previous_faces
+        scales, offsets = np.ones(len(faces)), np.zeros((len(faces), 2))
+        confidence = 1.0
+        for i, box in enumerate(faces.boxes):
+            motion, face_confidence = self._track_box(gray_frame, box)
+            confidence = min(confidence, face_confidence)
+            if motion is None:
+                return None, confidence
+
+            # the face is scaled around the center of its box and moved with the median motion of its points
+            shift, scales[i], center = motion
+            offsets[i] = center + shift - center * scales[i]
+
+        return faces.transformed(scale=scales, dx=offsets[:, 0], dy=offsets[:, 1]), confidence
+
+    def _track_box(self, gray_frame, box):
+        """
+        Track a face box from the previous frame to the given frame with forward-backward optical flow.
+
+        Returns:
+            tuple: The motion of the face as (shift, scale, center of the box) and the fraction of points
+            which were tracked reliably, the motion is None if the face can not be tracked.
+        """
+        height, width = gray_frame.shape
+        x, y, w, h = (int(value) for value in box)
+        x0, y0, x1, y1 = clip_boxes(xywh_to_xyxy([[x, y, w, h]]), width, height)[0]
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return None, 0.0
+
+        mask = np.zeros_like(gray_frame)
+        mask[y0:y1, x0:x1] = 255
+        points = cv2.goodFeaturesToTrack(
+            self.previous_gray_frame, maxCorners=50, qualityLevel=0.01, minDistance=3, mask=mask
+        )
+        if points is None or len(points) < 4:
+            return None, 0.0
+
+        next_points, status, _ = cv2.calcOpticalFlowPyrLK(
+            self.previous_gray_frame, gray_frame, points, None, **self.lk_params
+        )
+        back_points, back_status, _ = cv2.calcOpticalFlowPyrLK(
+            gray_frame, self.previous_gray_frame, next_points, None, **self.lk_params
+        )
+        error = np.linalg.norm((points - back_points).reshape(-1, 2), axis=1)
+        good = (status.ravel() == 1) & (back_status.ravel() == 1) & (error < 1.0)
+        confidence = float(good.mean())
+        if good.sum() < 2:
+            return None, confidence
+
+        old, new = points.reshape(-1, 2)[good], next_points.reshape(-1, 2)[good]
+        shift = np.median(new - old, axis=0)
+
+        # ratio of the distances between all pairs of points gives the change of the size of the face
+        i, j = np.triu_indices(len(old), k=1)
+        old_distances = np.linalg.norm(old[i] - old[j], axis=1)
+        new_distances = np.linalg.norm(new[i] - new[j], axis=1)
+        valid = old_distances > 1e-3
+        scale = float(np.median(new_distances[valid] / old_distances[valid])) if valid.any() else 1.0
+
+        return (shift, scale, np.array([x + w / 2, y + h / 2])), confidence
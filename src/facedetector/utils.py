@@ -5,18 +5,53 @@ This file contains utility functions that are commonly used for face detection.
 
 import asyncio
 
+from src.common.frame_ring_buffer import FrameRingBuffer
 from src.common.libraries import *
 from src.common.logger import Logger
+from src.common.model_registry import model_registry
+from src.common.video_reader import open_video
+from src.common.video_writer import open_video_writer
 from src.facedetector import (
     async_io_and_cpu_face_detector,
     async_task_face_detector,
     concurrent_futures_face_detector,
     mtcnn,
+    process_pool_face_detector,
+    retina_face,
+    roi_face_detector,
+    segment_parallel_face_detector,
     ssd,
+    streaming_face_detector,
+    tracking_face_detector,
     viola_jones,
+    yolo,
 )
+from src.facedetector.detection_cache import DetectionCache
+from src.facedetector.detections import Detections
+from src.facedetector.live_face_detector import LiveFaceDetector
+from src.facedetector.resized_face_detector import ResizedFaceDetector, get_detection_scale
 from src.utils.utils import get_current_time
 
+# face detectors loaded once per process by the model registry, with whether one instance can be used by
+# several threads (the approaches share one detector between their worker threads, so every detector has to be;
+# ViolaJones and the cv2.dnn detectors guard their model with a lock)
+FACE_DETECTORS = {
+    "ViolaJones": (viola_jones.ViolaJones, True),
+    "MTCNN": (mtcnn.MTCNNDetector, True),
+    "SSD": (ssd.SSD, True),
+    "YOLO": (yolo.YOLO, True),
+    "RetinaFace": (retina_face.RetinaFace, True),
+}
+
+
+def _warm_up_face_detector(detector):
+    """the first detection builds the graphs of TensorFlow and allocates the buffers of cv2.dnn"""
+    detector.detect_faces_batch([np.zeros((480, 640, 3), dtype=np.uint8)])
+
+
+for _detector_type, (_factory, _thread_safe) in FACE_DETECTORS.items():
+    model_registry.register(_detector_type, _factory, thread_safe=_thread_safe, warm_up=_warm_up_face_detector)
+
 """
 Below are the performance metrics of face detection without asynchronous approach:
 
@@ -48,7 +83,7 @@ Average CPU usage of 'main': 19.52%
 """
 
 
-async def detect_faces_in_realtime(detector, video: Video, destination: str = None):
+async def detect_faces_in_realtime(detector, video: Video, destination: str = None, detection_resolution=None):
     logger = Logger(name="FaceDetector")
     logger.add_file_handler("face_detection.log")
 
@@ -72,9 +107,7 @@ async def detect_faces_in_realtime(detector, video: Video, destination: str = No
     out = None
     write_to_file = os.path.exists(Config.VIDEO_OUTPUT_PATH)
     if write_to_file and os.path.exists(video_input_filename):
-        cap = cv2.VideoCapture(str(video_input_filename))
-        fourcc = cv2.VideoWriter_fourcc(*"X264")
-        fourcc = cv2.VideoWriter_fourcc("m", "p", "4", "v")
+        cap = open_video(video_input_filename)
         video_fps = (cap.get(cv2.CAP_PROP_FPS),)
         total_frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
         height = cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
@@ -82,39 +115,61 @@ async def detect_faces_in_realtime(detector, video: Video, destination: str = No
         logger.info(
             f"Frame Per second: {video_fps} \nTotal Frames: {total_frames} \n Height: {height} \nWidth: {width}"
         )
-        out = cv2.VideoWriter(
-            str(video_output_filename),
-            apiPreference=0,
-            fourcc=fourcc,
-            fps=video_fps[0],
-            frameSize=(int(width), int(height)),
-        )
+        out = open_video_writer(video_output_filename, video_fps[0], (width, height))
         logger.debug("Video is taken from input folder")
-    else:  # this might not work properly
-        cap = cv2.VideoCapture(0)
+    else:
+        # without an input video the faces are detected in the live stream of Config.LIVE_SOURCE
+        live_detector = LiveFaceDetector(detector, detection_resolution=detection_resolution)
         logger.debug("Real time video capture started...")
+        await live_detector.detect_faces_in_realtime(video_output_filename if write_to_file else None)
+        return Video(video_output_filename)
 
     if not cap.isOpened():
         logger.error("Error opening video")
         raise FaceDetectionError("Error opening video")
 
-    while cap.isOpened():
-        ret, frame = cap.read()
+    # frames are downscaled once before the detection, the faces are mapped back to the original frames
+    scale = get_detection_scale(
+        int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), detection_resolution, detector
+    )
 
-        if not ret:
+    # faces of a video file are reused when the same video was processed with the same settings before
+    detection_cache, cache_key, cached_detections, detected_faces = None, None, None, []
+    if write_to_file and Config.FACE_DETECTOR_CACHE_ENABLED:
+        detection_cache = DetectionCache()
+        cache_key = detection_cache.get_key(video_input_filename, detector, scale)
+        cached = detection_cache.load(cache_key)
+        if cached is not None:
+            cached_detections, _ = cached
+            logger.info("Faces of the video are cached, skipping face detection")
+
+    if scale < 1.0:
+        logger.info(f"Detecting faces on frames downscaled by {scale:.3f}")
+        detector = ResizedFaceDetector(detector, scale)
+
+    # every frame is decoded into the same slot, the video writer copies it
+    frame_buffer = FrameRingBuffer(
+        1, (int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 3)
+    )
+    frame = frame_buffer.frames[0]
+    frame_index = 0
+    while cap.isOpened():
+        if not frame_buffer.read(cap, 0):
             logger.warning("Error reading frame")
             break
 
-        faces = detector.detect_faces(frame)
+        if cached_detections is not None:
+            faces = cached_detections.for_frames(frame_index)
+        else:
+            faces = detector.detect_faces(frame)
+            if detection_cache is not None:
+                detected_faces.append(faces.with_frame_idx(frame_index))
+        frame_index += 1
 
         if len(faces) == 0:
             logger.debug("No faces detected")
         else:
-            for face in faces:
-                if detector.__class__.__name__ == "ViolaJones":
-                    x, y, w, h = face
-                else:
-                    x, y, w, h = face["box"]
+            for x, y, w, h in faces.boxes.tolist():
                 cv2.rectangle(frame, (x, y), (x + w, y + h), (255, 0, 0), 2)
 
         if write_to_file:
@@ -131,11 +186,14 @@ async def detect_faces_in_realtime(detector, video: Video, destination: str = No
     cap.release()
     cv2.destroyAllWindows()
 
+    if cache_key is not None and cached_detections is None:
+        detection_cache.save(cache_key, Detections.concatenate(detected_faces))
+
     logger.debug("Face Detection is completed successfully")
     return Video(video_output_filename)
 
 
-def get_face_detector(detector_type):
+def get_face_detector(detector_type, detection_mode: str = None):
     """
     This function is used to get the detector object based on the detector_type.
     It takes detector_type as input and returns the detector object
@@ -143,24 +201,34 @@ def get_face_detector(detector_type):
     Parameters:
     detector_type (str): type of detector. It should be one of the following
     ["ViolaJones", "MTCNN", "SSD", "YOLO", "RetinaFace"]
+    detection_mode (str): how the detector is run on the frames of a video, Config.FACE_DETECTOR_MODE
+    is used by default. It should be one of the following ["full", "tracking", "roi"]
 
     Returns:
-    object: detector object
+    object: detector object. The detection algorithm is loaded once per process and shared, the tracking and roi
+    detectors keep the faces of a video, so a new one is returned on every call.
     """
-    if detector_type == "ViolaJones":
-        return viola_jones.ViolaJones()
-    elif detector_type == "MTCNN":
-        return mtcnn.MTCNNDetector()
-    elif detector_type == "SSD":
-        return ssd.SSD()
-    elif detector_type == "YOLO":
-        raise NotImplementedError("Model is not implemented")
-        # return yolo.YOLO()
-    elif detector_type == "RetinaFace":
-        raise NotImplementedError("Model is not implemented")
-        # return retina_face.RetinaFace()
+    detector = _get_base_face_detector(detector_type)
+
+    detection_mode = detection_mode or Config.FACE_DETECTOR_MODE
+    if detection_mode == "full":
+        return detector
+    elif detection_mode == "tracking":
+        return tracking_face_detector.TrackingFaceDetector(detector)
+    elif detection_mode == "roi":
+        return roi_face_detector.RoiFaceDetector(detector)
     else:
+        raise ValueError(f"Invalid detection mode: {detection_mode}")
+
+
+def _get_base_face_detector(detector_type):
+    """
+    returns the detector object which runs the given detection algorithm on every frame,
+    the detector is loaded once per process by the model registry
+    """
+    if detector_type not in FACE_DETECTORS:
         raise ValueError(f"Invalid detector type: {detector_type}")
+    return model_registry.get(detector_type)
 
 
 def get_async_face_detector(approach_type: str):
@@ -170,7 +238,8 @@ def get_async_face_detector(approach_type: str):
 
     Parameters:
     approach_type (str): type of detector. It should be one of the following
-    ["AsyncTaskFaceDetector", "ConcurrentFuturesFaceDetector", "AsyncIOAndCPUFaceDetector"]
+    ["AsyncTaskFaceDetector", "ConcurrentFuturesFaceDetector", "AsyncIOAndCPUFaceDetector", "ProcessPoolFaceDetector",
+    "StreamingFaceDetector", "SegmentParallelFaceDetector"]
 
     Returns:
     object: async_face_detector object
@@ -181,6 +250,12 @@ def get_async_face_detector(approach_type: str):
         return concurrent_futures_face_detector.ConcurrentFuturesFaceDetector()
     elif approach_type == "AsyncIOAndCPUFaceDetector":
         return async_io_and_cpu_face_detector.AsyncIOAndCPUFaceDetector()
+    elif approach_type == "ProcessPoolFaceDetector":
+        return process_pool_face_detector.ProcessPoolFaceDetector()
+    elif approach_type == "StreamingFaceDetector":
+        return streaming_face_detector.StreamingFaceDetector()
+    elif approach_type == "SegmentParallelFaceDetector":
+        return segment_parallel_face_detector.SegmentParallelFaceDetector()
     else:
         raise ValueError(
             f"VIDEO_ASYNC_FACE_DETECTOR: {approach_type} value is not a supported asynchronous face detection approach."
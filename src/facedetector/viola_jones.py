@@ -4,7 +4,10 @@ This module contains the ViolaJones class, which is a concrete implementation
 of the FaceDetector class.
 """
 
+import threading
+
 from src.common.libraries import *
+from src.facedetector.detections import Detections
 from src.facedetector.face_detector import FaceDetector
 
 
@@ -14,17 +17,26 @@ class ViolaJones(FaceDetector):
     to detect faces in an image.
     """
 
+    min_face_size = 30
+
     def __init__(self):
         """
         Initializes the classifier with the path to the classifier xml file.
         """
         self.classifier = cv2.CascadeClassifier("data/models/classifiers/haarcascade_frontalface_default.xml")
 
+        # cv2.CascadeClassifier keeps the data of the current image while detecting, threads have to take turns
+        self.lock = threading.Lock()
+
+    def get_params(self):
+        return {"type": self.__class__.__name__, "scale_factor": 1.3, "min_neighbors": 5}
+
     def detect_faces(self, frame):
         """
         detect_faces method takes an image as input and returns the coordinates of
         the bounding boxes around the detected faces.
         """
         gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        faces = self.classifier.detectMultiScale(gray_frame, 1.3, 5)
-        return faces
+        with self.lock:
+            faces = self.classifier.detectMultiScale(gray_frame, 1.3, 5)
+        return Detections.from_boxes(faces)
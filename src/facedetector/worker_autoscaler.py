@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+This module contains the WorkerAutoscaler class, which adapts the number of active detection workers
+of a face detection job while it runs.
+
+Functionality:
+------------------------------------------------------------------------------------------------
+
+1. The workers report the number of frames and the time of every batch they detect (record).
+2. Every FACE_DETECTOR_AUTOSCALE_INTERVAL seconds the autoscaler measures the frames per second of the last
+interval, the time per frame of a worker, the number of frames waiting in the queue and the CPU used by the
+process, and decides the number of active workers for the next interval (update).
+3. The decision is a hill climb on the frames per second: a worker is added as long as adding the last one
+made the job faster, and a worker which did not make the job faster is removed again. After a few intervals
+at the best number of workers another worker is tried, since the best number changes with the content of the video.
+4. A worker is only added while frames are waiting in the queue (otherwise reading the video is the bottleneck)
+and while the process uses less than FACE_DETECTOR_CPU_BUDGET cores.
+5. Every decision is logged with the measurements it is based on.
+
+Background:
+
+1. A fixed number of workers (FACE_DETECTOR_NUM_WORK_THREADS) is either too small to use the cores of
+the machine or so large that the workers slow each other down, the best number depends on the detector,
+the size of the frames and the machine. The performance results in utils.py show that neither 4 nor 8 threads
+use more than about 40% of the CPU.
+"""
+
+import time
+
+from src.common.libraries import *
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+class WorkerAutoscaler:
+    """
+    WorkerAutoscaler class chooses the number of active detection workers.
+    """
+
+    # relative change of the frames per second which is not considered noise
+    tolerance = 0.05
+    # intervals spent at the best number of workers before another worker is tried
+    hold_intervals = 5
+
+    def __init__(self, initial_workers: int, max_workers: int = None, cpu_budget: float = None, interval: float = None):
+        """
+        Initialize the class.
+
+        Args:
+            initial_workers (int): The number of active workers at the start of the job.
+            max_workers (int): The maximum number of active workers, the number of cores of the budget by default.
+            cpu_budget (float): The maximum number of cores used by the process, Config.FACE_DETECTOR_CPU_BUDGET
+                or all the cores of the machine by default.
+            interval (float): The time between two decisions in seconds, Config.FACE_DETECTOR_AUTOSCALE_INTERVAL
+                by default.
+        """
+        self.cpu_budget = cpu_budget or Config.FACE_DETECTOR_CPU_BUDGET or os.cpu_count() or 1
+        self.max_workers = max(1, max_workers or int(np.ceil(self.cpu_budget)))
+        self.active_workers = min(max(1, initial_workers), self.max_workers)
+        self.interval = Config.FACE_DETECTOR_AUTOSCALE_INTERVAL if interval is None else interval
+
+        # measurements of the current interval
+        self.num_frames = 0
+        self.detection_time = 0.0
+        self.interval_start = time.monotonic()
+
+        # state of the hill climb
+        self.previous_fps = None
+        self.last_step = 0
+        self.reverted = False
+        self.intervals_held = 0
+
+        self.process = psutil.Process() if psutil else None
+        if self.process:
+            # the first call only starts the measurement
+            self.process.cpu_percent()
+
+        self.logger = Logger(name=self.__class__.__name__)
+        self.logger.add_file_handler("face_detection.log")
+
+    def record(self, num_frames: int, detection_time: float):
+        """Record a batch of frames detected by a worker and the time it took in seconds"""
+        self.num_frames += num_frames
+        self.detection_time += detection_time
+
+    def update(self, queue_size: int) -> int:
+        """
+        Decide the number of active workers from the measurements of the last interval.
+
+        Args:
+            queue_size (int): The number of frames waiting for a worker.
+
+        Returns:
+            int: The number of active workers of the next interval.
+        """
+        now = time.monotonic()
+        elapsed = now - self.interval_start
+        if self.num_frames == 0 or elapsed <= 0:
+            return self.active_workers
+
+        fps = self.num_frames / elapsed
+        latency = self.detection_time / self.num_frames
+        cpu_cores = self.process.cpu_percent() / 100 if self.process else None
+        step, reason = self._decide(fps, queue_size, cpu_cores)
+
+        cpu_usage = "unknown" if cpu_cores is None else f"{cpu_cores:.1f}/{self.cpu_budget:g}"
+        self.logger.info(
+            f"{fps:.1f} fps, {1000 * latency:.0f} ms per frame, {queue_size} frames queued, {cpu_usage} cores used "
+            f"with {self.active_workers} workers -> {self.active_workers + step} workers ({reason})"
+        )
+
+        self.active_workers += step
+        self.previous_fps = fps
+        self.last_step = step
+        self.num_frames = 0
+        self.detection_time = 0.0
+        self.interval_start = now
+        return self.active_workers
+
+    def _decide(self, fps: float, queue_size: int, cpu_cores: float):
+        """returns the change of the number of active workers and the reason for it"""
+        probing = self.last_step != 0 and not self.reverted
+        self.reverted = False
+        change = 0.0 if self.previous_fps is None else (fps - self.previous_fps) / max(self.previous_fps, 1e-6)
+
+        if probing and self.last_step > 0 and change <= self.tolerance:
+            self.reverted = True
+            return -1, f"the added worker changed fps by {change:+.0%}, removing it"
+        if probing and self.last_step < 0 and change < -self.tolerance:
+            self.reverted = True
+            return 1, f"the removed worker changed fps by {change:+.0%}, adding it back"
+
+        if probing and self.last_step > 0 or self.previous_fps is None or self.intervals_held >= self.hold_intervals:
+            self.intervals_held = 0
+            if self.active_workers >= self.max_workers:
+                return 0, "maximum number of workers"
+            if cpu_cores is not None and cpu_cores >= self.cpu_budget:
+                return 0, "cpu budget is used"
+            if queue_size == 0:
+                # reading the video is the bottleneck, a worker less may be as fast and leaves a core to the reader
+                if self.active_workers > 1:
+                    return -1, "no frames are waiting, trying a worker less"
+                return 0, "no frames are waiting"
+            if self.previous_fps is None:
+                return 1, "trying another worker"
+            return 1, f"fps changed by {change:+.0%}, trying another worker"
+        if probing and self.last_step < 0 and self.active_workers > 1:
+            return -1, f"the removed worker changed fps by {change:+.0%}, trying a worker less"
+
+        self.intervals_held += 1
+        return 0, "holding"
@@ -3,30 +3,53 @@
 This module contains the YOLO class, which is a concrete implementation of the FaceDetector class,
 using the YOLO object detection algorithm.
 
-It takes in 3 parameters during initialization:
-1. model_path: path to the pre-trained YOLO model
-2. confidence: minimum probability required to consider a detection as a face
-3. threshold: threshold for non-maxima suppression
+The detector is a YOLOv3 Darknet model trained on faces (e.g. YOLOFace trained on WIDER FACE), run with
+cv2.dnn. The paths of the model files are Config.MODEL_YOLO_CONFIG_PATH and Config.MODEL_YOLO_WEIGHTS_PATH.
+
+It takes in 2 parameters during initialization:
+1. confidence: minimum probability required to consider a detection as a face
+2. threshold: threshold for non-maxima suppression
 """
 
+import threading
+
 from src.common.libraries import *
+from src.facedetector.detections import Detections
 from src.facedetector.face_detector import FaceDetector
+from src.facedetector.geometry import batched_nms, clip_boxes, cxcywh_to_xyxy, xyxy_to_xywh
+
+# size of the images given to the network
+YOLO_INPUT_SIZE = (416, 416)
 
 
 class YOLO(FaceDetector):
     """
     Initializes the YOLO object detector and sets the necessary attributes.
     Parameters:
-    model_path (str): The file path of the YOLO model.
-    confidence (float): The minimum probability needed to filter out weak predictions.
+    confidence (float): The minimum probability needed to filter out weak predictions,
+                        Config.FACE_DETECTOR_CONFIDENCE_THRESHOLD by default.
     threshold (float): The threshold for non-maxima suppression to suppress weak,
-                        overlapping bounding boxes.
+                        overlapping bounding boxes, Config.FACE_DETECTOR_NMS_THRESHOLD by default.
     """
 
-    def __init__(self, model_path, confidence, threshold):
-        self.net = cv2.dnn.readNetFromDarknet(model_path, "cfg/yolov3.cfg")
-        self.confidence = confidence
-        self.threshold = threshold
+    def __init__(self, confidence: float = None, threshold: float = None):
+        self.confidence = Config.FACE_DETECTOR_CONFIDENCE_THRESHOLD if confidence is None else confidence
+        self.threshold = Config.FACE_DETECTOR_NMS_THRESHOLD if threshold is None else threshold
+
+        for path in (Config.MODEL_YOLO_CONFIG_PATH, Config.MODEL_YOLO_WEIGHTS_PATH):
+            if not os.path.isfile(path):
+                raise FaceDetectionError(f"YOLO model file {path} not found")
+        self.net = cv2.dnn.readNetFromDarknet(str(Config.MODEL_YOLO_CONFIG_PATH), str(Config.MODEL_YOLO_WEIGHTS_PATH))
+        self.output_layers = self.net.getUnconnectedOutLayersNames()
+
+        # the network keeps its input between setInput and forward, threads have to take turns
+        self.lock = threading.Lock()
+
+    def __reduce__(self):
+        return (self.__class__, (self.confidence, self.threshold))
+
+    def get_params(self):
+        return {"type": self.__class__.__name__, "confidence": self.confidence, "threshold": self.threshold}
 
     def detect_faces(self, frame):
         """
@@ -34,81 +57,46 @@ class YOLO(FaceDetector):
         Parameters:
             frame (numpy.ndarray): The input frame.
         Returns:
-            numpy.ndarray: The input frame with rectangles drawn around the detected faces, and labels and confidence scores added.
+            Detections: The boxes and confidence scores of the detected faces.
+        """
+        return self.detect_faces_batch([frame])
+
+    def detect_faces_batch(self, frames):
+        """
+        Detects faces in a batch of frames with a single forward pass of the YOLO object detector.
+        Parameters:
+            frames (list[numpy.ndarray]): The input frames.
+        Returns:
+            Detections: The boxes and confidence scores of the faces detected in all frames,
+                        frame_idx is the position of the frame in frames.
+        """
+        if len(frames) == 0:
+            return Detections()
+
+        blob = cv2.dnn.blobFromImages(frames, 1 / 255.0, YOLO_INPUT_SIZE, swapRB=True, crop=False)
+        with self.lock:
+            self.net.setInput(blob)
+            layer_outputs = self.net.forward(self.output_layers)
+        return self._decode(layer_outputs, frames)
+
+    def _decode(self, layer_outputs, frames):
+        """
+        Convert the rows (center_x, center_y, width, height, objectness, class scores...) of all output layers
+        to detections, the coordinates are relative to the size of their image
         """
-        (H, W) = frame.shape[:2]
-
-        # construct a blob from the input frame and then perform a forward
-        # pass of the YOLO object detector, giving us our bounding boxes and
-        # associated probabilities
-        blob = cv2.dnn.blobFromImage(frame, 1 / 255.0, (416, 16), swapRB=True, crop=False)
-        self.net.setInput(blob)
-        layer_outputs = self.net.forward(self.net.getUnconnectedOutLayersNames())
-
-        boxes = []
-        confidences = []
-        classIDs = []
-
-        # loop over each of the layer outputs
-        for output in layer_outputs:
-            # loop over each of the detections
-            for detection in output:
-                scores = detection[5:]
-                classID = np.argmax(scores)
-                confidence = scores[classID]
-
-                # filter out weak predictions by ensuring the detected
-                # probability is greater than the minimum probability
-                if confidence > self.confidence:
-                    box = detection[0:4] * np.array([W, H, W, H])
-                    (centerX, centerY, width, height) = box.astype("int")
-
-                    # use the center (x, y)-coordinates to derive the top and
-                    # and left corner of the bounding box
-                    x = int(centerX - (width / 2))
-                    y = int(centerY - (height / 2))
-
-                    # update our list of bounding box coordinates, confidences,
-                    # and class IDs
-                    boxes.append([x, y, int(width), int(height)])
-                    confidences.append(float(confidence))
-                    classIDs.append(classID)
-
-        # apply non-maxima suppression to suppress weak, overlapping bounding
-        # boxes
-        idxs = cv2.dnn.NMSBoxes(boxes, confidences, self.confidence, self.threshold)
-
-        # ensure at least one detection exists
-        if len(idxs) > 0:
-            # loop over the indexes we are keeping
-            for i in idxs.flatten():
-                # extract the bounding box coordinates
-                (x, y) = (boxes[i][0], boxes[i][1])
-                (w, h) = (boxes[i][2], boxes[i][3])
-
-                # draw a rectangle around the face
-                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-
-                # add labels and confidence score
-                label = f"Face: {classIDs[i]}"
-                confidence_score = f"Confidence: {round(confidences[i], 2) * 100}%"
-                cv2.putText(
-                    frame,
-                    label,
-                    (x, y - 10),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.5,
-                    (0, 255, 0),
-                    2,
-                )
-                cv2.putText(
-                    frame,
-                    confidence_score,
-                    (x, y + h + 30),
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.5,
-                    (0, 255, 0),
-                    2,
-                )
-
-        return frame
+        # rows of all output layers, with shape (number of frames, number of rows, row length)
+        rows = np.concatenate([output.reshape(len(frames), -1, output.shape[-1]) for output in layer_outputs], axis=1)
+        confidences = rows[:, :, 5:].max(axis=2)
+        image_ids, row_ids = np.nonzero(confidences > self.confidence)
+        if len(image_ids) == 0:
+            return Detections()
+
+        sizes = np.array([frame.shape[1::-1] for frame in frames], dtype=np.float32)[image_ids]
+        boxes = cxcywh_to_xyxy(rows[image_ids, row_ids, :4] * np.tile(sizes, 2))
+        boxes = clip_boxes(boxes, sizes[:, 0], sizes[:, 1])
+        scores = confidences[image_ids, row_ids]
+
+        # overlapping boxes of the same frame are suppressed
+        keep = batched_nms(boxes, scores, image_ids, self.threshold)
+        boxes = np.round(xyxy_to_xywh(boxes[keep])).astype(np.int32)
+        return Detections.from_boxes(boxes, scores=scores[keep], frame_idx=image_ids[keep])
@@ -7,6 +7,7 @@ import logging
 import os
 import sys
 import time
+import urllib.request
 from datetime import datetime
 
 from src.common.libraries import Config, Logger
@@ -129,6 +130,28 @@ def download_file_from_google_drive(url, output_path):
         raise ex
 
 
+def download_file(url, output_path):
+    logger = Logger(name="Downloader")
+    logger.add_file_handler("download.log")
+
+    if os.path.isfile(output_path):
+        logger.info(f"File already exists at {output_path}")
+        return
+
+    logger.info(f"Downloading data: {url}")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    temporary_path = f"{output_path}.part"
+    try:
+        urllib.request.urlretrieve(url, temporary_path)
+        os.replace(temporary_path, output_path)
+        logger.info("Download completed successfully")
+    except Exception as ex:
+        logger.error("An error occured: " + str(ex))
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise ex
+
+
 def remove_file(file_path: str):
     logger = Logger(name="CleanUp")
     logger.add_file_handler("cleanup.log")
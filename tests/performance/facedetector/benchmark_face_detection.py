@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+benchmark_face_detection.py
+
+This module benchmarks the face detection of videos: every approach of get_async_face_detector and the
+synchronous detect_faces_in_realtime ("sync"), on synthetic clips made locally.
+
+Functionality:
+------------------------------------------------------------------------------------------------
+
+1. run: the cases are the matrix of approaches, detectors, resolutions, clip lengths and worker counts. The clips
+are written locally by src/common/synthetic_media.py (drawn faces moving over a panning background), so no video has
+to be downloaded.
+2. Every case runs in its own process, after the face detector was loaded and warmed up. A case measures the wall
+time of the detection, the frames per second, the peak resident memory (RSS) of the process and of its largest child
+process (the workers of ProcessPool and SegmentParallel, ffmpeg) and the CPU time used, also as average cores.
+3. The results are written to a JSON file together with the machine and the settings they were measured on.
+The detection cache and the worker autoscaler are turned off, so that a case always does the same work.
+4. compare: the results are compared against a stored baseline. A case whose frames per second dropped or whose
+peak RSS grew by more than the tolerance is a regression, and the exit code is 1.
+
+Usage:
+
+python -m tests.performance.facedetector.benchmark_face_detection run --detectors ViolaJones --durations 2 6
+python -m tests.performance.facedetector.benchmark_face_detection run --approaches sync --repeats 5
+python -m tests.performance.facedetector.benchmark_face_detection compare benchmark_results.json
+
+Background:
+
+1. This module replaces a script which plotted numbers copied by hand from the logs of single runs, measured on
+one machine with videos which are not in the repository. A baseline is only comparable on the machine it was
+saved on, so it is saved with --save-baseline there and the differences of the machines are warned about.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from src.common.config import Config
+from src.common.logger import Logger
+from src.common.synthetic_media import parse_resolution, write_synthetic_video
+from src.common.video import Video
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+SYNC_APPROACH = "sync"
+ASYNC_APPROACHES = [
+    "AsyncTaskFaceDetector",
+    "ConcurrentFuturesFaceDetector",
+    "AsyncIOAndCPUFaceDetector",
+    "ProcessPoolFaceDetector",
+    "StreamingFaceDetector",
+    "SegmentParallelFaceDetector",
+]
+BASELINE_FILE = Path(__file__).parent / "baseline.json"
+SYNTHETIC_CLIP_FPS = 24
+
+logger = Logger(name="FaceDetectionBenchmark")
+logger.add_file_handler("face_detection.log")
+
+
+def case_key(case: dict) -> str:
+    """returns the key of a case in the results and the baseline"""
+    return f"{case['approach']}/{case['detector']}/{case['resolution']}/{case['duration']}s/{case['workers']} workers"
+
+
+def get_clip(clips_folder: Path, resolution: str, duration: float) -> tuple:
+    """returns the file path and the number of frames of the synthetic clip of a case, the clip is made once"""
+    clip_file = clips_folder / f"synthetic_{resolution}_{duration:g}s.mp4"
+    if not clip_file.exists():
+        logger.info(f"Making the synthetic clip {clip_file}")
+        write_synthetic_video(clip_file, parse_resolution(resolution), SYNTHETIC_CLIP_FPS, duration, with_audio=False)
+    video_capture = cv2.VideoCapture(str(clip_file))
+    num_frames = int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    video_capture.release()
+    return clip_file, num_frames
+
+
+def get_peak_rss() -> tuple:
+    """returns the peak RSS in MB of the process and of its largest child process which has ended"""
+    if resource is not None:
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+        return (
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit,
+        )
+    if psutil is not None:
+        return psutil.Process().memory_info().peak_wset / (1024 * 1024), None
+    return None, None
+
+
+def get_cpu_time() -> float:
+    """returns the CPU time in seconds used by the process and by its child processes which have ended"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+def run_case(case: dict, clip_file: str, output_folder: str) -> dict:
+    """
+    Run the face detection of a case in this process.
+
+    Args:
+        case (dict): The approach, detector and number of workers of the case.
+        clip_file (str): The file path of the clip.
+        output_folder (str): The folder of the output video.
+
+    Returns:
+        dict: The wall time and the CPU time of the detection and the peak RSS of the process.
+    """
+    Config.FACE_DETECTOR_CACHE_ENABLED = False
+    Config.FACE_DETECTOR_AUTOSCALE_ENABLED = False
+    Config.FACE_DETECTOR_NUM_WORK_THREADS = case["workers"]
+    Config.FACE_DETECTOR_NUM_WORK_PROCESSES = case["workers"]
+    Config.VIDEO_OUTPUT_PATH = Path(output_folder)
+
+    from src.facedetector import utils
+    from src.facedetector.async_face_detector import AsyncFaceDetector
+
+    # the detector is loaded and warmed up by the model registry before the clock starts
+    face_detector = utils.get_face_detector(detector_type=case["detector"])
+    video = Video(clip_file)
+
+    cpu_time = get_cpu_time()
+    start_time = time.perf_counter()
+    if case["approach"] == SYNC_APPROACH:
+        asyncio.run(utils.detect_faces_in_realtime(detector=face_detector, video=video, destination=output_folder))
+    else:
+        async_face_detector = AsyncFaceDetector(video=video, destination=Path(output_folder))
+        async_approach = utils.get_async_face_detector(case["approach"])
+        asyncio.run(
+            async_face_detector.detect_faces_in_realtime(async_approach=async_approach, face_detector=face_detector)
+        )
+    wall_time = time.perf_counter() - start_time
+    cpu_time = get_cpu_time() - cpu_time
+
+    peak_rss, peak_child_rss = get_peak_rss()
+    return {"wall_time": wall_time, "cpu_time": cpu_time, "peak_rss_mb": peak_rss, "peak_child_rss_mb": peak_child_rss}
+
+
+def run_case_in_process(case: dict, clip_file: Path, num_frames: int, work_folder: Path, timeout: float) -> dict:
+    """returns the result of a case, run in a new process so that its peak RSS is not that of an earlier case"""
+    with tempfile.TemporaryDirectory(dir=work_folder) as output_folder:
+        result_file = Path(output_folder) / "result.json"
+        command = [
+            sys.executable,
+            "-m",
+            __spec__.name if __spec__ else "tests.performance.facedetector.benchmark_face_detection",
+            "case",
+            json.dumps(case),
+            str(clip_file),
+            output_folder,
+            str(result_file),
+        ]
+        try:
+            completed = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return {**case, "frames": num_frames, "error": f"timed out after {timeout:g} seconds"}
+
+        if completed.returncode != 0 or not result_file.exists():
+            error = (completed.stderr.strip().splitlines() or [f"exit code {completed.returncode}"])[-1]
+            return {**case, "frames": num_frames, "error": error}
+        measured = json.loads(result_file.read_text())
+
+    wall_time = measured["wall_time"]
+    return {
+        **case,
+        "frames": num_frames,
+        "wall_time": round(wall_time, 3),
+        "fps": round(num_frames / wall_time, 2),
+        "peak_rss_mb": _round(measured["peak_rss_mb"]),
+        "peak_child_rss_mb": _round(measured["peak_child_rss_mb"]),
+        "cpu_time": round(measured["cpu_time"], 3),
+        # average number of busy cores, and the share of all the cores of the machine
+        "cpu_cores": round(measured["cpu_time"] / wall_time, 2),
+        "cpu_percent": round(100 * measured["cpu_time"] / wall_time / (os.cpu_count() or 1), 1),
+        "error": None,
+    }
+
+
+def _round(value, digits: int = 1):
+    return None if value is None else round(value, digits)
+
+
+def get_cases(approaches, detectors, resolutions, durations, workers) -> list:
+    """returns the cases of the matrix, the sync approach has a single worker"""
+    cases = []
+    for detector in detectors:
+        for resolution in resolutions:
+            for duration in durations:
+                for approach in approaches:
+                    for num_workers in [1] if approach == SYNC_APPROACH else workers:
+                        cases.append(
+                            {
+                                "approach": approach,
+                                "detector": detector,
+                                "resolution": resolution,
+                                "duration": duration,
+                                "workers": num_workers,
+                            }
+                        )
+    return cases
+
+
+def get_machine() -> dict:
+    """returns the machine and the software the results were measured with"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "commit": commit,
+    }
+
+
+def run_benchmark(cases: list, work_folder: Path, repeats: int = 1, timeout: float = 1800) -> dict:
+    """
+    Run the cases of the benchmark.
+
+    Args:
+        cases (list): The cases, see get_cases.
+        work_folder (Path): The folder of the synthetic clips and the output videos.
+        repeats (int): The number of runs of a case, the run with the median frames per second is kept.
+        timeout (float): The time in seconds after which a run is stopped.
+
+    Returns:
+        dict: The machine, the settings and the results of the cases.
+    """
+    clips_folder = work_folder / "clips"
+    clips_folder.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    for number, case in enumerate(cases, start=1):
+        clip_file, num_frames = get_clip(clips_folder, case["resolution"], case["duration"])
+        runs = [run_case_in_process(case, clip_file, num_frames, work_folder, timeout) for _ in range(repeats)]
+        succeeded = sorted((run for run in runs if run["error"] is None), key=lambda run: run["fps"])
+        result = succeeded[len(succeeded) // 2] if succeeded else runs[-1]
+        results.append(result)
+
+        if result["error"]:
+            logger.error(f"[{number}/{len(cases)}] {case_key(case)}: {result['error']}")
+        else:
+            logger.info(
+                f"[{number}/{len(cases)}] {case_key(case)}: {result['fps']:.1f} fps, {result['wall_time']:.2f} s, "
+                f"peak RSS {result['peak_rss_mb']} MB, {result['cpu_cores']:.2f} cores"
+            )
+
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "machine": get_machine(),
+        "settings": {
+            "repeats": repeats,
+            "clip_fps": SYNTHETIC_CLIP_FPS,
+            "detection_resolution": Config.FACE_DETECTOR_RESOLUTION,
+            "detection_mode": Config.FACE_DETECTOR_MODE,
+            "batch_size": Config.FACE_DETECTOR_BATCH_SIZE,
+            "video_writer": Config.VIDEO_WRITER,
+        },
+        "results": results,
+    }
+
+
+def compare_results(benchmark: dict, baseline: dict, tolerance: float = 0.1) -> list:
+    """
+    Compare the results of a benchmark against a baseline.
+
+    Args:
+        benchmark (dict): The results, see run_benchmark.
+        baseline (dict): The results stored as the baseline.
+        tolerance (float): The relative drop of the frames per second and growth of the peak RSS that is accepted.
+
+    Returns:
+        list: The regressions, one message per metric of a case.
+    """
+    if benchmark["machine"]["cpu_count"] != baseline["machine"]["cpu_count"]:
+        logger.warning(
+            f"The baseline was measured on {baseline['machine']['cpu_count']} cores and the results on "
+            f"{benchmark['machine']['cpu_count']} cores, they are not comparable"
+        )
+    if benchmark["settings"] != baseline["settings"]:
+        logger.warning(f"The settings differ from those of the baseline: {baseline['settings']}")
+
+    baseline_results = {case_key(result): result for result in baseline["results"] if result["error"] is None}
+    regressions = []
+    for result in benchmark["results"]:
+        key = case_key(result)
+        expected = baseline_results.get(key)
+        if expected is None:
+            logger.info(f"{key}: not in the baseline")
+            continue
+        if result["error"] is not None:
+            regressions.append(f"{key}: failed, {result['error']}")
+            continue
+
+        change = result["fps"] / expected["fps"] - 1
+        logger.info(f"{key}: {result['fps']:.1f} fps, {change:+.1%} against the baseline ({expected['fps']:.1f} fps)")
+        if change < -tolerance:
+            regressions.append(f"{key}: {result['fps']:.1f} fps, {change:+.1%} against {expected['fps']:.1f} fps")
+
+        if result["peak_rss_mb"] and expected["peak_rss_mb"]:
+            change = result["peak_rss_mb"] / expected["peak_rss_mb"] - 1
+            if change > tolerance:
+                regressions.append(
+                    f"{key}: peak RSS {result['peak_rss_mb']} MB, {change:+.1%} against {expected['peak_rss_mb']} MB"
+                )
+    return regressions
+
+
+def compare_with_baseline(benchmark: dict, baseline_file: Path, tolerance: float) -> int:
+    """logs the regressions against the baseline file and returns the exit code"""
+    if not baseline_file.exists():
+        logger.warning(f"No baseline at {baseline_file}, save one with --save-baseline")
+        return 0
+    regressions = compare_results(benchmark, json.loads(baseline_file.read_text()), tolerance)
+    for regression in regressions:
+        logger.error(f"Regression: {regression}")
+    logger.info(f"{len(regressions)} regressions against {baseline_file} with a tolerance of {tolerance:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the face detection on synthetic clips")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the matrix of cases and compare it against the baseline")
+    run_parser.add_argument("--approaches", nargs="+", default=[SYNC_APPROACH] + ASYNC_APPROACHES)
+    run_parser.add_argument("--detectors", nargs="+", default=[Config.VIDEO_DETECTOR])
+    run_parser.add_argument("--resolutions", nargs="+", default=["640x360", "1280x720"], help="WIDTHxHEIGHT")
+    run_parser.add_argument("--durations", nargs="+", type=float, default=[2, 6], help="clip lengths in seconds")
+    run_parser.add_argument("--workers", nargs="+", type=int, default=[1, 4], help="threads or processes")
+    run_parser.add_argument("--repeats", type=int, default=1, help="runs of a case, the median is kept")
+    run_parser.add_argument("--timeout", type=float, default=1800, help="seconds after which a run is stopped")
+    run_parser.add_argument("--work-folder", default=None, help="folder of the clips, a temporary folder by default")
+    run_parser.add_argument("--output", default="benchmark_results.json", help="JSON file of the results")
+    run_parser.add_argument("--baseline", default=str(BASELINE_FILE), help="JSON file of the baseline")
+    run_parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    run_parser.add_argument("--tolerance", type=float, default=0.1, help="accepted relative change of a metric")
+
+    compare_parser = subparsers.add_parser("compare", help="compare stored results against the baseline")
+    compare_parser.add_argument("results", help="JSON file of the results")
+    compare_parser.add_argument("--baseline", default=str(BASELINE_FILE), help="JSON file of the baseline")
+    compare_parser.add_argument("--tolerance", type=float, default=0.1, help="accepted relative change of a metric")
+
+    case_parser = subparsers.add_parser("case", help="run a single case in this process, used by run")
+    case_parser.add_argument("case", help="the case as JSON")
+    case_parser.add_argument("clip")
+    case_parser.add_argument("output_folder")
+    case_parser.add_argument("result_file")
+
+    args = parser.parse_args()
+    if args.command == "case":
+        measured = run_case(json.loads(args.case), args.clip, args.output_folder)
+        Path(args.result_file).write_text(json.dumps(measured))
+    elif args.command == "compare":
+        benchmark = json.loads(Path(args.results).read_text())
+        sys.exit(compare_with_baseline(benchmark, Path(args.baseline), args.tolerance))
+    else:
+        for approach in args.approaches:
+            if approach != SYNC_APPROACH and approach not in ASYNC_APPROACHES:
+                parser.error(f"Invalid approach: {approach}")
+        cases = get_cases(args.approaches, args.detectors, args.resolutions, args.durations, args.workers)
+        with tempfile.TemporaryDirectory() as temporary_folder:
+            benchmark = run_benchmark(cases, Path(args.work_folder or temporary_folder), args.repeats, args.timeout)
+
+        Path(args.output).write_text(json.dumps(benchmark, indent=4))
+        logger.info(f"Wrote the results of {len(cases)} cases to {args.output}")
+        if args.save_baseline:
+            Path(args.baseline).write_text(json.dumps(benchmark, indent=4))
+            logger.info(f"Stored the results as the baseline {args.baseline}")
+        else:
+            sys.exit(compare_with_baseline(benchmark, Path(args.baseline), args.tolerance))
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Unit tests of the ModelRegistry class, which keeps the loaded models of the process.
+"""
+
+import threading
+from unittest import TestCase
+
+from src.common.model_registry import ModelRegistry
+
+
+class CountingFactory:
+    """loads a new model on every call and keeps the loaded models"""
+
+    def __init__(self, failures: int = 0):
+        self.models = []
+        self.failures = failures
+
+    def __call__(self, **config):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("model file not found")
+        model = {"config": config, "id": len(self.models)}
+        self.models.append(model)
+        return model
+
+
+def get_in_thread(registry, model_type: str, **config):
+    """returns the model which a new thread gets from the registry, the thread has finished when it is returned"""
+    models = []
+    thread = threading.Thread(target=lambda: models.append(registry.get(model_type, **config)))
+    thread.start()
+    thread.join()
+    return models[0]
+
+
+class ModelRegistryTest(TestCase):
+    def setUp(self):
+        self.registry = ModelRegistry()
+        self.factory = CountingFactory()
+
+    def test_thread_safe_model_is_shared_by_all_threads(self):
+        self.registry.register("Model", self.factory, thread_safe=True)
+
+        model = self.registry.get("Model")
+
+        self.assertIs(get_in_thread(self.registry, "Model"), model)
+        self.assertIs(self.registry.get("Model"), model)
+        self.assertEqual(len(self.factory.models), 1)
+
+    def test_configurations_are_loaded_separately(self):
+        self.registry.register("Model", self.factory, thread_safe=True)
+
+        small_model = self.registry.get("Model", size="small")
+        large_model = self.registry.get("Model", size="large")
+
+        self.assertIsNot(small_model, large_model)
+        self.assertEqual(large_model["config"], {"size": "large"})
+        self.assertIs(self.registry.get("Model", size="small"), small_model)
+
+    def test_threads_using_a_model_at_the_same_time_get_their_own_instance(self):
+        self.registry.register("Model", self.factory, thread_safe=False)
+        barrier = threading.Barrier(3)
+        models = []
+
+        def use_model():
+            models.append(self.registry.get("Model"))
+            # the model is used by all threads at the same time
+            barrier.wait()
+            models.append(self.registry.get("Model"))
+
+        threads = [threading.Thread(target=use_model) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.factory.models), 3)
+        self.assertEqual(len({model["id"] for model in models}), 3)
+
+    def test_instance_of_a_finished_thread_is_reused_by_the_next_thread(self):
+        self.registry.register("Model", self.factory, thread_safe=False)
+
+        first_model = get_in_thread(self.registry, "Model")
+        second_model = get_in_thread(self.registry, "Model")
+
+        self.assertIs(second_model, first_model)
+        self.assertEqual(len(self.factory.models), 1)
+
+    def test_model_which_failed_to_load_is_not_kept(self):
+        for thread_safe in (True, False):
+            with self.subTest(thread_safe=thread_safe):
+                registry = ModelRegistry()
+                factory = CountingFactory(failures=1)
+                registry.register("Model", factory, thread_safe=thread_safe)
+
+                with self.assertRaises(RuntimeError):
+                    registry.get("Model")
+
+                self.assertIs(registry.get("Model"), factory.models[0])
+
+    def test_warmed_up_instance_is_handed_to_the_next_thread(self):
+        warmed_up = []
+        self.registry.register("Model", self.factory, thread_safe=False, warm_up=warmed_up.append)
+
+        self.registry.warm_up("Model")
+
+        self.assertEqual(warmed_up, self.factory.models)
+        self.assertIs(get_in_thread(self.registry, "Model"), warmed_up[0])
+
+    def test_unload_loads_the_model_again(self):
+        self.registry.register("Model", self.factory, thread_safe=True)
+        self.registry.register("Other", CountingFactory(), thread_safe=False)
+        model = self.registry.get("Model")
+        other_model = get_in_thread(self.registry, "Other")
+
+        self.registry.unload("Model")
+
+        self.assertIsNot(self.registry.get("Model"), model)
+        self.assertIs(get_in_thread(self.registry, "Other"), other_model)
+        self.registry.unload()
+        self.assertIsNot(get_in_thread(self.registry, "Other"), other_model)
+
+    def test_instance_in_use_is_not_kept_after_unload(self):
+        self.registry.register("Model", self.factory, thread_safe=False)
+        model = self.registry.get("Model")
+
+        self.registry.unload("Model")
+
+        self.assertIsNot(get_in_thread(self.registry, "Model"), model)
+
+    def test_unknown_model_type_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.registry.get("Unknown")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Unit tests of the FFmpegVideoReader class, which decodes the frames of a video with a local ffmpeg process.
+"""
+
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+from src.common.config import Config
+from src.common.synthetic_media import write_synthetic_video
+from src.common.video_reader import FFmpegVideoReader, open_video
+
+
+def read_all_frames(video_capture):
+    """returns all the frames of a video reader and releases it"""
+    frames = []
+    while True:
+        ret, frame = video_capture.read()
+        if not ret:
+            break
+        frames.append(frame)
+    video_capture.release()
+    return frames
+
+
+@skipUnless(shutil.which(Config.FFMPEG_BINARY), "ffmpeg is not installed")
+class FFmpegVideoReaderTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = Path(tempfile.mkdtemp())
+        cls.video_file = str(cls.folder / "clip.mp4")
+        cls.num_frames = write_synthetic_video(cls.video_file, resolution=(160, 120), duration=1, with_audio=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.folder, ignore_errors=True)
+
+    def test_frames_are_the_frames_decoded_by_opencv(self):
+        reader = FFmpegVideoReader(self.video_file)
+        self.assertTrue(reader.isOpened())
+        self.assertEqual(reader.get(cv2.CAP_PROP_FRAME_WIDTH), 160)
+        self.assertEqual(reader.get(cv2.CAP_PROP_FRAME_HEIGHT), 120)
+        self.assertEqual(reader.get(cv2.CAP_PROP_FRAME_COUNT), self.num_frames)
+
+        frames = read_all_frames(reader)
+        expected_frames = read_all_frames(cv2.VideoCapture(self.video_file))
+
+        self.assertEqual(len(frames), self.num_frames)
+        self.assertEqual(len(expected_frames), self.num_frames)
+        for frame, expected_frame in zip(frames, expected_frames):
+            self.assertEqual(frame.shape, (120, 160, 3))
+            # both decode the same stream, the conversion to bgr may round differently
+            self.assertLess(np.abs(frame.astype(np.int16) - expected_frame).mean(), 1.0)
+
+    def test_frames_are_scaled_and_converted_by_ffmpeg(self):
+        reader = FFmpegVideoReader(self.video_file, size=(80, 60), pix_fmt="gray")
+
+        frames = read_all_frames(reader)
+
+        self.assertEqual(len(frames), self.num_frames)
+        self.assertEqual({frame.shape for frame in frames}, {(60, 80)})
+
+    def test_frame_is_read_into_the_given_image(self):
+        reader = FFmpegVideoReader(self.video_file)
+        image = np.zeros((120, 160, 3), dtype=np.uint8)
+
+        ret, frame = reader.read(image)
+        reader.release()
+
+        self.assertTrue(ret)
+        self.assertIs(frame, image)
+        self.assertGreater(image.max(), 0)
+        self.assertEqual(reader.get(cv2.CAP_PROP_POS_FRAMES), 1)
+
+    def test_missing_file_is_not_opened(self):
+        reader = FFmpegVideoReader(str(self.folder / "missing.mp4"))
+
+        self.assertFalse(reader.isOpened())
+        self.assertEqual(reader.read(), (False, None))
+        reader.release()
+
+    def test_release_stops_ffmpeg_before_the_end_of_the_video(self):
+        reader = FFmpegVideoReader(self.video_file)
+        process = reader.process
+        reader.read()
+
+        reader.release()
+        reader.release()
+
+        self.assertIsNotNone(process.poll())
+        self.assertFalse(reader.isOpened())
+
+    def test_invalid_pixel_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            FFmpegVideoReader(self.video_file, pix_fmt="yuv420p")
+
+    def test_open_video_selects_the_reader_of_the_config(self):
+        with patch.object(Config, "VIDEO_READER", "ffmpeg"):
+            reader = open_video(self.video_file, size=(80, 60))
+            self.assertIsInstance(reader, FFmpegVideoReader)
+            reader.release()
+        with patch.object(Config, "VIDEO_READER", "opencv"):
+            self.assertIsInstance(open_video(self.video_file), cv2.VideoCapture)
+            with self.assertRaises(ValueError):
+                open_video(self.video_file, size=(80, 60))
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Unit tests of the FFmpegVideoWriter class, which encodes frames with a local ffmpeg process.
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+from src.common.config import Config
+from src.common.video_writer import FFmpegVideoWriter, open_video_writer
+
+
+def make_frames(num_frames: int, width: int, height: int):
+    """returns frames with a gray level and a white box which moves with the frame index"""
+    frames = []
+    for i in range(num_frames):
+        frame = np.full((height, width, 3), 40 + 8 * i, dtype=np.uint8)
+        frame[10:40, 4 * i : 4 * i + 30] = 255
+        frames.append(frame)
+    return frames
+
+
+def read_video(file_path: str):
+    """returns the frames of a video file decoded by OpenCV"""
+    video_capture = cv2.VideoCapture(file_path)
+    frames = []
+    while True:
+        ret, frame = video_capture.read()
+        if not ret:
+            break
+        frames.append(frame)
+    video_capture.release()
+    return frames
+
+
+@skipUnless(shutil.which(Config.FFMPEG_BINARY), "ffmpeg is not installed")
+class FFmpegVideoWriterTest(TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        self.video_file = os.path.join(self.folder, "output.mp4")
+
+    def test_written_frames_are_read_back(self):
+        frames = make_frames(20, 160, 120)
+        writer = FFmpegVideoWriter(self.video_file, 25, (160, 120), queue_size=4)
+
+        for frame in frames:
+            writer.write(frame)
+            # the writer copied the frame, the caller may reuse it
+            frame[:] = 0
+        writer.release()
+
+        written_frames = read_video(self.video_file)
+        self.assertEqual(len(written_frames), 20)
+        self.assertLessEqual(writer.high_water_mark, 4)
+        for written_frame, expected_frame in zip(written_frames, make_frames(20, 160, 120)):
+            self.assertEqual(written_frame.shape, (120, 160, 3))
+            # the gray level of two neighbouring frames differs by 8, far more than the loss of the encoder
+            self.assertLess(np.abs(written_frame.astype(np.int16) - expected_frame).mean(), 5.0)
+
+    def test_frames_of_an_odd_size_are_padded(self):
+        writer = FFmpegVideoWriter(self.video_file, 25, (161, 121))
+
+        for frame in make_frames(5, 161, 121):
+            writer.write(frame)
+        writer.release()
+
+        written_frames = read_video(self.video_file)
+        self.assertEqual(len(written_frames), 5)
+        self.assertEqual(written_frames[0].shape, (122, 162, 3))
+
+    def test_release_raises_when_ffmpeg_fails(self):
+        writer = FFmpegVideoWriter(self.video_file, 25, (160, 120), codec="no_such_encoder")
+
+        with self.assertRaises(IOError):
+            # the broken pipe is raised by write or by release, depending on when ffmpeg exits
+            for frame in make_frames(20, 160, 120):
+                writer.write(frame)
+            writer.release()
+        self.assertFalse(os.path.exists(self.video_file) and read_video(self.video_file))
+
+    def test_release_without_frames_creates_no_video(self):
+        writer = FFmpegVideoWriter(self.video_file, 25, (160, 120))
+
+        writer.release()
+        writer.release()
+
+        self.assertFalse(writer.isOpened())
+        self.assertFalse(os.path.exists(self.video_file))
+
+    def test_frame_of_another_size_is_rejected(self):
+        writer = FFmpegVideoWriter(self.video_file, 25, (160, 120))
+        self.addCleanup(writer.release)
+
+        with self.assertRaises(ValueError):
+            writer.write(np.zeros((120, 161, 3), dtype=np.uint8))
+
+    def test_open_video_writer_selects_the_writer_of_the_config(self):
+        with patch.object(Config, "VIDEO_WRITER", "ffmpeg"):
+            writer = open_video_writer(self.video_file, 25, (160.0, 120.0))
+            self.assertIsInstance(writer, FFmpegVideoWriter)
+            writer.release()
+        with patch.object(Config, "VIDEO_WRITER", "opencv"):
+            writer = open_video_writer(self.video_file, 25, (160, 120))
+            self.assertIsInstance(writer, cv2.VideoWriter)
+            writer.release()
+        with patch.object(Config, "VIDEO_WRITER", "gstreamer"), self.assertRaises(ValueError):
+            open_video_writer(self.video_file, 25, (160, 120))
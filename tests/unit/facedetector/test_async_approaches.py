@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+End to end tests of the asynchronous approaches of the face detection: every approach has to write the same frames,
+in the same order and with the same faces as the synchronous detect_faces_in_realtime.
+"""
+
+import asyncio
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+from src.common.config import Config
+from src.common.exceptions import FaceDetectionError
+from src.common.synthetic_media import SKIN_COLORS, SyntheticFace, write_synthetic_video
+from src.common.video import Video
+from src.common.video_reader import open_video
+from src.facedetector import utils
+from src.facedetector.async_face_detector import AsyncFaceDetector
+from src.facedetector.detections import Detections
+from src.facedetector.face_detector import FaceDetector
+from src.facedetector.segment_parallel_face_detector import SegmentParallelFaceDetector
+
+# the faces move fast, so that two neighbouring frames never look alike
+CLIP_FACES = [
+    SyntheticFace(80, "linear", (0.3, 0.5), speed=1.5, index=0),
+    SyntheticFace(50, "linear", (0.7, 0.4), speed=1.0, index=len(SKIN_COLORS)),
+]
+
+# the settings of the tests, the features which change the faces or the number of workers are turned off
+TEST_CONFIG = {
+    "FACE_DETECTOR_CACHE_ENABLED": False,
+    "FACE_DETECTOR_DETECT_SCENE_CUTS": False,
+    "FACE_DETECTOR_AUTOSCALE_ENABLED": False,
+    "FACE_DETECTOR_RESOLUTION": None,
+    "FACE_DETECTOR_BATCH_SIZE": 4,
+    "FACE_DETECTOR_QUEUE_SIZE": 4,
+    "FACE_DETECTOR_REORDER_WINDOW": 8,
+    "FACE_DETECTOR_NUM_WORK_THREADS": 3,
+    "FACE_DETECTOR_NUM_WORK_PROCESSES": 2,
+}
+
+
+class SkinColorFaceDetector(FaceDetector):
+    """finds the faces of the synthetic clips by the color of their skin, the same frame always gives the same faces"""
+
+    def detect_faces(self, frame):
+        skin = np.array(SKIN_COLORS[0])
+        mask = cv2.inRange(frame, np.clip(skin - 30, 0, 255), np.clip(skin + 30, 0, 255))
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        boxes = sorted(cv2.boundingRect(contour) for contour in contours if cv2.contourArea(contour) > 100)
+        return Detections.from_boxes(np.array(boxes).reshape(-1, 4), scores=np.full(len(boxes), 0.9))
+
+
+class FailingFaceDetector(FaceDetector):
+    """fails on every frame, also in the worker processes of the approaches"""
+
+    def detect_faces(self, frame):
+        raise RuntimeError("face detector failed")
+
+
+def read_frames(file_path):
+    """returns all the frames of a video"""
+    video_capture = open_video(str(file_path))
+    frames = []
+    while True:
+        ret, frame = video_capture.read()
+        if not ret:
+            break
+        frames.append(frame)
+    video_capture.release()
+    return frames
+
+
+class AsyncApproachTestMixin:
+    """runs an approach and the synchronous path on a short synthetic clip and compares their outputs"""
+
+    approach_type = None
+    # largest mean difference of two frames of the outputs, far below the difference of two neighbouring frames
+    max_frame_difference = 1.0
+
+    @classmethod
+    def setUpClass(cls):
+        cls.folder = Path(tempfile.mkdtemp())
+        cls.input_file = cls.folder / "clip.mp4"
+        cls.num_frames = cls.write_clip(cls.input_file)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.folder, ignore_errors=True)
+
+    @classmethod
+    def write_clip(cls, file_path):
+        return write_synthetic_video(
+            str(file_path), resolution=(320, 240), fps=25, duration=2, faces=CLIP_FACES, with_audio=False
+        )
+
+    def setUp(self):
+        config = patch.multiple(Config, VIDEO_OUTPUT_PATH=self.folder, **TEST_CONFIG)
+        config.start()
+        self.addCleanup(config.stop)
+
+    def run_sync(self):
+        destination = self.folder / "sync"
+        destination.mkdir(exist_ok=True)
+        video = asyncio.run(
+            utils.detect_faces_in_realtime(SkinColorFaceDetector(), Video(str(self.input_file)), str(destination))
+        )
+        return video.get_filename()
+
+    def run_approach(self, face_detector=None):
+        """returns the output video of the approach and the faces it wrote per frame"""
+        destination = self.folder / self.approach_type
+        destination.mkdir(exist_ok=True)
+        faces_per_frame = {}
+
+        def record_faces(async_detector, frame_index, faces):
+            faces_per_frame[frame_index] = faces
+
+        with patch.object(AsyncFaceDetector, "_record_faces", record_faces):
+            async_detector = AsyncFaceDetector(Video(str(self.input_file)), destination=destination)
+            approach = utils.get_async_face_detector(self.approach_type)
+            video = asyncio.run(
+                async_detector.detect_faces_in_realtime(approach, face_detector or SkinColorFaceDetector())
+            )
+        return video.get_filename(), faces_per_frame
+
+    def test_same_frames_and_faces_as_the_sync_path(self):
+        output_file, faces_per_frame = self.run_approach()
+
+        # the faces of every frame of the input, as detected by the synchronous path
+        detector = SkinColorFaceDetector()
+        expected_faces = [detector.detect_faces(frame) for frame in read_frames(self.input_file)]
+        self.assertEqual(len(expected_faces), self.num_frames)
+        self.assertEqual(sorted(faces_per_frame), list(range(self.num_frames)))
+        for frame_index, faces in enumerate(expected_faces):
+            self.assertGreater(len(faces), 0)
+            np.testing.assert_array_equal(faces_per_frame[frame_index].boxes, faces.boxes, f"frame {frame_index}")
+
+        frames = read_frames(output_file)
+        expected_frames = read_frames(self.run_sync())
+        self.assertEqual(len(frames), self.num_frames)
+        self.assertEqual(len(expected_frames), self.num_frames)
+        for frame_index, (frame, expected_frame) in enumerate(zip(frames, expected_frames)):
+            difference = np.abs(frame.astype(np.int16) - expected_frame).mean()
+            self.assertLess(difference, self.max_frame_difference, f"frame {frame_index}")
+
+    def test_failed_detection_raises_face_detection_error(self):
+        with self.assertRaisesRegex(FaceDetectionError, "face detector failed"):
+            self.run_approach(FailingFaceDetector())
+
+
+class AsyncTaskFaceDetectorTest(AsyncApproachTestMixin, TestCase):
+    approach_type = "AsyncTaskFaceDetector"
+
+
+class ConcurrentFuturesFaceDetectorTest(AsyncApproachTestMixin, TestCase):
+    approach_type = "ConcurrentFuturesFaceDetector"
+
+
+class AsyncIOAndCPUFaceDetectorTest(AsyncApproachTestMixin, TestCase):
+    approach_type = "AsyncIOAndCPUFaceDetector"
+
+
+class ProcessPoolFaceDetectorTest(AsyncApproachTestMixin, TestCase):
+    approach_type = "ProcessPoolFaceDetector"
+
+
+class StreamingFaceDetectorTest(AsyncApproachTestMixin, TestCase):
+    approach_type = "StreamingFaceDetector"
+
+
+class SegmentParallelFaceDetectorTest(AsyncApproachTestMixin, TestCase):
+    approach_type = "SegmentParallelFaceDetector"
+    # every segment is encoded on its own, the first frames of a segment are encoded with another quality
+    max_frame_difference = 2.5
+
+    @classmethod
+    def write_clip(cls, file_path):
+        # a keyframe every 10 frames, so that the clip is split into several segments
+        clip_file = file_path.with_name(f"gop_{file_path.name}")
+        num_frames = super().write_clip(clip_file)
+        command = [Config.FFMPEG_BINARY, "-nostdin", "-y", "-loglevel", "error", "-i", str(clip_file)]
+        command += ["-c:v", "libx264", "-g", "10", "-pix_fmt", "yuv420p", str(file_path)]
+        subprocess.run(command, check=True, capture_output=True)
+        return num_frames
+
+    def setUp(self):
+        super().setUp()
+        config = patch.object(Config, "FACE_DETECTOR_SEGMENT_MIN_DURATION", 1)
+        config.start()
+        self.addCleanup(config.stop)
+
+        # the output of the approach only tells something when the clip is really split
+        self.segment_files = []
+        split_video = SegmentParallelFaceDetector._split_video
+
+        def record_segments(segment_detector, folder, num_segments):
+            self.segment_files = split_video(segment_detector, folder, num_segments)
+            return self.segment_files
+
+        splitter = patch.object(SegmentParallelFaceDetector, "_split_video", record_segments)
+        splitter.start()
+        self.addCleanup(splitter.stop)
+
+    def test_same_frames_and_faces_as_the_sync_path(self):
+        super().test_same_frames_and_faces_as_the_sync_path()
+        self.assertGreater(len(self.segment_files), 1)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Unit tests of the DetectionCache class, which keeps the faces detected in a video in sidecar files.
+"""
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+
+from src.common.config import Config
+from src.facedetector.detection_cache import DetectionCache
+from src.facedetector.detections import Detections
+from src.facedetector.face_detector import FaceDetector
+
+
+class ParamsFaceDetector(FaceDetector):
+    """a face detector with a parameter, which is part of the key of the cache"""
+
+    def __init__(self, threshold: float = 0.5):
+        self.threshold = threshold
+
+    def get_params(self):
+        return {"type": self.__class__.__name__, "threshold": self.threshold}
+
+
+def make_detections(num_faces: int):
+    """returns detections of num_faces faces, one per frame"""
+    boxes = np.arange(num_faces * 4).reshape(num_faces, 4)
+    return Detections.from_boxes(boxes, scores=np.linspace(0.5, 1.0, num_faces), frame_idx=np.arange(num_faces))
+
+
+class DetectionCacheTest(TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.folder, ignore_errors=True)
+        self.cache = DetectionCache(os.path.join(self.folder, "cache"), max_size=1 << 30)
+        self.video_file = self.write_file("video.mp4", b"video content")
+
+    def write_file(self, filename: str, content: bytes):
+        path = os.path.join(self.folder, filename)
+        with open(path, "wb") as file:
+            file.write(content)
+        return path
+
+    def list_cache_folder(self):
+        return sorted(os.listdir(self.cache.cache_folder))
+
+    def test_saved_detections_are_loaded(self):
+        key = self.cache.get_key(self.video_file, ParamsFaceDetector())
+        detections = make_detections(5)
+
+        self.assertIsNone(self.cache.load(key))
+        self.cache.save(key, detections, [2, 4])
+        loaded_detections, scene_cuts = self.cache.load(key)
+
+        np.testing.assert_array_equal(loaded_detections.array, detections.array)
+        self.assertEqual(scene_cuts, [2, 4])
+
+    def test_key_depends_on_the_content_and_the_settings(self):
+        key = self.cache.get_key(self.video_file, ParamsFaceDetector())
+
+        # a copy of the video has the same key
+        copy_file = self.write_file("copy.mp4", b"video content")
+        self.assertEqual(self.cache.get_key(copy_file, ParamsFaceDetector()), key)
+
+        other_file = self.write_file("other.mp4", b"other content")
+        self.assertNotEqual(self.cache.get_key(other_file, ParamsFaceDetector()), key)
+        self.assertNotEqual(self.cache.get_key(self.video_file, ParamsFaceDetector(0.6)), key)
+        self.assertNotEqual(self.cache.get_key(self.video_file, ParamsFaceDetector(), 0.5), key)
+        for setting, value in [
+            ("FACE_DETECTOR_DETECT_SCENE_CUTS", not Config.FACE_DETECTOR_DETECT_SCENE_CUTS),
+            ("FACE_DETECTOR_SCENE_CUT_THRESHOLD", Config.FACE_DETECTOR_SCENE_CUT_THRESHOLD + 0.1),
+            ("FACE_DETECTOR_MIN_SCENE_LENGTH", Config.FACE_DETECTOR_MIN_SCENE_LENGTH + 1),
+        ]:
+            with self.subTest(setting), patch.object(Config, setting, value):
+                self.assertNotEqual(self.cache.get_key(self.video_file, ParamsFaceDetector()), key)
+
+    def test_least_recently_used_files_are_evicted(self):
+        self.cache.save("first", make_detections(50))
+        self.cache.save("second", make_detections(50))
+        size = os.path.getsize(os.path.join(self.cache.cache_folder, "first.npz"))
+        os.utime(os.path.join(self.cache.cache_folder, "first.npz"), (1000, 1000))
+        os.utime(os.path.join(self.cache.cache_folder, "second.npz"), (2000, 2000))
+
+        # loading marks the first file as recently used, the second one is removed to make room for the third one
+        self.cache.load("first")
+        self.cache.max_size = 2 * size + size // 2
+        self.cache.save("third", make_detections(50))
+
+        self.assertEqual(self.list_cache_folder(), ["first.npz", "third.npz"])
+
+    def test_file_just_saved_is_never_evicted(self):
+        self.cache.max_size = 0
+        self.cache.save("first", make_detections(5))
+        self.cache.save("second", make_detections(5))
+
+        self.assertEqual(self.list_cache_folder(), ["second.npz"])
+        self.assertIsNotNone(self.cache.load("second"))
+
+    def test_failed_save_leaves_no_file(self):
+        self.cache.save("key", make_detections(5))
+
+        with patch("numpy.savez_compressed", side_effect=OSError("disk full")):
+            self.cache.save("key", make_detections(8))
+
+        # the file of the previous save is kept as it was, the temporary file is removed
+        self.assertEqual(self.list_cache_folder(), ["key.npz"])
+        self.assertEqual(len(self.cache.load("key")[0]), 5)
+
+    def test_temporary_files_of_other_jobs_are_not_loaded_or_evicted(self):
+        temporary_file = self.write_file(os.path.join("cache", "key.1234.tmp.npz"), b"partially written")
+        self.cache.max_size = 0
+
+        self.assertIsNone(self.cache.load("key"))
+        self.cache.save("other", make_detections(5))
+
+        self.assertTrue(os.path.exists(temporary_file))
+
+    def test_broken_file_is_not_loaded(self):
+        self.write_file(os.path.join("cache", "key.npz"), b"not a npz file")
+
+        self.assertIsNone(self.cache.load("key"))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Unit tests of the Detections class, the structured array holding the faces found by the face detectors.
+"""
+
+from unittest import TestCase
+
+import numpy as np
+
+from src.facedetector.detections import LANDMARK_NAMES, Detections
+
+
+def make_landmarks(num_faces: int, offset: int = 0):
+    """returns distinct landmarks of shape (num_faces, 5, 2)"""
+    return np.arange(num_faces * len(LANDMARK_NAMES) * 2).reshape(num_faces, len(LANDMARK_NAMES), 2) + offset
+
+
+class DetectionsTest(TestCase):
+    def test_from_frames_and_split_round_trip_with_empty_frames(self):
+        frames = [
+            Detections.from_boxes([[1, 2, 3, 4]], scores=[0.9]),
+            Detections(),
+            Detections.from_boxes([[5, 6, 7, 8], [9, 10, 11, 12]], scores=[0.8, 0.7]),
+            Detections(),
+        ]
+
+        detections = Detections.from_frames(frames)
+        self.assertEqual(len(detections), 3)
+        np.testing.assert_array_equal(detections.frame_idx, [0, 2, 2])
+
+        split = detections.split(len(frames))
+        self.assertEqual([len(frame) for frame in split], [1, 0, 2, 0])
+        for original, restored in zip(frames, split):
+            np.testing.assert_array_equal(restored.boxes, original.boxes)
+            np.testing.assert_array_equal(restored.scores, original.scores)
+
+    def test_from_frames_of_no_frames(self):
+        detections = Detections.from_frames([])
+        self.assertEqual(len(detections), 0)
+        self.assertEqual(detections.split(2)[1].boxes.shape, (0, 4))
+
+    def test_for_frames(self):
+        detections = Detections.from_boxes(np.arange(24).reshape(6, 4), frame_idx=[0, 1, 1, 3, 4, 4])
+
+        np.testing.assert_array_equal(detections.for_frames(1).frame_idx, [1, 1])
+        np.testing.assert_array_equal(detections.for_frames(1, 4).frame_idx, [1, 1, 3])
+        self.assertEqual(len(detections.for_frames(2)), 0)
+        self.assertEqual(len(detections.for_frames(5, 10)), 0)
+        self.assertEqual(len(detections.for_frames(0, 10)), 6)
+
+    def test_transformed_boxes_and_landmarks(self):
+        detections = Detections.from_boxes([[10, 20, 30, 40], [1, 2, 3, 4]], landmarks=make_landmarks(2))
+
+        transformed = detections.transformed(scale=2.0, dx=5, dy=-5)
+        np.testing.assert_array_equal(transformed.boxes, [[25, 35, 60, 80], [7, -1, 6, 8]])
+        np.testing.assert_array_equal(transformed.landmarks, detections.landmarks * 2 + [5, -5])
+        # the original detections are not changed
+        np.testing.assert_array_equal(detections.boxes, [[10, 20, 30, 40], [1, 2, 3, 4]])
+
+    def test_transformed_with_an_offset_per_face(self):
+        detections = Detections.from_boxes([[10, 20, 30, 40], [1, 2, 3, 4]], landmarks=make_landmarks(2))
+
+        transformed = detections.transformed(scale=0.5, dx=np.array([100, 200]), dy=np.array([10, 20]))
+        np.testing.assert_array_equal(transformed.boxes, [[105, 20, 15, 20], [200, 21, 2, 2]])
+        expected = np.round(detections.landmarks * 0.5 + np.array([[100, 10], [200, 20]])[:, None, :])
+        np.testing.assert_array_equal(transformed.landmarks, expected)
+
+    def test_concatenate_with_and_without_landmarks(self):
+        with_landmarks = Detections.from_boxes([[1, 2, 3, 4]], landmarks=make_landmarks(1), frame_idx=1)
+        without_landmarks = Detections.from_boxes([[5, 6, 7, 8]], frame_idx=0)
+
+        detections = Detections.concatenate([with_landmarks, without_landmarks])
+        self.assertFalse(detections.has_landmarks)
+        self.assertIsNone(detections.landmarks)
+        np.testing.assert_array_equal(detections.frame_idx, [0, 1])
+        np.testing.assert_array_equal(detections.boxes, [[5, 6, 7, 8], [1, 2, 3, 4]])
+
+    def test_concatenate_keeps_landmarks(self):
+        first = Detections.from_boxes([[1, 2, 3, 4]], landmarks=make_landmarks(1), frame_idx=2)
+        second = Detections.from_boxes([[5, 6, 7, 8]], landmarks=make_landmarks(1, offset=100), frame_idx=0)
+
+        detections = Detections.concatenate([first, second])
+        self.assertTrue(detections.has_landmarks)
+        np.testing.assert_array_equal(detections.landmarks, np.concatenate([second.landmarks, first.landmarks]))
+
+    def test_concatenate_of_nothing(self):
+        self.assertEqual(len(Detections.concatenate([])), 0)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Unit tests of the box geometry, the non-maximum suppression is compared against the one of OpenCV.
+"""
+
+from unittest import TestCase
+
+import cv2
+import numpy as np
+
+from src.facedetector.geometry import batched_nms, iou, nms, xywh_to_xyxy, xyxy_to_xywh
+
+
+def make_boxes(num_boxes: int, seed: int = 0):
+    """returns random, heavily overlapping corners of shape (num_boxes, 4) and distinct scores"""
+    rng = np.random.default_rng(seed)
+    top_left = rng.uniform(0, 100, size=(num_boxes, 2))
+    sizes = rng.uniform(20, 60, size=(num_boxes, 2))
+    scores = rng.permutation(num_boxes) / num_boxes + 0.01
+    return np.concatenate([top_left, top_left + sizes], axis=1), scores
+
+
+def cv2_nms(boxes, scores, threshold: float):
+    """returns the indices kept by cv2.dnn.NMSBoxes for corners (x0, y0, x1, y1)"""
+    indices = cv2.dnn.NMSBoxes(xyxy_to_xywh(boxes).tolist(), scores.tolist(), 0.0, threshold)
+    return np.asarray(indices, dtype=np.intp).reshape(-1)
+
+
+class IouTest(TestCase):
+    def test_iou_of_pairs(self):
+        boxes_a = [[0, 0, 10, 10], [0, 0, 0, 0]]
+        boxes_b = [[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30], [0, 0, 5, 5]]
+
+        expected = [[1, 50 / 150, 0, 25 / 100], [0, 0, 0, 0]]
+        np.testing.assert_allclose(iou(boxes_a, boxes_b), expected)
+        np.testing.assert_allclose(iou(boxes_a, boxes_b, mode="min")[0], [1, 0.5, 0, 1])
+
+    def test_iou_of_empty_input(self):
+        self.assertEqual(iou(np.empty((0, 4)), [[0, 0, 1, 1]]).shape, (0, 1))
+        self.assertEqual(iou([[0, 0, 1, 1]], []).shape, (1, 0))
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            iou([[0, 0, 1, 1]], [[0, 0, 1, 1]], mode="max")
+
+
+class NmsTest(TestCase):
+    def test_nms_matches_cv2(self):
+        for seed in range(5):
+            boxes, scores = make_boxes(50, seed)
+            for threshold in (0.3, 0.5, 0.7):
+                with self.subTest(seed=seed, threshold=threshold):
+                    np.testing.assert_array_equal(nms(boxes, scores, threshold), cv2_nms(boxes, scores, threshold))
+
+    def test_nms_keeps_boxes_in_order_of_score(self):
+        boxes = xywh_to_xyxy([[0, 0, 10, 10], [1, 1, 10, 10], [50, 50, 10, 10]])
+
+        np.testing.assert_array_equal(nms(boxes, np.array([0.5, 0.9, 0.7]), 0.5), [1, 2])
+
+    def test_nms_of_empty_input(self):
+        keep = nms(np.empty((0, 4)), np.empty(0), 0.5)
+        self.assertEqual(keep.shape, (0,))
+        self.assertEqual(keep.dtype, np.intp)
+
+
+class BatchedNmsTest(TestCase):
+    def test_boxes_of_different_groups_do_not_suppress_each_other(self):
+        boxes = np.array([[0, 0, 10, 10], [0, 0, 10, 10], [1, 1, 11, 11], [90, 90, 100, 100]])
+        scores = np.array([0.9, 0.8, 0.7, 0.6])
+
+        np.testing.assert_array_equal(batched_nms(boxes, scores, [0, 1, 1, 0], 0.5), [0, 1, 3])
+        np.testing.assert_array_equal(batched_nms(boxes, scores, [0, 0, 0, 0], 0.5), [0, 3])
+
+    def test_batched_nms_matches_cv2_per_group(self):
+        boxes, scores = make_boxes(90, seed=7)
+        groups = np.repeat([0, 1, 4], 30)
+
+        expected = np.concatenate(
+            [
+                np.flatnonzero(groups == group)[cv2_nms(boxes[groups == group], scores[groups == group], 0.4)]
+                for group in np.unique(groups)
+            ]
+        )
+        np.testing.assert_array_equal(batched_nms(boxes, scores, groups, 0.4), np.sort(expected))
+
+        indices = cv2.dnn.NMSBoxesBatched(xyxy_to_xywh(boxes).tolist(), scores.tolist(), groups.tolist(), 0.0, 0.4)
+        np.testing.assert_array_equal(batched_nms(boxes, scores, groups, 0.4), np.sort(np.reshape(indices, -1)))
+
+    def test_batched_nms_with_negative_coordinates(self):
+        boxes, scores = make_boxes(40, seed=3)
+        boxes -= 80
+        groups = np.repeat([0, 1], 20)
+
+        expected = [
+            np.flatnonzero(groups == group)[nms(boxes[groups == group], scores[groups == group], 0.5)]
+            for group in (0, 1)
+        ]
+        np.testing.assert_array_equal(batched_nms(boxes, scores, groups, 0.5), np.sort(np.concatenate(expected)))
+
+    def test_batched_nms_of_empty_input(self):
+        keep = batched_nms(np.empty((0, 4)), np.empty(0), np.empty(0), 0.5)
+        self.assertEqual(keep.shape, (0,))
+        self.assertEqual(keep.dtype, np.intp)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Unit tests of the ReorderBuffer class, which gives back the frames detected out of order in the order of the video.
+"""
+
+import asyncio
+from unittest import IsolatedAsyncioTestCase
+
+from src.facedetector.reorder_buffer import ReorderBuffer
+
+
+async def settle():
+    """lets the other tasks run until they wait"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+class ReorderBufferTest(IsolatedAsyncioTestCase):
+    async def test_out_of_order_puts_are_returned_in_order(self):
+        buffer = ReorderBuffer(window=8)
+        for index in (3, 1, 0, 4, 2):
+            await buffer.put(index, f"frame {index}")
+        await buffer.close(5)
+
+        entries = [entry async for entry in buffer]
+        self.assertEqual(entries, [(index, f"frame {index}") for index in range(5)])
+        self.assertEqual(len(buffer), 0)
+
+    async def test_get_waits_for_the_next_index(self):
+        buffer = ReorderBuffer(window=4)
+        await buffer.put(1, "frame 1")
+
+        get = asyncio.create_task(buffer.get())
+        await settle()
+        self.assertFalse(get.done())
+
+        await buffer.put(0, "frame 0")
+        self.assertEqual(await get, (0, "frame 0"))
+        self.assertEqual(await buffer.get(), (1, "frame 1"))
+
+    async def test_put_waits_at_the_end_of_the_window(self):
+        buffer = ReorderBuffer(window=2)
+        await buffer.put(1, "frame 1")
+
+        put = asyncio.create_task(buffer.put(2, "frame 2"))
+        await settle()
+        self.assertFalse(put.done())
+        self.assertEqual(len(buffer), 1)
+
+        await buffer.put(0, "frame 0")
+        self.assertEqual(await buffer.get(), (0, "frame 0"))
+        # the next index moved on, so frame 2 is within the window
+        await asyncio.wait_for(put, timeout=1)
+        await buffer.close(3)
+        self.assertEqual(await self._collect(buffer), [(1, "frame 1"), (2, "frame 2")])
+
+    async def test_put_of_a_returned_index(self):
+        buffer = ReorderBuffer(window=2)
+        await buffer.put(0, "frame 0")
+        await buffer.get()
+
+        with self.assertRaises(ValueError):
+            await buffer.put(0, "frame 0")
+
+    async def test_close_ends_the_iteration(self):
+        buffer = ReorderBuffer(window=4, start_index=10)
+
+        entries = asyncio.create_task(self._collect(buffer))
+        await buffer.put(10, "frame 10")
+        await settle()
+        self.assertFalse(entries.done())
+
+        await buffer.close(11)
+        self.assertEqual(await asyncio.wait_for(entries, timeout=1), [(10, "frame 10")])
+        self.assertIsNone(await buffer.get())
+
+    async def test_close_of_an_empty_video(self):
+        buffer = ReorderBuffer(window=4)
+        await buffer.close(0)
+
+        self.assertIsNone(await buffer.get())
+
+    async def test_high_water_mark(self):
+        buffer = ReorderBuffer(window=4)
+        for index in (2, 1, 3):
+            await buffer.put(index, index)
+        self.assertEqual(buffer.high_water_mark, 3)
+
+        await buffer.put(0, 0)
+        await buffer.get()
+        await buffer.get()
+        self.assertEqual(len(buffer), 2)
+        self.assertEqual(buffer.high_water_mark, 4)
+        self.assertEqual(buffer.usage(), "reorder_buffer: high-water mark 4/4")
+
+    @staticmethod
+    async def _collect(buffer: ReorderBuffer):
+        return [entry async for entry in buffer]
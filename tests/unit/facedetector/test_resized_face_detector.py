@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Unit tests of the ResizedFaceDetector class and of get_detection_scale, the face detection on downscaled frames.
+"""
+
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+
+from src.common.config import Config
+from src.facedetector.detections import Detections
+from src.facedetector.face_detector import FaceDetector
+from src.facedetector.resized_face_detector import ResizedFaceDetector, get_detection_scale
+
+
+class CenterFaceDetector(FaceDetector):
+    """finds a face of a quarter of the frame in its center and keeps the sizes of the frames it is run on"""
+
+    min_face_size = 20
+
+    def __init__(self):
+        self.frame_sizes = []
+
+    def detect_faces(self, frame):
+        height, width = frame.shape[:2]
+        self.frame_sizes.append((width, height))
+        landmarks = np.full((1, 5, 2), [width / 2, height / 2])
+        return Detections.from_boxes([[width / 4, height / 4, width / 2, height / 2]], landmarks=landmarks)
+
+
+class GetDetectionScaleTest(TestCase):
+    def test_long_side_is_scaled_to_the_resolution(self):
+        self.assertAlmostEqual(get_detection_scale(1920, 1080, 640), 1 / 3)
+        self.assertAlmostEqual(get_detection_scale(1080, 1920, 640), 1 / 3)
+
+    def test_frames_are_never_upscaled(self):
+        self.assertEqual(get_detection_scale(320, 240, 640), 1.0)
+        with patch.object(Config, "FACE_DETECTOR_MIN_FACE_SIZE", 10):
+            self.assertEqual(get_detection_scale(1920, 1080, "auto", CenterFaceDetector()), 1.0)
+
+    def test_auto_scales_the_smallest_expected_face_to_the_smallest_detectable_face(self):
+        with patch.object(Config, "FACE_DETECTOR_MIN_FACE_SIZE", 80):
+            self.assertAlmostEqual(get_detection_scale(1920, 1080, "auto", CenterFaceDetector()), 0.25)
+
+    def test_resolution_of_the_config_is_used_by_default(self):
+        with patch.object(Config, "FACE_DETECTOR_RESOLUTION", None):
+            self.assertEqual(get_detection_scale(1920, 1080), 1.0)
+        with patch.object(Config, "FACE_DETECTOR_RESOLUTION", 960):
+            self.assertAlmostEqual(get_detection_scale(1920, 1080), 0.5)
+
+
+class ResizedFaceDetectorTest(TestCase):
+    def setUp(self):
+        self.detector = CenterFaceDetector()
+        self.resized_detector = ResizedFaceDetector(self.detector, 0.25)
+        self.frame = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    def test_faces_are_mapped_back_to_the_original_frame(self):
+        faces = self.resized_detector.detect_faces(self.frame)
+
+        self.assertEqual(self.detector.frame_sizes, [(160, 120)])
+        np.testing.assert_allclose(faces.boxes, [[160, 120, 320, 240]])
+        np.testing.assert_allclose(faces.landmarks, np.full((1, 5, 2), [320, 240]))
+
+    def test_faces_of_a_batch_are_mapped_back_to_the_original_frames(self):
+        faces = self.resized_detector.detect_faces_batch([self.frame, np.zeros((240, 320, 3), dtype=np.uint8)])
+
+        self.assertEqual(self.detector.frame_sizes, [(160, 120), (80, 60)])
+        np.testing.assert_array_equal(faces.frame_idx, [0, 1])
+        np.testing.assert_allclose(faces.boxes, [[160, 120, 320, 240], [80, 60, 160, 120]])
+
+    def test_smallest_detectable_face_grows_with_the_downscaling(self):
+        self.assertEqual(self.resized_detector.min_face_size, 80)
+        self.assertEqual(self.resized_detector.get_params()["scale"], 0.25)
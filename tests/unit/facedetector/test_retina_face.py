@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Unit tests of the prior boxes of RetinaFace and of the decoding of its outputs, on hand-built outputs of the network.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase
+
+import numpy as np
+
+from src.facedetector.retina_face import RETINAFACE_VARIANCES, RetinaFace
+
+# an input size of 64x64 has 8x8, 4x4 and 2x2 cells with two priors each
+INPUT_SIZE = (64, 64)
+NUM_PRIORS = 2 * (8 * 8 + 4 * 4 + 2 * 2)
+# the first prior of the cell in row 3 and column 4 of the first feature map: center (36, 28) and size 16 in pixels
+PRIOR_ID = (3 * 8 + 4) * 2
+
+
+def make_retina_face(confidence: float = 0.5, threshold: float = 0.4):
+    """returns a RetinaFace detector without its network, only the priors and the decoding are tested"""
+    detector = RetinaFace.__new__(RetinaFace)
+    detector.confidence = confidence
+    detector.threshold = threshold
+    detector.priors = {}
+    detector.lock = threading.Lock()
+    return detector
+
+
+def make_outputs(num_frames: int):
+    """returns outputs of the network without faces: box offsets, scores and landmark offsets of every prior"""
+    return (
+        np.zeros((num_frames, NUM_PRIORS, 4)),
+        np.zeros((num_frames, NUM_PRIORS, 2)),
+        np.zeros((num_frames, NUM_PRIORS, 10)),
+    )
+
+
+class RetinaFacePriorsTest(TestCase):
+    def test_priors_are_ordered_by_feature_map_row_column_and_size(self):
+        priors = make_retina_face()._get_priors(INPUT_SIZE)
+
+        self.assertEqual(priors.shape, (NUM_PRIORS, 4))
+        np.testing.assert_allclose(priors[:2], np.array([[4, 4, 16, 16], [4, 4, 32, 32]]) / 64)
+        np.testing.assert_allclose(priors[PRIOR_ID], np.array([36, 28, 16, 16]) / 64)
+        # the first prior of the second feature map and the last prior of the last one
+        np.testing.assert_allclose(priors[128], np.array([8, 8, 64, 64]) / 64)
+        np.testing.assert_allclose(priors[-1], np.array([48, 48, 512, 512]) / 64)
+
+    def test_priors_of_an_input_size_are_computed_once_by_all_threads(self):
+        detector = make_retina_face()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            priors = list(executor.map(lambda _: detector._get_priors((640, 480)), range(32)))
+
+        self.assertTrue(all(prior is priors[0] for prior in priors))
+        self.assertEqual(list(detector.priors), [(640, 480)])
+
+
+class RetinaFaceDecodeTest(TestCase):
+    def setUp(self):
+        # the frames have twice the input size, so every relative coordinate is multiplied by 128
+        self.frames = [np.zeros((128, 128, 3), dtype=np.uint8)] * 2
+        self.locations, self.scores, self.landmarks = make_outputs(len(self.frames))
+
+    def decode(self):
+        return make_retina_face()._decode([self.locations, self.scores, self.landmarks], self.frames, INPUT_SIZE)
+
+    def test_prior_box_and_landmarks_without_offsets(self):
+        self.scores[1, PRIOR_ID, 1] = 0.9
+
+        faces = self.decode()
+
+        np.testing.assert_array_equal(faces.frame_idx, [1])
+        np.testing.assert_array_equal(faces.boxes, [[56, 40, 32, 32]])
+        np.testing.assert_allclose(faces.scores, [0.9], rtol=1e-6)
+        np.testing.assert_array_equal(faces.landmarks, np.full((1, 5, 2), [72, 56]))
+
+    def test_offsets_move_and_scale_the_prior_box(self):
+        self.scores[0, PRIOR_ID, 1] = 0.9
+        # the center moves by half a variance of the prior width, the width is doubled
+        self.locations[0, PRIOR_ID] = [0.5, 0.0, np.log(2) / RETINAFACE_VARIANCES[1], 0.0]
+        self.landmarks[0, PRIOR_ID, :2] = [1.0, 1.0]
+
+        faces = self.decode()
+
+        # center (72 + 1.6, 56), size (64, 32)
+        np.testing.assert_array_equal(faces.boxes, [[42, 40, 64, 32]])
+        np.testing.assert_array_equal(faces.landmarks[0, 0], [75, 59])
+        np.testing.assert_array_equal(faces.landmarks[0, 1:], np.full((4, 2), [72, 56]))
+
+    def test_overlapping_faces_of_the_same_frame_are_suppressed(self):
+        # both priors of the cell cover the same face, the face is found in both frames
+        self.scores[:, PRIOR_ID, 1] = [0.9, 0.8]
+        self.scores[0, PRIOR_ID + 1, 1] = 0.7
+        self.locations[0, PRIOR_ID + 1, 2:] = np.log(0.5) / RETINAFACE_VARIANCES[1]
+
+        faces = self.decode()
+
+        np.testing.assert_array_equal(faces.frame_idx, [0, 1])
+        np.testing.assert_allclose(faces.scores, [0.9, 0.8], rtol=1e-6)
+
+    def test_no_faces(self):
+        self.scores[:, :, 1] = 0.4
+
+        faces = self.decode()
+
+        self.assertEqual(len(faces), 0)
+        self.assertEqual(faces.landmarks.shape, (0, 5, 2))
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Unit tests of the RoiFaceDetector class, which searches for faces in regions around the faces of the previous frame.
+"""
+
+from unittest import TestCase
+
+import cv2
+import numpy as np
+
+from src.facedetector.detections import Detections
+from src.facedetector.face_detector import FaceDetector
+from src.facedetector.roi_face_detector import RoiFaceDetector
+
+
+class WhiteBoxFaceDetector(FaceDetector):
+    """finds the white boxes of a frame, as large as min_face_size, and keeps the sizes of the frames it is run on"""
+
+    min_face_size = 10
+
+    def __init__(self):
+        self.frame_sizes = []
+
+    def detect_faces(self, frame):
+        self.frame_sizes.append(frame.shape[1::-1])
+        mask = cv2.inRange(frame, (250, 250, 250), (255, 255, 255))
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        boxes = sorted(box for box in map(cv2.boundingRect, contours) if min(box[2:]) >= self.min_face_size)
+        return Detections.from_boxes(np.array(boxes).reshape(-1, 4), scores=np.full(len(boxes), 0.9))
+
+
+def make_frame(*boxes):
+    """returns a black frame of 320x240 with a white box for every face"""
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    for x, y, w, h in boxes:
+        frame[y : y + h, x : x + w] = 255
+    return frame
+
+
+class RoiFaceDetectorTest(TestCase):
+    def setUp(self):
+        self.detector = WhiteBoxFaceDetector()
+        self.roi_detector = RoiFaceDetector(self.detector, full_frame_stride=10, padding=0.5)
+
+    def test_faces_in_regions_are_mapped_back_to_the_frame(self):
+        self.roi_detector.detect_faces(make_frame((100, 80, 40, 40)))
+        faces = self.roi_detector.detect_faces(make_frame((104, 78, 40, 40)))
+
+        # the region is the box of the previous face with 20 pixels on each side
+        self.assertEqual(self.detector.frame_sizes, [(320, 240), (80, 80)])
+        np.testing.assert_array_equal(faces.boxes, [[104, 78, 40, 40]])
+        np.testing.assert_array_equal(faces.frame_idx, [0])
+
+    def test_regions_are_clipped_to_the_frame(self):
+        self.roi_detector.detect_faces(make_frame((0, 0, 40, 40)))
+        faces = self.roi_detector.detect_faces(make_frame((2, 2, 40, 40)))
+
+        self.assertEqual(self.detector.frame_sizes[1], (60, 60))
+        np.testing.assert_array_equal(faces.boxes, [[2, 2, 40, 40]])
+
+    def test_whole_frame_is_searched_when_a_face_is_lost(self):
+        self.roi_detector.detect_faces(make_frame((100, 80, 40, 40), (220, 80, 40, 40)))
+        # the second face moved out of its region, the first one is still found in its region
+        faces = self.roi_detector.detect_faces(make_frame((100, 80, 40, 40), (20, 180, 40, 40)))
+
+        self.assertEqual(self.detector.frame_sizes, [(320, 240), (80, 80), (80, 80), (320, 240)])
+        np.testing.assert_array_equal(faces.boxes, [[20, 180, 40, 40], [100, 80, 40, 40]])
+
+    def test_face_found_in_overlapping_regions_is_kept_once(self):
+        # the small face is inside the region of the large face as well
+        boxes = [(100, 60, 80, 80), (185, 80, 20, 20)]
+        self.roi_detector.detect_faces(make_frame(*boxes))
+        faces = self.roi_detector.detect_faces(make_frame(*boxes))
+
+        self.assertEqual(self.detector.frame_sizes, [(320, 240), (160, 160), (40, 40)])
+        np.testing.assert_array_equal(faces.boxes, boxes)
+
+    def test_whole_frame_is_searched_on_the_stride_and_at_scene_cuts(self):
+        roi_detector = RoiFaceDetector(self.detector, full_frame_stride=3, padding=0.5)
+        roi_detector.add_scene_cuts([4])
+
+        for _ in range(6):
+            roi_detector.detect_faces(make_frame((100, 80, 40, 40)))
+
+        # frames 0 and 3 are on the stride, frame 4 starts a new scene
+        full_frames = [i for i, size in enumerate(self.detector.frame_sizes) if size == (320, 240)]
+        self.assertEqual(len(full_frames), 3)
+        self.assertEqual(len(self.detector.frame_sizes), 6)
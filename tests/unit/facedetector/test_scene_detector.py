@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Unit tests of the SceneCutDetector class, which finds the frames of a video where a new shot starts.
+"""
+
+from unittest import TestCase
+
+import numpy as np
+
+from src.facedetector.scene_detector import SceneCutDetector
+
+# colors of two shots, their hue/saturation histograms have nothing in common
+BLUE, RED = (200, 40, 20), (20, 40, 200)
+
+
+def make_frame(color, seed: int = 0):
+    """returns a frame of one color with a little noise, as in a shot of a video"""
+    noise = np.random.default_rng(seed).integers(-5, 6, (120, 160, 3))
+    return np.clip(np.array(color) + noise, 0, 255).astype(np.uint8)
+
+
+def find_scene_cuts(detector, colors):
+    """feeds a frame of every color to the detector and returns the indices of the frames which start a new scene"""
+    return [i for i, color in enumerate(colors) if detector.is_scene_cut(i, make_frame(color, seed=i))]
+
+
+class SceneCutDetectorTest(TestCase):
+    def test_cuts_between_shots_are_found(self):
+        detector = SceneCutDetector(threshold=0.5, min_scene_length=2)
+
+        scene_cuts = find_scene_cuts(detector, [BLUE] * 5 + [RED] * 5 + [BLUE] * 5)
+
+        self.assertEqual(scene_cuts, [5, 10])
+        self.assertEqual(detector.scene_cuts, [5, 10])
+
+    def test_first_frame_and_a_single_shot_are_no_cut(self):
+        detector = SceneCutDetector(threshold=0.5, min_scene_length=2)
+
+        self.assertEqual(find_scene_cuts(detector, [RED] * 10), [])
+
+    def test_cuts_closer_than_the_min_scene_length_are_dropped(self):
+        detector = SceneCutDetector(threshold=0.5, min_scene_length=4)
+
+        # a flash of two frames and a shot of three frames are both shorter than the min scene length
+        scene_cuts = find_scene_cuts(detector, [BLUE] * 6 + [RED] * 2 + [BLUE] * 3 + [RED] * 4)
+
+        self.assertEqual(scene_cuts, [6, 11])
+
+    def test_threshold_above_every_distance_finds_no_cut(self):
+        detector = SceneCutDetector(threshold=1.1, min_scene_length=1)
+
+        self.assertEqual(find_scene_cuts(detector, [BLUE, RED, BLUE, RED]), [])
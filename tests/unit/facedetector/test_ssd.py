@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Unit tests of the decoding of the outputs of the SSD face detector, on hand-built outputs of the network.
+"""
+
+from unittest import TestCase
+
+import numpy as np
+
+from src.facedetector.ssd import SSD
+
+
+def make_ssd(confidence_threshold: float = 0.5):
+    """returns an SSD detector without its network, only the decoding of its outputs is tested"""
+    detector = SSD.__new__(SSD)
+    detector.confidence_threshold = confidence_threshold
+    return detector
+
+
+class SsdDecodeTest(TestCase):
+    def setUp(self):
+        self.frames = [np.zeros((200, 400, 3), dtype=np.uint8), np.zeros((100, 100, 3), dtype=np.uint8)]
+
+    def test_relative_corners_are_scaled_to_the_size_of_their_frame(self):
+        # rows of (image_id, label, score, x0, y0, x1, y1)
+        detections = np.array(
+            [
+                [0, 1, 0.9, 0.1, 0.2, 0.3, 0.6],
+                [1, 1, 0.8, 0.5, 0.5, 0.75, 1.0],
+                [0, 1, 0.7, 0.5, 0.0, 0.6, 0.1],
+            ],
+            dtype=np.float32,
+        )
+
+        faces = make_ssd()._decode(detections, self.frames)
+
+        np.testing.assert_array_equal(faces.frame_idx, [0, 0, 1])
+        np.testing.assert_array_equal(faces.boxes, [[40, 40, 80, 80], [200, 0, 40, 20], [50, 50, 25, 50]])
+        np.testing.assert_allclose(faces.scores, [0.9, 0.7, 0.8], rtol=1e-6)
+
+    def test_faces_below_the_confidence_threshold_are_dropped(self):
+        detections = np.array([[0, 1, 0.4, 0.1, 0.1, 0.2, 0.2], [1, 1, 0.6, 0.1, 0.1, 0.2, 0.2]], dtype=np.float32)
+
+        faces = make_ssd(0.5)._decode(detections, self.frames)
+
+        np.testing.assert_array_equal(faces.frame_idx, [1])
+        np.testing.assert_array_equal(faces.boxes, [[10, 10, 10, 10]])
+
+    def test_boxes_are_clipped_to_the_frame(self):
+        detections = np.array(
+            [[0, 1, 0.9, -0.1, -0.2, 0.5, 1.5], [0, 1, 0.9, 1.1, 0.2, 1.3, 0.4]],
+            dtype=np.float32,
+        )
+
+        faces = make_ssd()._decode(detections, self.frames)
+
+        # the second box is outside of the frame, it has no area left after clipping
+        np.testing.assert_array_equal(faces.boxes, [[0, 0, 200, 200]])
+
+    def test_no_faces(self):
+        faces = make_ssd()._decode(np.zeros((0, 7), dtype=np.float32), self.frames)
+
+        self.assertEqual(len(faces), 0)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Unit tests of the TrackingFaceDetector class, which runs a face detector on keyframes and tracks the faces between.
+"""
+
+from unittest import TestCase
+
+import cv2
+import numpy as np
+
+from src.facedetector.detections import Detections
+from src.facedetector.face_detector import FaceDetector
+from src.facedetector.tracking_face_detector import TrackingFaceDetector
+
+FACE_BOX = [100, 80, 60, 60]
+
+
+class StaticFaceDetector(FaceDetector):
+    """finds the same face in every frame and counts the frames it is run on"""
+
+    def __init__(self):
+        self.num_calls = 0
+
+    def detect_faces(self, frame):
+        self.num_calls += 1
+        return Detections.from_boxes([FACE_BOX], scores=[0.9])
+
+
+def make_frames(num_frames: int, step: int = 2, seed: int = 0):
+    """returns frames of a textured image which moves step pixels to the right from one frame to the next"""
+    texture = np.random.default_rng(seed).integers(0, 256, (240, 320), dtype=np.uint8)
+    texture = cv2.GaussianBlur(texture, (5, 5), 0)
+    return [cv2.cvtColor(np.roll(texture, i * step, axis=1), cv2.COLOR_GRAY2BGR) for i in range(num_frames)]
+
+
+class TrackingFaceDetectorTest(TestCase):
+    def setUp(self):
+        self.detector = StaticFaceDetector()
+
+    def test_detector_is_run_on_keyframes_only(self):
+        tracker = TrackingFaceDetector(self.detector, keyframe_stride=4, min_tracking_confidence=0.5)
+
+        for frame_index, frame in enumerate(make_frames(10)):
+            num_calls = self.detector.num_calls
+            tracker.detect_faces(frame)
+            self.assertEqual(self.detector.num_calls - num_calls, int(frame_index % 4 == 0), f"frame {frame_index}")
+
+    def test_tracked_faces_move_with_the_frames(self):
+        tracker = TrackingFaceDetector(self.detector, keyframe_stride=10, min_tracking_confidence=0.5)
+
+        faces = [tracker.detect_faces(frame) for frame in make_frames(4, step=3)]
+
+        self.assertEqual(self.detector.num_calls, 1)
+        for frame_index, frame_faces in enumerate(faces):
+            x, y, w, h = frame_faces.boxes[0]
+            self.assertAlmostEqual(x, FACE_BOX[0] + 3 * frame_index, delta=1)
+            self.assertAlmostEqual(y, FACE_BOX[1], delta=1)
+            self.assertAlmostEqual(w, FACE_BOX[2], delta=2)
+            np.testing.assert_allclose(frame_faces.scores, [0.9], rtol=1e-6)
+
+    def test_detector_is_run_at_scene_cuts(self):
+        tracker = TrackingFaceDetector(self.detector, keyframe_stride=10, min_tracking_confidence=0.5)
+        tracker.add_scene_cuts([3])
+
+        for frame in make_frames(6):
+            tracker.detect_faces(frame)
+
+        self.assertEqual(self.detector.num_calls, 2)
+
+    def test_detector_is_run_when_the_tracking_confidence_is_low(self):
+        tracker = TrackingFaceDetector(self.detector, keyframe_stride=10, min_tracking_confidence=0.5)
+        # the second frame is another image, the points of the face can not be followed to it
+        frames = make_frames(2, seed=0)[:1] + make_frames(1, seed=1) + make_frames(2, seed=1)[1:]
+
+        for frame in frames:
+            tracker.detect_faces(frame)
+
+        self.assertEqual(self.detector.num_calls, 2)
+
+    def test_reset_starts_a_new_video(self):
+        tracker = TrackingFaceDetector(self.detector, keyframe_stride=10, min_tracking_confidence=0.5)
+        frames = make_frames(3)
+
+        for frame in frames:
+            tracker.detect_faces(frame)
+        tracker.reset()
+        tracker.detect_faces(frames[-1])
+
+        self.assertEqual(self.detector.num_calls, 2)
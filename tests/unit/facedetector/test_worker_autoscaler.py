@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Unit tests of the WorkerAutoscaler class, which adapts the number of active detection workers of a job.
+"""
+
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from src.facedetector.worker_autoscaler import WorkerAutoscaler
+
+
+class WorkerAutoscalerTest(TestCase):
+    def setUp(self):
+        # the clock of the autoscaler moves by one second per interval, so the frames of an interval are its fps
+        self.now = 100.0
+        clock = patch("src.facedetector.worker_autoscaler.time.monotonic", side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def make_autoscaler(self, initial_workers: int, max_workers: int = 8, cpu_budget: float = 8):
+        autoscaler = WorkerAutoscaler(initial_workers, max_workers=max_workers, cpu_budget=cpu_budget, interval=1)
+        autoscaler.process = None
+        return autoscaler
+
+    def run_interval(self, autoscaler, fps: float, queue_size: int, cpu_cores: float = None):
+        """measures an interval of one second with the given fps, returns the number of workers of the next one"""
+        self.now += 1
+        autoscaler.record(int(fps), 0.1 * fps)
+        if cpu_cores is not None:
+            autoscaler.process = Mock(cpu_percent=Mock(return_value=100 * cpu_cores))
+        return autoscaler.update(queue_size)
+
+    def test_workers_are_added_while_the_job_gets_faster(self):
+        autoscaler = self.make_autoscaler(2)
+
+        workers = [self.run_interval(autoscaler, fps, queue_size=10) for fps in (10, 15, 20)]
+
+        self.assertEqual(workers, [3, 4, 5])
+
+    def test_added_worker_which_did_not_help_is_removed(self):
+        autoscaler = self.make_autoscaler(2)
+
+        workers = [self.run_interval(autoscaler, fps, queue_size=10) for fps in (10, 15, 15.5)]
+
+        self.assertEqual(workers, [3, 4, 3])
+
+    def test_another_worker_is_tried_after_holding(self):
+        autoscaler = self.make_autoscaler(2)
+        for fps in (10, 15, 15.5):
+            self.run_interval(autoscaler, fps, queue_size=10)
+
+        workers = [self.run_interval(autoscaler, 15, queue_size=10) for _ in range(WorkerAutoscaler.hold_intervals + 1)]
+
+        self.assertEqual(workers, [3] * WorkerAutoscaler.hold_intervals + [4])
+
+    def test_worker_is_removed_when_no_frames_are_waiting(self):
+        autoscaler = self.make_autoscaler(3)
+
+        # the job is as fast with a worker less, so another one is removed
+        workers = [self.run_interval(autoscaler, 10, queue_size=0) for _ in range(3)]
+
+        self.assertEqual(workers, [2, 1, 1])
+
+    def test_removed_worker_which_made_the_job_slower_is_added_back(self):
+        autoscaler = self.make_autoscaler(3)
+
+        workers = [self.run_interval(autoscaler, fps, queue_size=0) for fps in (10, 8)]
+
+        self.assertEqual(workers, [2, 3])
+
+    def test_no_worker_is_added_beyond_the_cpu_budget(self):
+        self.assertEqual(self.run_interval(self.make_autoscaler(2, cpu_budget=3), 10, queue_size=10, cpu_cores=3.0), 2)
+        self.assertEqual(self.run_interval(self.make_autoscaler(2, cpu_budget=3), 10, queue_size=10, cpu_cores=1.5), 3)
+
+    def test_no_worker_is_added_beyond_the_maximum(self):
+        autoscaler = self.make_autoscaler(4, max_workers=2)
+
+        self.assertEqual(autoscaler.active_workers, 2)
+        self.assertEqual(self.run_interval(autoscaler, 10, queue_size=10), 2)
+
+    def test_interval_without_frames_keeps_the_workers(self):
+        autoscaler = self.make_autoscaler(2)
+        self.now += 1
+
+        self.assertEqual(autoscaler.update(queue_size=10), 2)
+        self.assertIsNone(autoscaler.previous_fps)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Unit tests of the decoding of the outputs of the YOLO face detector, on hand-built outputs of the network.
+"""
+
+from unittest import TestCase
+
+import numpy as np
+
+from src.facedetector.yolo import YOLO
+
+
+def make_yolo(confidence: float = 0.5, threshold: float = 0.4):
+    """returns a YOLO detector without its network, only the decoding of its outputs is tested"""
+    detector = YOLO.__new__(YOLO)
+    detector.confidence = confidence
+    detector.threshold = threshold
+    return detector
+
+
+def make_row(center_x, center_y, width, height, score):
+    """returns an output row (center_x, center_y, width, height, objectness, score of the face class)"""
+    return [center_x, center_y, width, height, score, score]
+
+
+class YoloDecodeTest(TestCase):
+    def setUp(self):
+        self.frames = [np.zeros((200, 400, 3), dtype=np.uint8), np.zeros((100, 100, 3), dtype=np.uint8)]
+
+    def test_rows_of_all_output_layers_are_scaled_to_the_size_of_their_frame(self):
+        # two output layers with two rows per frame
+        layer_outputs = [
+            np.array(
+                [
+                    make_row(0.2, 0.4, 0.2, 0.4, 0.9),
+                    make_row(0.5, 0.5, 0.1, 0.1, 0.1),
+                    make_row(0.5, 0.5, 0.2, 0.2, 0.8),
+                    make_row(0.5, 0.5, 0.1, 0.1, 0.2),
+                ],
+                dtype=np.float32,
+            ),
+            np.array(
+                [
+                    make_row(0.8, 0.5, 0.1, 0.2, 0.7),
+                    make_row(0.5, 0.5, 0.1, 0.1, 0.0),
+                    make_row(0.5, 0.5, 0.1, 0.1, 0.0),
+                    make_row(0.5, 0.5, 0.1, 0.1, 0.3),
+                ],
+                dtype=np.float32,
+            ),
+        ]
+
+        faces = make_yolo()._decode(layer_outputs, self.frames)
+
+        np.testing.assert_array_equal(faces.frame_idx, [0, 0, 1])
+        np.testing.assert_array_equal(faces.boxes, [[40, 40, 80, 80], [300, 80, 40, 40], [40, 40, 20, 20]])
+        np.testing.assert_allclose(faces.scores, [0.9, 0.7, 0.8], rtol=1e-6)
+
+    def test_overlapping_boxes_of_the_same_frame_are_suppressed(self):
+        # the same box in both frames and a shifted copy of it in the first frame
+        layer_outputs = [
+            np.array(
+                [
+                    make_row(0.5, 0.5, 0.2, 0.2, 0.9),
+                    make_row(0.51, 0.5, 0.2, 0.2, 0.8),
+                    make_row(0.51, 0.5, 0.2, 0.2, 0.7),
+                    make_row(0.5, 0.5, 0.1, 0.1, 0.0),
+                ],
+                dtype=np.float32,
+            )
+        ]
+
+        faces = make_yolo()._decode(layer_outputs, self.frames)
+
+        np.testing.assert_array_equal(faces.frame_idx, [0, 1])
+        np.testing.assert_allclose(faces.scores, [0.9, 0.7], rtol=1e-6)
+
+    def test_boxes_are_clipped_to_the_frame(self):
+        layer_outputs = [np.array([make_row(0.0, 0.0, 0.2, 0.2, 0.9), make_row(0.5, 0.5, 0.1, 0.1, 0.0)])]
+
+        faces = make_yolo()._decode(layer_outputs, self.frames[:1] * 2)
+
+        np.testing.assert_array_equal(faces.boxes, [[0, 0, 40, 20]])
+
+    def test_no_faces(self):
+        layer_outputs = [np.zeros((4, 6), dtype=np.float32)]
+
+        faces = make_yolo()._decode(layer_outputs, self.frames)
+
+        self.assertEqual(len(faces), 0)